@@ -7,7 +7,6 @@ __app_name__ = 'eencijfer'
 
 import logging
 import shutil
-from importlib import import_module
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -15,9 +14,8 @@ logger = logging.getLogger(__name__)
 APP_NAME = __app_name__
 DOT_APP_NAME = '.' + APP_NAME
 
-# create config directory if it does not exist.
+# config directory, created when the config-file is written (see `eencijfer init`).
 APP_DIR = Path.home() / DOT_APP_NAME
-Path(APP_DIR).mkdir(parents=True, exist_ok=True)
 
 CONFIG_FILE = APP_DIR / "config.INI"
 
@@ -56,8 +54,8 @@ def column_converter(func):
     return func
 
 
-# import module so all column-converter-decorators are activated
-import_module("eencijfer.convert.column_converters")
+# the column-converter-decorators are activated when eencijfer.convert.column_converters is imported,
+# this happens on first use in eencijfer.convert.eencijfer.
 
 
 FORMAT = "[%(filename)s:%(lineno)s - %(funcName)20s() ] %(message)s"
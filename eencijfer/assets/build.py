@@ -0,0 +1,122 @@
+"""Build data-assets as a dependency graph on a worker pool."""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from eencijfer.utils.profile import _in_current_stage, _profile_stage
+
+logger = logging.getLogger(__name__)
+
+
+class AssetBuild(NamedTuple):
+    """Data-asset that is created from the assets it depends on.
+
+    `create` gets a dictionary with the assets in `depends_on` (by name) and returns
+    the new asset. Assets without dependencies between them are created at the same time.
+    """
+
+    name: str
+    create: Callable[[Dict[str, pd.DataFrame]], pd.DataFrame]
+    depends_on: List[str] = []
+
+
+def _check_dependencies(builds: List[AssetBuild]) -> None:
+    """Check that every dependency is built and that there are no cycles.
+
+    Args:
+        builds (List[AssetBuild]): assets to build.
+
+    Raises:
+        Exception: unknown dependency or cycle in the dependencies.
+    """
+    names = {build.name for build in builds}
+    for build in builds:
+        unknown = [dep for dep in build.depends_on if dep not in names]
+        if unknown:
+            raise Exception(f"Asset {build.name} depends on unknown assets: {unknown}")
+
+    resolved: set = set()
+    remaining = list(builds)
+    while remaining:
+        ready = [build for build in remaining if set(build.depends_on) <= resolved]
+        if not ready:
+            raise Exception(f"Cycle in dependencies of assets: {[build.name for build in remaining]}")
+        resolved.update(build.name for build in ready)
+        remaining = [build for build in remaining if build not in ready]
+
+
+def _create_asset(build: AssetBuild, inputs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    with _profile_stage("asset", name=build.name) as stage:
+        asset = build.create(inputs)
+        stage["rows_out"] = len(asset)
+    return asset
+
+
+def _build_assets(
+    builds: List[AssetBuild],
+    save: Callable[[str, pd.DataFrame], None],
+    max_workers: Optional[int] = None,
+) -> None:
+    """Create and save assets; independent assets are created concurrently.
+
+    An asset is created as soon as the assets it depends on are created, and it is saved
+    while the next assets are created. An asset is released once it is saved and all
+    assets that depend on it have been created. At most `max_workers` assets are created
+    or saved at the same time; use a low number to limit the memory that is used.
+
+    Args:
+        builds (List[AssetBuild]): assets to build.
+        save (Callable[[str, pd.DataFrame], None]): function that saves an asset by name.
+        max_workers (Optional[int], optional): maximum number of assets created or saved at the same time.
+            Defaults to None (default of ThreadPoolExecutor).
+
+    Raises:
+        Exception: an asset could not be created or saved; assets that have not started are cancelled.
+    """
+    _check_dependencies(builds)
+
+    pending = {build.name: build for build in builds}
+    assets: Dict[str, pd.DataFrame] = {}
+    not_saved: set = set()
+    dependents = {build.name: sum(build.name in other.depends_on for other in builds) for build in builds}
+    running: Dict[Future, Tuple[str, str]] = {}
+
+    def _release(name: str) -> None:
+        if name in assets and name not in not_saved and dependents[name] == 0:
+            logger.debug(f"Releasing asset {name}.")
+            del assets[name]
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            for name, build in list(pending.items()):
+                if all(dep in assets for dep in build.depends_on):
+                    del pending[name]
+                    inputs = {dep: assets[dep] for dep in build.depends_on}
+                    logger.debug(f"Creating asset {name}...")
+                    running[executor.submit(_in_current_stage(_create_asset), build, inputs)] = ("create", name)
+                    for dep in build.depends_on:
+                        dependents[dep] -= 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, name = running.pop(future)
+                result = future.result()
+                if task == "create":
+                    assets[name] = result
+                    not_saved.add(name)
+                    running[executor.submit(_in_current_stage(save), name, result)] = ("save", name)
+                else:
+                    logger.debug(f"Asset {name} saved.")
+                    not_saved.discard(name)
+                    _release(name)
+
+            for name in list(assets):
+                _release(name)
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
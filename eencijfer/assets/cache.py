@@ -0,0 +1,145 @@
+"""Cache for (intermediate) data assets."""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from eencijfer.settings import config
+from eencijfer.utils.catalog import file_catalog
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(source_dir: Path) -> str:
+    """Create a fingerprint of the converted eencijfer-files and decode tables.
+
+    The fingerprint changes when a parquet-file is added, removed or changed
+    (size, modification time or header) in source_dir, in a dataset with a partition per
+    delivery in source_dir, or in the source_dir of the config, where the decode tables
+    are read from. The files are taken from the file catalog.
+
+    Args:
+        source_dir (Path): directory with converted eencijfer-files.
+
+    Returns:
+        str: fingerprint.
+    """
+    fingerprint = hashlib.sha1()
+    dirs = {Path(source_dir).absolute(), config.getpath('default', 'source_dir').absolute()}
+    for directory in sorted(dirs):
+        if not directory.is_dir():
+            continue
+        entries = [entry for entry in file_catalog.entries(directory) if entry.suffix == '.parquet']
+        for dataset_dir in [d for d in file_catalog.directories(directory) if d.suffix == '.parquet']:
+            for partition in file_catalog.directories(dataset_dir):
+                entries += [entry for entry in file_catalog.entries(partition) if entry.suffix == '.parquet']
+        for entry in sorted(entries, key=lambda entry: entry.path):
+            fingerprint.update(f"{entry.path}|{entry.size}|{entry.mtime_ns}|{entry.header_hash}".encode())
+    return fingerprint.hexdigest()
+
+
+class AssetCache:
+    """Size-bounded cache for data assets, keyed by name, parameters and source fingerprint.
+
+    When the total size of the cached assets exceeds `max_bytes`, the least
+    recently used assets are removed. Every asset is created only once, also
+    when it is requested from several threads at the same time. Cached assets
+    are shared: add columns to the returned (shallow) copy, but do not change
+    values in place.
+    """
+
+    def __init__(self, max_bytes: int):
+        """Create an empty cache.
+
+        Args:
+            max_bytes (int): maximum total size of the cached assets in bytes.
+        """
+        self.max_bytes = max_bytes
+        self._assets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict = {}
+
+    @staticmethod
+    def _key(name: str, source_dir: Path, params: dict) -> tuple:
+        return (name, _fingerprint(source_dir), repr(sorted(params.items())))
+
+    def get(self, name: str, source_dir: Path, **params) -> Optional[pd.DataFrame]:
+        """Get an asset from the cache, without creating it.
+
+        Args:
+            name (str): name of the asset.
+            source_dir (Path): directory with converted eencijfer-files.
+
+        Returns:
+            Optional[pd.DataFrame]: the asset, None if it is not in the cache.
+        """
+        return self._get(self._key(name, source_dir, params))
+
+    def _get(self, key: tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if key not in self._assets:
+                return None
+            self._assets.move_to_end(key)
+            data, _ = self._assets[key]
+        logger.debug(f"Asset {key[0]} found in cache.")
+        return data.copy(deep=False)
+
+    def get_or_create(
+        self, name: str, source_dir: Path, create: Callable[[], pd.DataFrame], **params
+    ) -> pd.DataFrame:
+        """Get an asset from the cache, create it when it is not there.
+
+        Args:
+            name (str): name of the asset.
+            source_dir (Path): directory with converted eencijfer-files.
+            create (Callable[[], pd.DataFrame]): function that creates the asset.
+
+        Returns:
+            pd.DataFrame: the asset.
+        """
+        key = self._key(name, source_dir, params)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            data = self._get(key)
+            if data is not None:
+                return data
+
+            logger.debug(f"Asset {name} not in cache, creating it...")
+            data = create()
+            self._put(key, data)
+            return data.copy(deep=False)
+
+    def _put(self, key: tuple, data: pd.DataFrame) -> None:
+        """Add an asset and remove least recently used assets when the cache is too big.
+
+        Args:
+            key (tuple): key of the asset.
+            data (pd.DataFrame): the asset.
+        """
+        nbytes = int(data.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            logger.debug(f"Asset {key[0]} ({nbytes} bytes) is bigger than the cache, not caching it.")
+            return
+
+        with self._lock:
+            self._assets[key] = (data, nbytes)
+            while sum(size for _, size in self._assets.values()) > self.max_bytes:
+                evicted_key, _ = self._assets.popitem(last=False)
+                self._key_locks.pop(evicted_key, None)
+                logger.debug(f"Removed asset {evicted_key[0]} from cache.")
+
+    def clear(self) -> None:
+        """Remove all assets from the cache."""
+        with self._lock:
+            self._assets.clear()
+            self._key_locks.clear()
+
+
+asset_cache = AssetCache(max_bytes=config.getint('default', 'asset_cache_max_mb') * 1024 * 1024)
@@ -2,48 +2,122 @@
 
 import logging
 from pathlib import Path
+from typing import Callable, List, Optional
 
 import numpy as np
 import pandas as pd
 
+from eencijfer.assets.cache import asset_cache
 from eencijfer.assets.eencijfer import _create_eencijfer_df
-from eencijfer.settings import config
+from eencijfer.assets.engines import CohortEngine  # noqa: F401
+from eencijfer.assets.transformations.dtypes import _as_category, _without_categories
+from eencijfer.assets.transformations.lookup import _append_columns, _gather_lookup_columns
+from eencijfer.utils.debug import _debug, _debug_data
 
 logger = logging.getLogger(__name__)
 
-def create_actief_hoofd_eerstejaar_instelling(source_dir: Path, eencijfer: pd.DataFrame) -> pd.DataFrame:
+# Filters die al bij het inlezen van eencijfer worden toegepast (zie _read_parquet), de filters
+# in pandas blijven nodig.
+INSTROOM_FILTERS = [("IndicatieActiefOpPeildatum", "==", 1), ("SoortInschrijvingHogerOnderwijs", "==", "1")]
+HOOFDINSCHRIJVING_FILTERS = [("SoortInschrijvingHogerOnderwijs", "==", "1")]
+JAAR2_FILTERS = HOOFDINSCHRIJVING_FILTERS
+DIPLOMA_FILTERS = [("OpleidingsfaseActueelVanHetDiploma", "in", ["D", "B"])]
+
+JAAR2_FIELDS = [
+    "PersoonsgebondenNummer",
+    "opleiding",
+    "ActueleInstelling",
+    "Opleidingsvorm",
+    "OpleidingActueelEquivalent",
+]
+
+BACHELORDIPLOMA_FIELDS = [
+    "PersoonsgebondenNummer",
+    "OpleidingActueelEquivalent",
+    "opleiding",
+    "DatumTekeningDiploma",
+    "Diplomajaar",
+    "Opleidingsvorm",
+    "Aantal",
+]
+
+DIPLOMA_FIELDS = BACHELORDIPLOMA_FIELDS + ["EersteJaarAanDezeActueleInstelling", "OpleidingsfaseActueelVanHetDiploma"]
+
+DIPLOMA_BINNEN_JAREN = [4, 5, 6, 7, 8]
+
+INSCHRIJVINGSJAREN_FIELDS = [
+    "PersoonsgebondenNummer",
+    "ActueleInstelling",
+    "Inschrijvingsjaar",
+    "EersteJaarAanDezeActueleInstelling",
+    "SoortInschrijvingHogerOnderwijs",
+]
+
+# Aantal jaren na instroom waarvoor herinschrijving en uitval worden bepaald. Na 1 jaar staat al in
+# HerinschrijvingInstelling en UitvalEerstejaar.
+NA_JAREN = [2, 3, 4]
+
+# Jaren na instroom die in het bitmasker passen.
+MAX_JAREN = 62
+
+# indicatoren met omschrijvingen die vaak herhaald worden
+COHORT_CATEGORY_COLUMNS = ["StatusNa1Jaar", "CohortType", "TypeOpleiding"]
+
+
+def create_actief_hoofd_eerstejaar_instelling(
+    source_dir: Path, eencijfer: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
     """Create df with actieve hoofdinschrijving, eerste jaar instelling.
 
     Every student occurs only once every year (cohort year). Only
     inschrijvingen active at oktober 1. are present.
 
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        eencijfer (Optional[pd.DataFrame], optional): Enriched eencijfer. Defaults to None, then only
+            active hoofdinschrijvingen are read from source_dir.
+
     Returns:
         pd.DataFrame: Dataframe.
     """
-    print(f"DEBUG: eencijfer DataFrame shape: {eencijfer.shape}")
-    print(f"DEBUG: eencijfer columns: {eencijfer.columns.tolist()}")
+    if eencijfer is None:
+        eencijfer = _create_eencijfer_df(source_dir, filters=INSTROOM_FILTERS)
+
+    logger.debug(f"eencijfer has shape {eencijfer.shape}.")
+    _debug(logger, lambda: f"eencijfer columns: {eencijfer.columns.tolist()}")
 
     # Actief op 1 oktober
     filter_actiefopPeildatum = eencijfer.IndicatieActiefOpPeildatum == 1
-    print(f"DEBUG: Rows with IndicatieActiefOpPeildatum == 1: {filter_actiefopPeildatum.sum()}")
-
-    print(f"DEBUG: Unique values in SoortInschrijvingHogerOnderwijs: {eencijfer['SoortInschrijvingHogerOnderwijs'].unique()}")
-    print(f"DEBUG: Value counts of SoortInschrijvingHogerOnderwijs:\n{eencijfer['SoortInschrijvingHogerOnderwijs'].value_counts()}")
-
+    _debug_data(
+        logger,
+        "Rows with IndicatieActiefOpPeildatum == 1",
+        eencijfer,
+        lambda d: (d.IndicatieActiefOpPeildatum == 1).sum(),
+    )
+    _debug_data(
+        logger,
+        "Value counts of SoortInschrijvingHogerOnderwijs",
+        eencijfer,
+        lambda d: d.SoortInschrijvingHogerOnderwijs.value_counts(dropna=False).to_dict(),
+    )
 
     # Hoofdinschrijving
     filter_soortinschrijving_ho = eencijfer.SoortInschrijvingHogerOnderwijs == '1'
-    print(f"DEBUG: Rows with SoortInschrijvingHogerOnderwijs == 1: {filter_soortinschrijving_ho.sum()}")
 
     # Eerstejaar
     filter_eerstejaar_instelling = eencijfer.Inschrijvingsjaar == eencijfer.EersteJaarAanDezeActueleInstelling
-    print(f"DEBUG: Rows with Inschrijvingsjaar == EersteJaarAanDezeActueleInstelling: {filter_eerstejaar_instelling.sum()}")
+    _debug_data(
+        logger,
+        "Rows with Inschrijvingsjaar == EersteJaarAanDezeActueleInstelling",
+        eencijfer,
+        lambda d: (d.Inschrijvingsjaar == d.EersteJaarAanDezeActueleInstelling).sum(),
+    )
 
     instroom = eencijfer[
         (filter_eerstejaar_instelling) & (filter_soortinschrijving_ho) & (filter_actiefopPeildatum)
     ].copy()
 
-    print(f"DEBUG: Final instroom DataFrame shape: {instroom.shape}")
+    logger.debug(f"Instroom has shape {instroom.shape}.")
 
     return instroom
 
@@ -71,90 +145,113 @@ def create_actief_hoofd_eerstejaar_instelling(source_dir: Path, eencijfer: pd.Da
 #     return instroom
 
 
-def create_inschrijving_jaar2(source_dir: Path, eencijfer: pd.DataFrame) -> pd.DataFrame:
+def create_inschrijving_jaar2(source_dir: Path, eencijfer: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """Filters eencijfer for second year institution with hoofdopleiding.
 
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        eencijfer (Optional[pd.DataFrame], optional): Enriched eencijfer. Defaults to None, then only
+            the needed rows and columns are read from source_dir.
+
     Returns:
         pd.DataFrame: Df with hoofdinschrijvingen in year 2.
     """
-    eencijfer = _create_eencijfer_df(source_dir)
+    if eencijfer is None:
+        eencijfer = _create_eencijfer_df(
+            source_dir,
+            columns=JAAR2_FIELDS
+            + ["Inschrijvingsjaar", "EersteJaarAanDezeActueleInstelling", "SoortInschrijvingHogerOnderwijs"],
+            filters=JAAR2_FILTERS,
+        )
 
     filter_tweede_jaar = eencijfer.Inschrijvingsjaar == eencijfer.EersteJaarAanDezeActueleInstelling + 1
-    filter_soortinschrijving_ho = eencijfer.SoortInschrijvingHogerOnderwijs == 1
-
-    fields_jaar2 = [
-        "PersoonsgebondenNummer",
-        "opleiding",
-        "ActueleInstelling",
-        "Opleidingsvorm",
-        "OpleidingActueelEquivalent",
-    ]
+    filter_soortinschrijving_ho = eencijfer.SoortInschrijvingHogerOnderwijs == '1'
 
-    inschrijvingen_tweede_jaar = eencijfer[(filter_tweede_jaar) & (filter_soortinschrijving_ho)][fields_jaar2].copy()
+    inschrijvingen_tweede_jaar = eencijfer[(filter_tweede_jaar) & (filter_soortinschrijving_ho)][JAAR2_FIELDS].copy()
     return inschrijvingen_tweede_jaar
 
-def create_propedeuse_diplomas(eencijfer: pd.DataFrame) -> pd.DataFrame:
-    """Create a table with propedeuse-diplomas.
+
+def create_inschrijvingsjaren(source_dir: Path, eencijfer: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Create a table with the years a student has a hoofdinschrijving at an instelling.
+
+    The years are stored as a bitmask relative to EersteJaarAanDezeActueleInstelling:
+    bit k is set when the student has a hoofdinschrijving at the instelling k years
+    after the first year. Every extra year to look at costs only a bit-shift.
+
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        eencijfer (Optional[pd.DataFrame], optional): Enriched eencijfer. Defaults to None, then only
+            the needed rows and columns are read from source_dir.
 
     Returns:
-        pd.DataFrame: _description_
+        pd.DataFrame: Df with PersoonsgebondenNummer, ActueleInstelling and Inschrijvingsjaren.
     """
+    if eencijfer is None:
+        eencijfer = _create_eencijfer_df(
+            source_dir, columns=INSCHRIJVINGSJAREN_FIELDS, filters=HOOFDINSCHRIJVING_FILTERS
+        )
 
-    source_dir = config.getpath('default', 'source_dir')
-    eencijfer = _create_eencijfer_df(source_dir)
-    print(f"DEBUG: eencijfer shape at start: {eencijfer.shape}")
+    hoofdinschrijvingen = eencijfer[eencijfer.SoortInschrijvingHogerOnderwijs == '1']
+    jaar = (hoofdinschrijvingen.Inschrijvingsjaar - hoofdinschrijvingen.EersteJaarAanDezeActueleInstelling).to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    filter_jaar = (jaar >= 0) & (jaar <= MAX_JAREN)
 
-    fields = [
-        "PersoonsgebondenNummer",
-        "OpleidingActueelEquivalent",
-        "EersteJaarAanDezeActueleInstelling",
-        "DatumTekeningDiploma",
-        "opleiding",
-        "Diplomajaar",
-    ]
+    keys = hoofdinschrijvingen.loc[filter_jaar, ["PersoonsgebondenNummer", "ActueleInstelling"]]
+    codes, studenten = pd.MultiIndex.from_frame(keys).factorize()
+    inschrijvingsjaren = np.zeros(len(studenten), dtype=np.int64)
+    np.bitwise_or.at(inschrijvingsjaren, codes, np.left_shift(1, jaar[filter_jaar].astype(np.int64)))
 
-    print(f"DEBUG: Columns in eencijfer: {eencijfer.columns.tolist()}")
+    result = studenten.to_frame(index=False, name=list(keys.columns))
+    result["Inschrijvingsjaren"] = inschrijvingsjaren
+    return result
 
-    # Check if required fields are present
-    missing_fields = [field for field in fields if field not in eencijfer.columns]
-    if missing_fields:
-        print(f"DEBUG: Missing fields in eencijfer: {missing_fields}")
 
-    print(eencijfer['OpleidingsfaseActueelVanHetDiploma'].unique())
+def create_diplomas(source_dir: Path, eencijfer: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Create a table with propedeuse- and bachelor-diplomas, the first obtained diploma first.
 
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        eencijfer (Optional[pd.DataFrame], optional): Enriched eencijfer. Defaults to None, then only
+            the needed rows and columns are read from source_dir.
 
-    # Alleen het eerst gehaalde propedeuse-diploma telt mee.
-    filter_diplomajaar = eencijfer.Diplomajaar.notnull()
-    filter_opleidingsfase = eencijfer.OpleidingsfaseActueelVanHetDiploma == "D"
+    Returns:
+        pd.DataFrame: Df with diplomas, sorted by Diplomajaar.
+    """
+    if eencijfer is None:
+        eencijfer = _create_eencijfer_df(source_dir, columns=DIPLOMA_FIELDS, filters=DIPLOMA_FILTERS)
 
-    print(f"DEBUG: Rows with non-null Diplomajaar: {filter_diplomajaar.sum()}")
-    print(f"DEBUG: Rows with OpleidingsfaseActueelVanHetDiploma == 'D': {filter_opleidingsfase.sum()}")
+    filter_opleidingsfase = eencijfer.OpleidingsfaseActueelVanHetDiploma.isin(["D", "B"])
+    diplomas = eencijfer[filter_opleidingsfase][DIPLOMA_FIELDS]
 
-    propedeusediplomas = eencijfer[filter_diplomajaar & filter_opleidingsfase][fields]
-    print(f"DEBUG: Shape after initial filtering: {propedeusediplomas.shape}")
+    # Eén (stabiele) sortering voor alle diploma's; bij gelijk Diplomajaar telt de volgorde in eencijfer.
+    diplomas = diplomas.sort_values(by="Diplomajaar", ascending=True, kind="stable")
+    logger.debug(f"Diplomas has shape {diplomas.shape}.")
 
-    propedeusediplomas = (
-        propedeusediplomas
-        .sort_values(by="Diplomajaar", ascending=True)
-        .drop_duplicates(
-            subset=[
-                "PersoonsgebondenNummer",
-            ],
-            keep="first",
-        )
-        .copy()
-    )
-    print(f"DEBUG: Shape after sorting and dropping duplicates: {propedeusediplomas.shape}")
+    return diplomas
 
-    propedeusediplomas = propedeusediplomas.rename(
-        columns={
-            "Diplomajaar": "JaarPropedeuseDiploma",
-        }
-    )
 
-    print(f"DEBUG: Final shape of propedeusediplomas: {propedeusediplomas.shape}")
+def _eerste_diplomas(diplomas: pd.DataFrame) -> tuple:
+    """Select the first propedeuse-diploma, bachelor-diploma and bachelor-diploma per opleiding.
+
+    Args:
+        diplomas (pd.DataFrame): diplomas sorted by Diplomajaar, see create_diplomas.
+
+    Returns:
+        tuple: first propedeuse-diploma per student, first bachelor-diploma per student and
+            first bachelor-diploma per student and opleiding.
+    """
+    filter_propedeuse = (diplomas.OpleidingsfaseActueelVanHetDiploma == "D") & diplomas.Diplomajaar.notnull()
+    filter_bachelor = (diplomas.OpleidingsfaseActueelVanHetDiploma == "B") & (diplomas.Diplomajaar != 0)
+
+    # Omdat diplomas gesorteerd is, is de eerste rij per groep het eerst gehaalde diploma.
+    propedeuse = diplomas[filter_propedeuse]
+    propedeuse = propedeuse[~propedeuse.PersoonsgebondenNummer.duplicated()]
+    bachelor = diplomas[filter_bachelor][BACHELORDIPLOMA_FIELDS]
+    een_diploma = bachelor[~bachelor.PersoonsgebondenNummer.duplicated()]
+    dit_diploma = bachelor[~bachelor.duplicated(subset=["PersoonsgebondenNummer", "opleiding"])]
+    return propedeuse, een_diploma, dit_diploma
 
-    return propedeusediplomas
 
 # def create_propedeuse_diplomas(eencijfer: pd.DataFrame) -> pd.DataFrame:
 #     """Create a table with propedeuse-diplomas.
@@ -220,154 +317,90 @@ def merge_cohort_inschrijving_jaar2(instroom: pd.DataFrame, inschrijvingen_tweed
     return instroom_uitval_switch
 
 
-def create_bachelordiplomas(eencijfer: pd.DataFrame) -> pd.DataFrame:
-    """Create table with bachelor-degrees.
-
-    Args:
-        eencijfer (pd.DataFrame): Eencijfer-table.
-
-    Returns:
-        pd.DataFrame: Df with bachelor-degrees.
-    """
-
-    fields = [
-        "PersoonsgebondenNummer",
-        "OpleidingActueelEquivalent",
-        "opleiding",
-        "DatumTekeningDiploma",
-        "Diplomajaar",
-        "Opleidingsvorm",
-        "Aantal",
-    ]
-
-    bachelordiplomas = eencijfer[(eencijfer.Diplomajaar != 0) & (eencijfer.OpleidingsfaseActueelVanHetDiploma == "B")][
-        fields
-    ].copy()
-    return bachelordiplomas
-
+def _add_diploma_indicatoren(data: pd.DataFrame, diplomas: pd.DataFrame) -> pd.DataFrame:
+    """Add indicators for propedeuse in 1 jaar, een bachelordiploma and dit bachelordiploma.
 
-def add_propedeuse_in_1_jaar(data: pd.DataFrame, eencijfer: pd.DataFrame) -> pd.DataFrame:
-    """Add 1/0 column with propedeuse in 1 year and Uitval1JaarMetPropedeuse.
+    The first diplomas are looked up per student (and per opleiding for dit diploma)
+    and all columns are added to data at once, without merging data.
 
     Args:
-        data (pd.DataFrame): Eencijfer-df.
+        data (pd.DataFrame): Cohort-table with UitvalEerstejaar and HerinschrijvingInstelling.
+        diplomas (pd.DataFrame): diplomas sorted by Diplomajaar, see create_diplomas.
 
     Returns:
-        pd.DataFrame: Eencijfer with 2 columns added.
+        pd.DataFrame: data with the diploma-indicators added.
     """
+    propedeuse, een_diploma, dit_diploma = _eerste_diplomas(diplomas)
 
-    # p_diploma = data.OpleidingsfaseActueelVanHetDiploma=='D'
-    p_diplomas = create_propedeuse_diplomas(eencijfer)
-    pgn_p_in_cohort_jaar = p_diplomas[
-        p_diplomas.EersteJaarAanDezeActueleInstelling == p_diplomas.JaarPropedeuseDiploma
-    ].PersoonsgebondenNummer.tolist()
-    pgn_p_in_cohort_jaar_plus_1 = p_diplomas[
-        p_diplomas.EersteJaarAanDezeActueleInstelling + 1 == p_diplomas.JaarPropedeuseDiploma
-    ].PersoonsgebondenNummer.tolist()
-    #    p_in_cohort_jaar_plus_1 = data.EersteJaarAanDezeActueleInstelling + 1 == p_diploma.Diplomajaar
-
-    data["PropedeuseIn1Jaar"] = np.where(data.PersoonsgebondenNummer.isin(pgn_p_in_cohort_jaar), 1, 0)
-
-    data["PropedeuseIn2Jaar"] = np.where(data.PersoonsgebondenNummer.isin(pgn_p_in_cohort_jaar), 1, 0)
-    data["PropedeuseIn2Jaar"] = np.where(
-        data.PersoonsgebondenNummer.isin(pgn_p_in_cohort_jaar_plus_1),
-        1,
-        data["PropedeuseIn2Jaar"],
+    p_diploma = _gather_lookup_columns(
+        data,
+        propedeuse[["PersoonsgebondenNummer", "EersteJaarAanDezeActueleInstelling", "Diplomajaar"]],
+        left_on="PersoonsgebondenNummer",
+    )
+    eerste_jaar_p = p_diploma.iloc[:, 0]
+    jaar_p = p_diploma.iloc[:, 1]
+    p_in_cohort_jaar = eerste_jaar_p == jaar_p
+    p_in_cohort_jaar_plus_1 = eerste_jaar_p + 1 == jaar_p
+
+    indicatoren = pd.DataFrame(index=data.index)
+    indicatoren["PropedeuseIn1Jaar"] = np.where(p_in_cohort_jaar, 1, 0)
+    indicatoren["PropedeuseIn2Jaar"] = np.where(p_in_cohort_jaar | p_in_cohort_jaar_plus_1, 1, 0)
+    indicatoren["Uitval1JaarMetPropedeuse"] = np.where(
+        (data.UitvalEerstejaar == 1) & (indicatoren.PropedeuseIn1Jaar == 1), 1, 0
+    )
+    indicatoren["HerinschrijvingMetPropedeuse"] = np.where(
+        (data.HerinschrijvingInstelling == 1) & (indicatoren.PropedeuseIn1Jaar == 1), 1, 0
     )
 
-    data["Uitval1JaarMetPropedeuse"] = np.where((data.UitvalEerstejaar == 1) & (data.PropedeuseIn1Jaar == 1), 1, 0)
-
-    return data
-
-
-def _add_herinschrijver_met_propedeuse(data: pd.DataFrame) -> pd.DataFrame:
-    """Add 1/0 column with herinschrijver with propedeuse.
-
-    Args:
-        data (pd.DataFrame): _description_
-
-    Returns:
-        pd.DataFrame: _description_
-    """
-
-    logger.info("Voeg herinschrijving met p toe")
-
-    filter_herinschrijver = data.HerinschrijvingInstelling == 1
-    filter_propedeuse = data.PropedeuseIn1Jaar == 1
-    data["HerinschrijvingMetPropedeuse"] = np.where((filter_herinschrijver) & (filter_propedeuse), 1, 0)
-    return data
-
-
-def _add_een_diploma(data: pd.DataFrame, bachelordiplomas: pd.DataFrame) -> pd.DataFrame:
-    """Add column with 'een bachelordiploma'.
-
-    Args:
-        data (pd.DataFrame): _description_
-        bachelordiplomas (pd.DataFrame): _description_
+    # een bachelordiploma
+    een = _gather_lookup_columns(data, een_diploma, left_on="PersoonsgebondenNummer", suffix="_EenDiploma")
+    een["BachelorDiploma"] = een["Aantal_EenDiploma"].fillna(0)
+    een["JaarTotEenDiploma"] = een.Diplomajaar_EenDiploma - data.EersteJaarAanDezeActueleInstelling
+    for jaren in DIPLOMA_BINNEN_JAREN:
+        een[f"EenDiplomaBinnen{jaren}jaar"] = np.where(een["JaarTotEenDiploma"] <= jaren - 1, 1, 0)
 
-    Returns:
-        pd.DataFrame: Eencijfer or cohort added columns.
-    """
-    een_bachelordiploma = (
-        bachelordiplomas.sort_values(by="Diplomajaar", ascending=True)
-        .drop_duplicates(
-            subset=[
-                "PersoonsgebondenNummer",
-            ],
-            keep="first",
-        )
-        .copy()
-    )
-    result = pd.merge(
-        data,
-        een_bachelordiploma,
-        left_on="PersoonsgebondenNummer",
-        right_on="PersoonsgebondenNummer",
-        how="left",
-        suffixes=["", "_EenDiploma"],
+    # dit bachelordiploma: zelfde opleiding als in het eerste jaar
+    dit = _gather_lookup_columns(
+        data, dit_diploma, left_on=["PersoonsgebondenNummer", "opleiding"], suffix="_DitDiploma"
     )
-    result["BachelorDiploma"] = result["Aantal_EenDiploma"].fillna(0)
-    result["JaarTotEenDiploma"] = result.Diplomajaar_EenDiploma - result.EersteJaarAanDezeActueleInstelling
-    result["EenDiplomaBinnen4jaar"] = np.where(result["JaarTotEenDiploma"] <= 3, 1, 0)
-    result["EenDiplomaBinnen5jaar"] = np.where(result["JaarTotEenDiploma"] <= 4, 1, 0)
-    result["EenDiplomaBinnen6jaar"] = np.where(result["JaarTotEenDiploma"] <= 5, 1, 0)
-    result["EenDiplomaBinnen7jaar"] = np.where(result["JaarTotEenDiploma"] <= 6, 1, 0)
-    result["EenDiplomaBinnen8jaar"] = np.where(result["JaarTotEenDiploma"] <= 7, 1, 0)
 
-    if not len(data) == len(result):
-        raise Exception('Something went wrong with merge.')
+    logger.debug(f"First diplomas: {len(propedeuse)} propedeuse, {len(een_diploma)} bachelor.")
+    return _append_columns(data, pd.concat([indicatoren, een, dit], axis=1))
 
-    return result
 
+def _add_inschrijving_na_jaren(
+    data: pd.DataFrame, inschrijvingsjaren: pd.DataFrame, na_jaren: List[int] = NA_JAREN
+) -> pd.DataFrame:
+    """Add 1/0 columns with herinschrijving and uitval after a number of years.
 
-def _add_dit_diploma(data: pd.DataFrame, bachelordiplomas: pd.DataFrame) -> pd.DataFrame:
-    """Add column with 'dit diploma', indicating same croho as in first year.
+    HerinschrijvingNa{n}Jaar is 1 when the student has a hoofdinschrijving at the same
+    instelling n years after the first year. UitvalNa{n}Jaar is 1 when that is not the
+    case and the student did not get a ho-diploma in the first year or a bachelordiploma
+    within n years.
 
     Args:
-        data (pd.DataFrame): _description_
-        bachelordiplomas (pd.DataFrame): _description_
+        data (pd.DataFrame): Cohort-table with JaarTotEenDiploma and HoDiplomaInEersteJaar.
+        inschrijvingsjaren (pd.DataFrame): bitmask of years with hoofdinschrijving, see create_inschrijvingsjaren.
+        na_jaren (List[int], optional): Numbers of years after the first year. Defaults to NA_JAREN.
 
     Returns:
-        pd.DataFrame: _description_
+        pd.DataFrame: data with two columns per number of years added.
     """
+    jaren = _gather_lookup_columns(
+        data, inschrijvingsjaren, left_on=["PersoonsgebondenNummer", "ActueleInstelling"]
+    ).Inschrijvingsjaren
+    jaren = jaren.fillna(0).to_numpy(dtype=np.int64)
 
-    dit_bachelordiploma = (
-        bachelordiplomas.sort_values(by="Diplomajaar", ascending=True)
-        .drop_duplicates(subset=["PersoonsgebondenNummer", "opleiding"], keep="first")
-        .copy()
-    )
-    result = pd.merge(
-        data,
-        dit_bachelordiploma,
-        left_on=["PersoonsgebondenNummer", "opleiding"],
-        right_on=["PersoonsgebondenNummer", "opleiding"],
-        how="left",
-        suffixes=["", "_DitDiploma"],
-    )
-    if not len(data) == len(result):
-        raise Exception('Something went wrong with merge.')
+    indicatoren = pd.DataFrame(index=data.index)
+    for n in na_jaren:
+        if not 0 < n <= MAX_JAREN:
+            raise Exception(f"Number of years should be between 1 and {MAX_JAREN}, not {n}.")
+        ingeschreven = (jaren >> n) & 1
+        diploma = (data.JaarTotEenDiploma <= n - 1) | (data.HoDiplomaInEersteJaar == 1)
+        indicatoren[f"HerinschrijvingNa{n}Jaar"] = ingeschreven
+        indicatoren[f"UitvalNa{n}Jaar"] = np.where((ingeschreven == 0) & ~diploma, 1, 0)
 
-    return result
+    return _append_columns(data, indicatoren)
 
 
 def _add_status_student(data: pd.DataFrame, field: str = "StatusNa1Jaar") -> pd.DataFrame:
@@ -440,7 +473,7 @@ def _add_status_student(data: pd.DataFrame, field: str = "StatusNa1Jaar") -> pd.
 #         raise Exception('Something went wrong with merge.')
 
 #     # diploma in 1 jaar:
-#     result = add_propedeuse_in_1_jaar(result, eencijfer)
+#     result = add_propedeuse_in_1_jaar(result, propedeusediplomas)
 
 #     result = _add_herinschrijver_met_propedeuse(result)
 
@@ -457,29 +490,69 @@ def _add_status_student(data: pd.DataFrame, field: str = "StatusNa1Jaar") -> pd.
 
 #     return result
 
-def create_cohorten_met_indicatoren(source_dir: Path, eencijfer: pd.DataFrame) -> pd.DataFrame:
+def create_cohorten_met_indicatoren(
+    source_dir: Path,
+    eencijfer: Optional[pd.DataFrame] = None,
+    engine: CohortEngine = CohortEngine.pandas,
+    use_cache: bool = True,
+) -> pd.DataFrame:
     """Create cohorten-table from all parts.
 
+    The intermediate tables (instroom, inschrijvingen in jaar 2, diplomas and
+    inschrijvingsjaren) are taken from eencijfer if it is given or in the asset-cache.
+    Otherwise only the rows and columns they need are read from source_dir. Either
+    way they are cached, so they are created only once. Use `use_cache=False` when
+    eencijfer is a part of the full eencijfer, e.g. only the students of some cohorts.
+
+    With the duckdb-engine the same table is computed with one SQL-query over the
+    enriched eencijfer, see `_create_cohorten_met_indicatoren_duckdb`.
+
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        eencijfer (Optional[pd.DataFrame], optional): Enriched eencijfer. Defaults to None.
+        engine (CohortEngine, optional): Engine used for the indicators. Defaults to CohortEngine.pandas.
+        use_cache (bool, optional): Get and put eencijfer and intermediate tables in the asset-cache.
+            Defaults to True.
+
     Returns:
         pd.DataFrame: Cohort table with indicators for the first year.
     """
-    eencijfer = _create_eencijfer_df(source_dir)
-    print("DEBUG: Starting create_cohorten_met_indicatoren function")
 
-    instroom = create_actief_hoofd_eerstejaar_instelling(source_dir, eencijfer)
-    print(f"DEBUG: After create_actief_hoofd_eerstejaar_instelling, instroom has {len(instroom)} rows.")
+    def _get_or_create(name: str, create: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        if use_cache:
+            return asset_cache.get_or_create(name, source_dir, create)
+        return create()
 
-    inschrijvingen_tweede_jaar = create_inschrijving_jaar2(source_dir, eencijfer)
-    print(f"DEBUG: After create_inschrijving_jaar2, inschrijvingen_tweede_jaar has {len(inschrijvingen_tweede_jaar)} rows.")
+    if eencijfer is None and use_cache:
+        eencijfer = asset_cache.get("eencijfer", source_dir)
 
-    propedeusediplomas = create_propedeuse_diplomas(eencijfer)
-    print(f"DEBUG: After create_propedeuse_diplomas, propedeusediplomas has {len(propedeusediplomas)} rows.")
+    if engine.value == 'duckdb':
+        from eencijfer.assets.cohorten_duckdb import _create_cohorten_met_indicatoren_duckdb
 
-    bachelordiplomas = create_bachelordiplomas(eencijfer)
-    print(f"DEBUG: After create_bachelordiplomas, bachelordiplomas has {len(bachelordiplomas)} rows.")
+        if eencijfer is None:
+            eencijfer = _get_or_create("eencijfer", lambda: _create_eencijfer_df(source_dir))
+        return _as_category(_create_cohorten_met_indicatoren_duckdb(eencijfer), COHORT_CATEGORY_COLUMNS)
+
+    instroom = _get_or_create("instroom", lambda: create_actief_hoofd_eerstejaar_instelling(source_dir, eencijfer))
+    logger.debug(f"After create_actief_hoofd_eerstejaar_instelling, instroom has {len(instroom)} rows.")
+
+    inschrijvingen_tweede_jaar = _get_or_create(
+        "inschrijvingen_tweede_jaar", lambda: create_inschrijving_jaar2(source_dir, eencijfer)
+    )
+    logger.debug(
+        f"After create_inschrijving_jaar2, inschrijvingen_tweede_jaar has {len(inschrijvingen_tweede_jaar)} rows."
+    )
+
+    diplomas = _get_or_create("diplomas", lambda: create_diplomas(source_dir, eencijfer))
+    logger.debug(f"After create_diplomas, diplomas has {len(diplomas)} rows.")
+
+    inschrijvingsjaren = _get_or_create(
+        "inschrijvingsjaren", lambda: create_inschrijvingsjaren(source_dir, eencijfer)
+    )
+    logger.debug(f"After create_inschrijvingsjaren, inschrijvingsjaren has {len(inschrijvingsjaren)} rows.")
 
     result = merge_cohort_inschrijving_jaar2(instroom, inschrijvingen_tweede_jaar)
-    print(f"DEBUG: After merge_cohort_inschrijving_jaar2, result has {len(result)} rows.")
+    logger.debug(f"After merge_cohort_inschrijving_jaar2, result has {len(result)} rows.")
 
     result["UitvalEerstejaar"] = np.where(
         ((result.ActueleInstelling == result.ActueleInstelling_2ejaar) | (result.HoDiplomaInEersteJaar == 1)),
@@ -504,34 +577,29 @@ def create_cohorten_met_indicatoren(source_dir: Path, eencijfer: pd.DataFrame) -
     )
 
     if not len(instroom) == len(result):
-        print("DEBUG: Warning - length of instroom does not match length of result after merging and calculations.")
-        raise Exception('Something went wrong with merge.')
-
-    result = add_propedeuse_in_1_jaar(result, eencijfer)
-    print(f"DEBUG: After add_propedeuse_in_1_jaar, result has {len(result)} rows.")
-
-    result = _add_herinschrijver_met_propedeuse(result)
-    print(f"DEBUG: After _add_herinschrijver_met_propedeuse, result has {len(result)} rows.")
+        raise Exception(
+            f'Something went wrong with merge: instroom has {len(instroom)} rows, the result {len(result)} rows.'
+        )
 
-    result = _add_een_diploma(result, bachelordiplomas)
-    print(f"DEBUG: After _add_een_diploma, result has {len(result)} rows.")
+    result = _add_diploma_indicatoren(result, diplomas)
+    logger.debug(f"After _add_diploma_indicatoren, result has {len(result)} rows.")
 
-    result = _add_dit_diploma(result, bachelordiplomas)
-    print(f"DEBUG: After _add_dit_diploma, result has {len(result)} rows.")
+    result = _add_inschrijving_na_jaren(result, inschrijvingsjaren)
 
     result = _add_status_student(result)
-    print(f"DEBUG: After _add_status_student, result has {len(result)} rows.")
+    logger.debug(f"After _add_status_student, result has {len(result)} rows.")
 
-    print("DEBUG: Adding Cohort information")
     result["Cohort"] = result["Inschrijvingsjaar"]
-    result["CohortType"] = result["InPACohortDefinitie"].replace({"Ja": "EersteKeerHO", "Nee": "EersteKeerHsl"})
-    result["TypeOpleiding"] = result.TypeHogerOnderwijsBinnenSoortHogerOnderwijs.replace(
+    result["CohortType"] = _without_categories(result["InPACohortDefinitie"]).replace(
+        {"Ja": "EersteKeerHO", "Nee": "EersteKeerHsl"}
+    )
+    result["TypeOpleiding"] = _without_categories(result.TypeHogerOnderwijsBinnenSoortHogerOnderwijs).replace(
         {"ba": "bachelor", "ma": "master", "ad": "associate degree"}
     )
 
     if result.empty:
-        print("DEBUG: The resulting table is empty. Check the intermediate steps for potential issues.")
+        logger.warning("Cohorten is empty. Check the intermediate steps for potential issues.")
     else:
-        print(f"DEBUG: The final resulting table has {len(result)} rows.")
+        logger.debug(f"Cohorten has {len(result)} rows.")
 
-    return result
+    return _as_category(result, COHORT_CATEGORY_COLUMNS)
@@ -0,0 +1,379 @@
+"""Data asset cohorten, computed with DuckDB.
+
+Same cohort logic as `eencijfer.assets.cohorten`, expressed as one SQL-query
+over the enriched eencijfer. DuckDB only computes the indicators, the (wide)
+rows of instroom are gathered from eencijfer once, by row number.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eencijfer.assets.cohorten import BACHELORDIPLOMA_FIELDS, JAAR2_FIELDS, MAX_JAREN, NA_JAREN
+from eencijfer.assets.transformations.dtypes import _without_categories
+from eencijfer.io.db import _limit_memory
+
+logger = logging.getLogger(__name__)
+
+# hulpkolom met het rijnummer in eencijfer, om de volgorde van pandas aan te houden
+ROW_NUMBER = "__rij"
+
+PGN = "PersoonsgebondenNummer"
+
+# velden van instroom die nodig zijn voor de indicatoren
+INSTROOM_FIELDS = [
+    "PersoonsgebondenNummer",
+    "Inschrijvingsjaar",
+    "EersteJaarAanDezeActueleInstelling",
+    "ActueleInstelling",
+    "opleiding",
+    "OpleidingActueelEquivalent",
+    "HoDiplomaInEersteJaar",
+    "InPACohortDefinitie",
+    "TypeHogerOnderwijsBinnenSoortHogerOnderwijs",
+]
+
+# velden van eencijfer die de query leest
+QUERY_FIELDS = list(
+    dict.fromkeys(
+        INSTROOM_FIELDS
+        + JAAR2_FIELDS
+        + BACHELORDIPLOMA_FIELDS
+        + ["IndicatieActiefOpPeildatum", "SoortInschrijvingHogerOnderwijs", "OpleidingsfaseActueelVanHetDiploma"]
+    )
+)
+
+INDICATOREN_JAAR1 = [
+    "UitvalEerstejaar",
+    "opleiding_gelijk",
+    "HerinschrijvingInstelling",
+    "SwitchBinnenInstelling",
+    "PropedeuseIn1Jaar",
+    "PropedeuseIn2Jaar",
+    "Uitval1JaarMetPropedeuse",
+    "HerinschrijvingMetPropedeuse",
+]
+
+DIPLOMA_BINNEN_JAREN = [4, 5, 6, 7, 8]
+
+
+def _quote(column: str) -> str:
+    """Quote a column name for use in SQL.
+
+    Args:
+        column (str): column name.
+
+    Returns:
+        str: quoted column name.
+    """
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _merge_columns(left_columns: List[str], right_columns: List[str], keys: List[str], suffix: str) -> Dict[str, str]:
+    """Name the columns of the right table of a left join like `pd.merge` does.
+
+    Key columns are dropped, columns that exist in the left table get suffix.
+
+    Args:
+        left_columns (List[str]): columns of the left table.
+        right_columns (List[str]): columns of the right table.
+        keys (List[str]): join keys, with the same name in both tables.
+        suffix (str): suffix for columns that exist in the left table.
+
+    Returns:
+        Dict[str, str]: new column name and source column for every right-hand column.
+    """
+    columns = {}
+    for col in right_columns:
+        if col in keys:
+            continue
+        name = col + suffix if col in left_columns else col
+        columns[name] = col
+    return columns
+
+
+def _select(columns: Dict[str, str], alias: str) -> str:
+    """Create the select-list for the right-hand columns of a join.
+
+    Args:
+        columns (Dict[str, str]): new column name and source column.
+        alias (str): alias of the right table in the query.
+
+    Returns:
+        str: select-list.
+    """
+    return ",\n        ".join(f"{alias}.{_quote(source)} AS {_quote(name)}" for name, source in columns.items())
+
+
+def _cohorten_query(columns: List[str]) -> tuple:
+    """Create the query for the indicators of cohorten.
+
+    The query returns the row number in eencijfer of every row in instroom and
+    the columns the pandas-implementation adds to instroom, with the same names
+    and in the same order.
+
+    Args:
+        columns (List[str]): columns of the enriched eencijfer.
+
+    Returns:
+        tuple: the query and a dict with the merged columns and their source column.
+    """
+    pgn = _quote(PGN)
+
+    jaar2 = _merge_columns(columns, JAAR2_FIELDS, keys=[PGN], suffix="_2ejaar")
+    cohort_columns = columns + list(jaar2) + INDICATOREN_JAAR1
+    een_diploma = _merge_columns(cohort_columns, BACHELORDIPLOMA_FIELDS, keys=[PGN], suffix="_EenDiploma")
+    cohort_columns = cohort_columns + list(een_diploma)
+    dit_diploma = _merge_columns(cohort_columns, BACHELORDIPLOMA_FIELDS, keys=[PGN, "opleiding"], suffix="_DitDiploma")
+    merged = {**jaar2, **een_diploma, **dit_diploma}
+
+    diploma_binnen_jaren = ",\n        ".join(
+        f"CASE WHEN JaarTotEenDiploma <= {jaren - 1} THEN 1 ELSE 0 END::BIGINT AS EenDiplomaBinnen{jaren}jaar"
+        for jaren in DIPLOMA_BINNEN_JAREN
+    )
+    inschrijving_na_jaren = ",\n        ".join(
+        f"""(coalesce(Inschrijvingsjaren, 0) >> {n}) & 1 AS HerinschrijvingNa{n}Jaar,
+        CASE WHEN (coalesce(Inschrijvingsjaren, 0) >> {n}) & 1 = 0
+            AND NOT coalesce(JaarTotEenDiploma <= {n - 1}, false)
+            AND NOT coalesce(HoDiplomaInEersteJaar = 1, false)
+            THEN 1 ELSE 0 END::BIGINT AS UitvalNa{n}Jaar"""
+        for n in NA_JAREN
+    )
+
+    query = f"""
+    WITH instroom AS (
+        SELECT {', '.join(_quote(col) for col in INSTROOM_FIELDS)}, {ROW_NUMBER}
+        FROM eencijfer
+        WHERE IndicatieActiefOpPeildatum = 1
+            AND SoortInschrijvingHogerOnderwijs = '1'
+            AND Inschrijvingsjaar = EersteJaarAanDezeActueleInstelling
+    ),
+    jaar2 AS (
+        SELECT {', '.join(_quote(col) for col in JAAR2_FIELDS)}
+        FROM eencijfer
+        WHERE Inschrijvingsjaar = EersteJaarAanDezeActueleInstelling + 1
+            AND SoortInschrijvingHogerOnderwijs = '1'
+    ),
+    -- alleen het eerst gehaalde propedeuse-diploma telt mee
+    propedeusediplomas AS (
+        SELECT {pgn}, EersteJaarAanDezeActueleInstelling, Diplomajaar AS JaarPropedeuseDiploma
+        FROM eencijfer
+        WHERE Diplomajaar IS NOT NULL AND OpleidingsfaseActueelVanHetDiploma = 'D'
+        QUALIFY row_number() OVER (PARTITION BY {pgn} ORDER BY Diplomajaar, {ROW_NUMBER}) = 1
+    ),
+    bachelordiplomas AS (
+        SELECT {', '.join(_quote(col) for col in BACHELORDIPLOMA_FIELDS)}, {ROW_NUMBER}
+        FROM eencijfer
+        WHERE (Diplomajaar IS NULL OR Diplomajaar <> 0) AND OpleidingsfaseActueelVanHetDiploma = 'B'
+    ),
+    een_diploma AS (
+        SELECT * FROM bachelordiplomas
+        QUALIFY row_number() OVER (PARTITION BY {pgn} ORDER BY Diplomajaar NULLS LAST, {ROW_NUMBER}) = 1
+    ),
+    dit_diploma AS (
+        SELECT * FROM bachelordiplomas
+        QUALIFY row_number() OVER (
+            PARTITION BY {pgn}, opleiding ORDER BY Diplomajaar NULLS LAST, {ROW_NUMBER}
+        ) = 1
+    ),
+    -- bitmasker met de jaren (vanaf het eerste jaar) met een hoofdinschrijving aan de instelling
+    inschrijvingsjaren AS (
+        SELECT {pgn}, ActueleInstelling,
+            bit_or(1::BIGINT << (Inschrijvingsjaar - EersteJaarAanDezeActueleInstelling)::INTEGER) AS Inschrijvingsjaren
+        FROM eencijfer
+        WHERE SoortInschrijvingHogerOnderwijs = '1'
+            AND Inschrijvingsjaar - EersteJaarAanDezeActueleInstelling BETWEEN 0 AND {MAX_JAREN}
+        GROUP BY {pgn}, ActueleInstelling
+    ),
+    stap_jaar2 AS (
+        SELECT instroom.*,
+        {_select(jaar2, "jaar2")}
+        FROM instroom
+        LEFT JOIN jaar2 ON instroom.{pgn} = jaar2.{pgn}
+    ),
+    stap_uitval AS (
+        SELECT *,
+        CASE WHEN ActueleInstelling = ActueleInstelling_2ejaar OR HoDiplomaInEersteJaar = 1
+            THEN 0 ELSE 1 END::BIGINT AS UitvalEerstejaar,
+        CASE WHEN OpleidingActueelEquivalent = OpleidingActueelEquivalent_2ejaar THEN 1
+            WHEN opleiding = opleiding_2ejaar THEN 1 ELSE 0 END::BIGINT AS opleiding_gelijk,
+        CASE WHEN ActueleInstelling = ActueleInstelling_2ejaar THEN 1 ELSE 0 END::BIGINT AS HerinschrijvingInstelling
+        FROM stap_jaar2
+    ),
+    stap_propedeuse AS (
+        SELECT *,
+        CASE WHEN opleiding_gelijk = 0 AND UitvalEerstejaar = 0 AND HoDiplomaInEersteJaar = 0
+            THEN 1 ELSE 0 END::BIGINT AS SwitchBinnenInstelling,
+        CASE WHEN {pgn} IN (
+            SELECT {pgn} FROM propedeusediplomas WHERE EersteJaarAanDezeActueleInstelling = JaarPropedeuseDiploma
+        ) THEN 1 ELSE 0 END::BIGINT AS PropedeuseIn1Jaar,
+        CASE WHEN {pgn} IN (
+            SELECT {pgn} FROM propedeusediplomas
+            WHERE EersteJaarAanDezeActueleInstelling IN (JaarPropedeuseDiploma, JaarPropedeuseDiploma - 1)
+        ) THEN 1 ELSE 0 END::BIGINT AS PropedeuseIn2Jaar
+        FROM stap_uitval
+    ),
+    stap_een_diploma AS (
+        SELECT stap_propedeuse.*,
+        CASE WHEN UitvalEerstejaar = 1 AND PropedeuseIn1Jaar = 1
+            THEN 1 ELSE 0 END::BIGINT AS Uitval1JaarMetPropedeuse,
+        CASE WHEN HerinschrijvingInstelling = 1 AND PropedeuseIn1Jaar = 1
+            THEN 1 ELSE 0 END::BIGINT AS HerinschrijvingMetPropedeuse,
+        {_select(een_diploma, "een_diploma")},
+        coalesce(een_diploma.Aantal, 0) AS BachelorDiploma,
+        een_diploma.Diplomajaar - stap_propedeuse.EersteJaarAanDezeActueleInstelling AS JaarTotEenDiploma
+        FROM stap_propedeuse
+        LEFT JOIN een_diploma ON stap_propedeuse.{pgn} = een_diploma.{pgn}
+    ),
+    stap_dit_diploma AS (
+        SELECT stap_een_diploma.*,
+        {diploma_binnen_jaren},
+        {_select(dit_diploma, "dit_diploma")}
+        FROM stap_een_diploma
+        LEFT JOIN dit_diploma
+            ON stap_een_diploma.{pgn} = dit_diploma.{pgn}
+            AND stap_een_diploma.opleiding IS NOT DISTINCT FROM dit_diploma.opleiding
+    ),
+    stap_na_jaren AS (
+        SELECT stap_dit_diploma.*,
+        {inschrijving_na_jaren}
+        FROM stap_dit_diploma
+        LEFT JOIN inschrijvingsjaren
+            ON stap_dit_diploma.{pgn} = inschrijvingsjaren.{pgn}
+            AND stap_dit_diploma.ActueleInstelling IS NOT DISTINCT FROM inschrijvingsjaren.ActueleInstelling
+    )
+    SELECT * EXCLUDE ({', '.join(_quote(col) for col in INSTROOM_FIELDS)}),
+        CASE WHEN HoDiplomaInEersteJaar = 1 THEN 'HoDiplomaInEersteJaar'
+            WHEN SwitchBinnenInstelling = 1 THEN 'SwitchBinnenInstelling'
+            WHEN UitvalEerstejaar = 1 THEN 'ValtUitInJaar1'
+            ELSE 'StudeertNogAanHsl' END AS StatusNa1Jaar,
+        Inschrijvingsjaar AS Cohort,
+        CASE InPACohortDefinitie WHEN 'Ja' THEN 'EersteKeerHO' WHEN 'Nee' THEN 'EersteKeerHsl'
+            ELSE InPACohortDefinitie END AS CohortType,
+        CASE TypeHogerOnderwijsBinnenSoortHogerOnderwijs
+            WHEN 'ba' THEN 'bachelor' WHEN 'ma' THEN 'master' WHEN 'ad' THEN 'associate degree'
+            ELSE TypeHogerOnderwijsBinnenSoortHogerOnderwijs END AS TypeOpleiding
+    FROM stap_na_jaren
+    ORDER BY {ROW_NUMBER}
+    """
+    return query, merged
+
+
+def _read_rows(fpath: Path, rows: np.ndarray) -> pd.DataFrame:
+    """Read the given rows of a parquet-file, one batch at a time.
+
+    Args:
+        fpath (Path): parquet-file.
+        rows (np.ndarray): sorted row numbers.
+
+    Returns:
+        pd.DataFrame: the rows, with the dtypes `pd.read_parquet` gives.
+    """
+    parquet_file = pq.ParquetFile(fpath)
+    batches = []
+    start = 0
+    for batch in parquet_file.iter_batches():
+        first, last = np.searchsorted(rows, [start, start + batch.num_rows])
+        batches.append(batch.take(pa.array(rows[first:last] - start)))
+        start += batch.num_rows
+    return pa.Table.from_batches(batches, schema=parquet_file.schema_arrow).to_pandas()
+
+
+def _restore_dtypes(indicatoren: pd.DataFrame, instroom: pd.DataFrame, merged: Dict[str, str]) -> pd.DataFrame:
+    """Give the indicators the dtypes the pandas-implementation gives.
+
+    Columns from a left join get the dtype of their source column, integers
+    with missing values become float like they do in `pd.merge`.
+
+    Args:
+        indicatoren (pd.DataFrame): result of the query.
+        instroom (pd.DataFrame): rows of eencijfer in instroom, with the original dtypes.
+        merged (Dict[str, str]): merged columns and their source columns.
+
+    Returns:
+        pd.DataFrame: indicators with dtypes restored.
+    """
+    dtypes = {col: instroom[source].dtype for col, source in merged.items()}
+    dtypes["Cohort"] = instroom["Inschrijvingsjaar"].dtype
+    dtypes["CohortType"] = _without_categories(instroom["InPACohortDefinitie"]).dtype
+    dtypes["TypeOpleiding"] = _without_categories(instroom["TypeHogerOnderwijsBinnenSoortHogerOnderwijs"]).dtype
+    dtypes["StatusNa1Jaar"] = np.dtype(object)
+
+    for col, dtype in dtypes.items():
+        if pd.api.types.is_integer_dtype(dtype) and indicatoren[col].isna().any():
+            dtype = np.dtype("float64")
+        if indicatoren[col].dtype != dtype:
+            indicatoren[col] = indicatoren[col].astype(dtype)
+
+    # BachelorDiploma is Aantal_EenDiploma met 0 voor missende waarden
+    aantal = next(col for col, source in merged.items() if source == "Aantal")
+    indicatoren["BachelorDiploma"] = indicatoren["BachelorDiploma"].astype(indicatoren[aantal].dtype)
+    return indicatoren
+
+
+def _create_cohorten_met_indicatoren_duckdb(
+    eencijfer: Union[pd.DataFrame, Path], threads: Optional[int] = None
+) -> pd.DataFrame:
+    """Create cohorten-table with DuckDB.
+
+    Args:
+        eencijfer (Union[pd.DataFrame, Path]): Enriched eencijfer, or the path to the
+            eencijfer-asset in parquet-format. A parquet-file is queried by DuckDB
+            directly, so only the rows of instroom are loaded in memory.
+        threads (Optional[int], optional): Number of threads DuckDB uses. Defaults to None, all cores.
+
+    Raises:
+        Exception: Merge gave more rows than instroom.
+
+    Returns:
+        pd.DataFrame: Cohort table with indicators for the first year, the same as
+            `create_cohorten_met_indicatoren` with the pandas-engine.
+    """
+    with duckdb.connect() as con:
+        _limit_memory(con)
+        if threads is not None:
+            con.execute(f"SET threads = {int(threads)}")
+
+        if isinstance(eencijfer, pd.DataFrame):
+            columns = list(eencijfer.columns)
+            # via arrow: DuckDB leest arrow-tabellen zonder de strings per waarde te converteren
+            data = pa.Table.from_pandas(eencijfer[QUERY_FIELDS], preserve_index=False)
+            data = data.append_column(ROW_NUMBER, pa.array(np.arange(len(eencijfer))))
+            con.register("eencijfer", data)
+        else:
+            columns = pq.read_schema(eencijfer).names
+            con.execute(
+                f"""CREATE VIEW eencijfer AS
+                SELECT {', '.join(_quote(col) for col in QUERY_FIELDS)}, file_row_number AS {ROW_NUMBER}
+                FROM read_parquet('{Path(eencijfer).as_posix()}', file_row_number = true)"""
+            )
+
+        query, merged = _cohorten_query(columns)
+        logger.debug("Creating cohorten with DuckDB...")
+        # arrow() geeft in DuckDB 0.10 een tabel en in 1.x een reader; de fetch_-varianten zijn verouderd
+        result = con.sql(query).arrow()
+        if isinstance(result, pa.RecordBatchReader):
+            result = result.read_all()
+        indicatoren = result.to_pandas()
+
+    rows = indicatoren.pop(ROW_NUMBER).to_numpy()
+    if not len(np.unique(rows)) == len(rows):
+        raise Exception('Something went wrong with merge.')
+
+    if isinstance(eencijfer, pd.DataFrame):
+        instroom = eencijfer.take(rows)
+    else:
+        instroom = _read_rows(eencijfer, rows)
+    instroom = instroom.reset_index(drop=True)
+
+    indicatoren = _restore_dtypes(indicatoren, instroom, merged)
+    type_opleiding = indicatoren.pop("TypeOpleiding")
+    result = pd.concat([instroom, indicatoren], axis=1)
+    result["TypeOpleiding"] = type_opleiding
+    return result
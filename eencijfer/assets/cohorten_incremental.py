@@ -0,0 +1,177 @@
+"""Data asset cohorten, stored per cohort and rebuilt incremental.
+
+Every cohort is stored in its own parquet-file, together with a manifest that
+records the input partitions (the rows per Inschrijvingsjaar of the students of the
+cohort) every cohort was created from. The indicators of a cohort only depend on the
+rows of its own students, so a cohort is only computed again when those rows change,
+for example when a new year is delivered and the students of recent cohorts have new
+inschrijvingen or diplomas.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eencijfer import __version__
+from eencijfer.assets.cohorten import (
+    CohortEngine,
+    create_actief_hoofd_eerstejaar_instelling,
+    create_cohorten_met_indicatoren,
+)
+
+logger = logging.getLogger(__name__)
+
+PGN = "PersoonsgebondenNummer"
+
+MANIFEST_FNAME = "_manifest.json"
+
+
+def _partition_fname(cohort: int) -> str:
+    return f"cohorten_{cohort}.parquet"
+
+
+def _cohort_inputs(instroom: pd.DataFrame, eencijfer: pd.DataFrame) -> Dict[int, Dict[str, str]]:
+    """Fingerprint the input partitions of every cohort.
+
+    The input of a cohort are all rows in eencijfer of the students in that cohort.
+    They are fingerprinted per Inschrijvingsjaar (input partition) with the number of
+    rows and the sum of the row hashes.
+
+    Args:
+        instroom (pd.DataFrame): Instroom, see `create_actief_hoofd_eerstejaar_instelling`.
+        eencijfer (pd.DataFrame): Enriched eencijfer.
+
+    Returns:
+        Dict[int, Dict[str, str]]: fingerprint per input partition, per cohort.
+    """
+    cohorten = instroom[[PGN, "Inschrijvingsjaar"]].drop_duplicates().rename(columns={"Inschrijvingsjaar": "Cohort"})
+
+    rijen = pd.DataFrame(
+        {
+            PGN: eencijfer[PGN].array,
+            "Jaar": eencijfer["Inschrijvingsjaar"].array,
+            "Hash": pd.util.hash_pandas_object(eencijfer, index=False).to_numpy(),
+        }
+    )
+    rijen = rijen.merge(cohorten, on=PGN, how="inner")
+
+    codes, partities = pd.MultiIndex.from_frame(rijen[["Cohort", "Jaar"]]).factorize()
+    sommen = np.zeros(len(partities), dtype="uint64")
+    np.add.at(sommen, codes, rijen["Hash"].to_numpy(dtype="uint64"))
+    aantallen = np.bincount(codes, minlength=len(partities))
+
+    inputs: Dict[int, Dict[str, str]] = {}
+    for (cohort, jaar), som, aantal in zip(partities, sommen, aantallen):
+        inputs.setdefault(int(cohort), {})[str(int(jaar))] = f"{aantal}-{int(som):016x}"
+    return {cohort: dict(sorted(jaren.items())) for cohort, jaren in sorted(inputs.items())}
+
+
+def _read_manifest(partition_dir: Path, engine: CohortEngine) -> dict:
+    """Read the manifest of the stored cohorts.
+
+    A manifest of another version of eencijfer or another engine is not used,
+    so all cohorts are computed again.
+
+    Args:
+        partition_dir (Path): directory with the stored cohorts.
+        engine (CohortEngine): engine used for the indicators.
+
+    Returns:
+        dict: input partitions per stored cohort, empty if there is no usable manifest.
+    """
+    fpath = partition_dir / MANIFEST_FNAME
+    if not fpath.is_file():
+        return {}
+
+    try:
+        manifest = json.loads(fpath.read_text())
+    except ValueError:
+        logger.warning(f"Manifest {fpath} could not be read, computing all cohorts.")
+        return {}
+
+    if manifest.get("version") != __version__ or manifest.get("engine") != engine.value:
+        logger.info("Stored cohorts were created with another version or engine, computing all cohorts.")
+        return {}
+    return manifest.get("cohorten", {})
+
+
+def _write_manifest(partition_dir: Path, engine: CohortEngine, cohorten: dict) -> None:
+    manifest = {"version": __version__, "engine": engine.value, "cohorten": cohorten}
+    (partition_dir / MANIFEST_FNAME).write_text(json.dumps(manifest, indent=2))
+
+
+def _read_partitions(partition_dir: Path, cohorts: List[int]) -> pd.DataFrame:
+    """Read stored cohorts into one table, in order of cohort.
+
+    Args:
+        partition_dir (Path): directory with the stored cohorts.
+        cohorts (List[int]): cohorts to read.
+
+    Returns:
+        pd.DataFrame: cohorten.
+    """
+    tables = [pq.read_table(partition_dir / _partition_fname(cohort)) for cohort in sorted(cohorts)]
+    if len(tables) == 0:
+        return pd.DataFrame()
+    table = pa.concat_tables(tables, promote_options="default")
+    return table.to_pandas().reset_index(drop=True)
+
+
+def _create_cohorten_incremental(
+    source_dir: Path,
+    partition_dir: Path,
+    eencijfer: pd.DataFrame,
+    engine: CohortEngine = CohortEngine.pandas,
+) -> pd.DataFrame:
+    """Create cohorten, only computing the cohorts whose input partitions changed.
+
+    Cohorts that are not in eencijfer anymore are removed from partition_dir.
+
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        partition_dir (Path): directory where cohorts and manifest are stored.
+        eencijfer (pd.DataFrame): Enriched eencijfer.
+        engine (CohortEngine, optional): Engine used for the indicators. Defaults to CohortEngine.pandas.
+
+    Returns:
+        pd.DataFrame: cohorten, in order of cohort.
+    """
+    partition_dir.mkdir(parents=True, exist_ok=True)
+
+    instroom = create_actief_hoofd_eerstejaar_instelling(source_dir, eencijfer)
+    inputs = _cohort_inputs(instroom, eencijfer)
+    stored = _read_manifest(partition_dir, engine)
+
+    changed = [
+        cohort
+        for cohort, partities in inputs.items()
+        if stored.get(str(cohort), {}).get("inputs") != partities
+        or not (partition_dir / _partition_fname(cohort)).is_file()
+    ]
+    logger.info(f"Computing cohorts {changed}, reusing {len(inputs) - len(changed)} stored cohorts.")
+
+    removed = [int(cohort) for cohort in stored if int(cohort) not in inputs]
+    for cohort in removed:
+        logger.debug(f"Removing cohort {cohort}, it is not in eencijfer anymore.")
+        (partition_dir / _partition_fname(cohort)).unlink(missing_ok=True)
+
+    manifest = {cohort: entry for cohort, entry in stored.items() if int(cohort) in inputs}
+    if changed:
+        studenten = instroom.loc[instroom.Inschrijvingsjaar.isin(changed), PGN].unique()
+        deel = eencijfer[eencijfer[PGN].isin(studenten)]
+
+        cohorten = create_cohorten_met_indicatoren(source_dir, eencijfer=deel, engine=engine, use_cache=False)
+        for cohort in changed:
+            cohorten[cohorten.Cohort == cohort].to_parquet(partition_dir / _partition_fname(cohort))
+            manifest[str(cohort)] = {"file": _partition_fname(cohort), "inputs": inputs[cohort]}
+
+    if changed or removed:
+        _write_manifest(partition_dir, engine, manifest)
+
+    return _read_partitions(partition_dir, list(inputs))
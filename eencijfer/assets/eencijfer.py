@@ -1,12 +1,16 @@
 """Eencijfer data asset."""
 
 import logging
-import colorlog
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 import pandas as pd
 
 from eencijfer.assets.transformations.diploma import _add_ho_diploma_eerstejaar, _add_soort_diploma
+from eencijfer.assets.transformations.dtypes import _as_category
+from eencijfer.assets.transformations.lookup import _append_columns
 from eencijfer.assets.transformations.opleiding import (
     _add_croho_onderdeel,
     _add_isced,
@@ -15,92 +19,394 @@ from eencijfer.assets.transformations.opleiding import (
     _add_opleiding,
     _add_type_opleiding,
 )
+from eencijfer.assets.transformations.postcodes import _add_gemeente, _read_postcode_tables
 from eencijfer.assets.transformations.prestatieafspraken import _add_pa_cohort
 from eencijfer.assets.transformations.vooropleiding import _add_naam_instelling_vooropleiding, _add_vooropleiding
+from eencijfer.io.files import _latest_delivery, _read_parquet
+from eencijfer.settings import config
+from eencijfer.utils.debug import _debug
 from eencijfer.utils.detect_eencijfer_files import _get_eencijfer_datafile
+from eencijfer.utils.memory import (
+    _dataframe_size,
+    _log_memory_usage,
+    _start_memory_tracking,
+    _stop_memory_tracking,
+    _track_peak_memory,
+    memory_budget,
+)
+from eencijfer.utils.profile import _in_current_stage, _profile_stage
 
-# Configure colorlog
-handler = colorlog.StreamHandler()
-handler.setFormatter(colorlog.ColoredFormatter(
-    "%(log_color)s%(levelname)s:%(name)s:%(message)s",
-    log_colors={
-        'DEBUG': 'cyan',
-        'INFO': 'green',
-        'WARNING': 'yellow',
-        'ERROR': 'red',
-        'CRITICAL': 'red,bg_white',
-    }
-))
-
-logger = colorlog.getLogger(__name__)
-logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
-
-def _create_eencijfer_df(source_dir: Path):
-    """Pipeline voor verrijken van eencijfer-basisbestand."""
+logger = logging.getLogger(__name__)
 
-    eencijfer_fname = _get_eencijfer_datafile(source_dir)
-    if eencijfer_fname:
-        eencijfer = pd.read_parquet(Path(source_dir / eencijfer_fname).with_suffix('.parquet'))
 
-    if not isinstance(eencijfer, pd.DataFrame):
-        raise Exception(f'No data found {eencijfer_fname}')
+# verrijkte kolommen met omschrijvingen die vaak herhaald worden
+CATEGORY_COLUMNS = [
+    "HoogsteVooropleidingVolledig",
+    "HoogsteVooropleidingProfiel",
+    "NaamInstellingHoogsteVooropleiding",
+    "PlaatsInstellingHoogsteVooropleiding",
+    "DenominatieInstellingHoogsteVooropleiding",
+    "NaamOpleidingCroho",
+    "CrohoOnderdeel",
+    "SoortDiploma",
+    "TypeOpleiding",
+    "NaamOpleiding",
+    "NaamFaculteit",
+    "InPACohortDefinitie",
+    "ISCEDF2013DetailgroepOmschrijving",
+    "ISCEDF2013RubriekOmschrijving",
+    "GemeenteNaamStudent",
+    "GemeenteNaamHoogsteVooroplVoorHetHo",
+]
 
-    eencijfer["Aantal"] = 1
 
-    # voeg informatie over vooropleiding toe:
-    eencijfer = _add_vooropleiding(eencijfer, vooropleiding_field="HoogsteVooropleiding")
+class EnrichmentStep(NamedTuple):
+    """Transformation that adds columns to eencijfer.
 
-    eencijfer = _add_naam_instelling_vooropleiding(
-        eencijfer,
-        vooropleiding="HoogsteVooropleiding",
-    )
+    `inputs` are the columns of eencijfer the transformation reads, `outputs` the
+    columns it adds. Steps are used to decide which source columns have to be read
+    and which steps can be skipped or run at the same time. `add_columns` is called
+    with eencijfer; data shared by steps is bound to it as a keyword argument (see
+    `_share_postcode_tables`).
+    """
+
+    description: str
+    add_columns: Callable[..., pd.DataFrame]
+    inputs: List[str]
+    outputs: List[str]
+    required: bool = False
+
+
+ENRICHMENT_STEPS = [
+    # voeg informatie over vooropleiding toe:
+    EnrichmentStep(
+        "vooropleiding",
+        partial(_add_vooropleiding, vooropleiding_field="HoogsteVooropleiding"),
+        inputs=["HoogsteVooropleiding"],
+        outputs=[
+            "HoogsteVooropleidingCode",
+            "HoogsteVooropleidingVolledig",
+            "HoogsteVooropleidingProfiel",
+            "Vooropleiding",
+        ],
+        required=True,
+    ),
+    EnrichmentStep(
+        "naam instelling vooropleiding",
+        partial(_add_naam_instelling_vooropleiding, vooropleiding="HoogsteVooropleiding"),
+        inputs=["InstellingVanDeHoogsteVooropleiding", "VestigingsnummerVanDeHoogsteVooropleiding"],
+        outputs=[
+            "NaamInstellingHoogsteVooropleiding",
+            "PostcodeInstellingHoogsteVooropleiding",
+            "PlaatsInstellingHoogsteVooropleiding",
+            "DatumOprichtingInstellingHoogsteVooropleiding",
+            "DatumOpheffingInstellingHoogsteVooropleiding",
+            "CodeDenominatieInstellingHoogsteVooropleiding",
+            "DenominatieInstellingHoogsteVooropleiding",
+        ],
+        required=True,
+    ),
     # voeg informatie over inschrijving toe:
-    try:
-        eencijfer = _add_naam_opleiding(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add naam opleiding: {e}")
+    EnrichmentStep(
+        "naam opleiding",
+        _add_naam_opleiding,
+        inputs=["OpleidingActueelEquivalent"],
+        outputs=["NaamOpleidingCroho"],
+    ),
+    EnrichmentStep(
+        "opleiding",
+        _add_opleiding,
+        inputs=["OpleidingHistorischEquivalent", "OpleidingActueelEquivalent"],
+        outputs=["opleiding"],
+    ),
+    EnrichmentStep(
+        "croho onderdeel",
+        _add_croho_onderdeel,
+        inputs=["CrohoOnderdeelActueleOpleiding"],
+        outputs=["CrohoOnderdeel"],
+    ),
+    EnrichmentStep(
+        "soort diploma",
+        _add_soort_diploma,
+        inputs=["OpleidingsfaseActueelVanHetDiploma"],
+        outputs=["SoortDiploma"],
+    ),
+    EnrichmentStep(
+        "ho diploma eerstejaar",
+        _add_ho_diploma_eerstejaar,
+        inputs=["SoortDiplomaSoortHogerOnderwijs", "Diplomajaar", "EersteJaarAanDezeActueleInstelling"],
+        outputs=["HoDiplomaInEersteJaar"],
+    ),
+    EnrichmentStep(
+        "type opleiding",
+        _add_type_opleiding,
+        inputs=["Opleidingsfase"],
+        outputs=["TypeOpleiding"],
+    ),
+    EnrichmentStep(
+        "lokale naam opleiding faculteit",
+        _add_lokale_naam_opleiding_faculteit,
+        inputs=["OpleidingActueelEquivalent"],
+        outputs=["CodeOpleiding", "NaamOpleiding", "NaamFaculteit", "CodeFaculteit"],
+    ),
+    EnrichmentStep(
+        "pa cohort",
+        _add_pa_cohort,
+        inputs=[
+            "IndicatieActiefOpPeildatum",
+            "SoortInschrijvingHogerOnderwijs",
+            "TypeHogerOnderwijsBinnenSoortHogerOnderwijs",
+            "Opleidingscode",
+            "Opleidingsvorm",
+            "HoogsteVooropleiding",
+            "HoogsteVooropleidingVoorHetHo",
+            "EersteJaarInHetHogerOnderwijs",
+            "Inschrijvingsjaar",
+        ],
+        outputs=["InPACohortDefinitie"],
+    ),
+    EnrichmentStep(
+        "isced",
+        _add_isced,
+        inputs=["Opleidingscode", "ISCEDF2013Rubriek"],
+        outputs=["ISCEDF2013Detailgroep", "ISCEDF2013DetailgroepOmschrijving", "ISCEDF2013RubriekOmschrijving"],
+    ),
+    # voeg gemeente van student en vooropleiding toe:
+    EnrichmentStep(
+        "gemeente student",
+        _add_gemeente,
+        inputs=["PostcodecijfersStudentOp1Oktober", "Inschrijvingsjaar"],
+        outputs=["PostbusStudent", "GemeenteCodeStudent", "GemeenteNaamStudent"],
+    ),
+    EnrichmentStep(
+        "gemeente vooropleiding",
+        partial(
+            _add_gemeente,
+            postcode_field="PostcodecijfersVanDeHoogsteVooroplVoorHetHo",
+            suffix="HoogsteVooroplVoorHetHo",
+        ),
+        inputs=["PostcodecijfersVanDeHoogsteVooroplVoorHetHo", "Inschrijvingsjaar"],
+        outputs=[
+            "PostbusHoogsteVooroplVoorHetHo",
+            "GemeenteCodeHoogsteVooroplVoorHetHo",
+            "GemeenteNaamHoogsteVooroplVoorHetHo",
+        ],
+    ),
+]
 
-    try:
-        eencijfer = _add_opleiding(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add opleiding: {e}")
 
-    try:
-        eencijfer = _add_croho_onderdeel(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add croho onderdeel: {e}")
+def _plan_enrichment(
+    columns: Optional[List[str]], steps: List[EnrichmentStep] = ENRICHMENT_STEPS
+) -> Tuple[List[EnrichmentStep], Optional[List[str]]]:
+    """Select the steps and source columns needed for the requested columns.
 
-    try:
-        eencijfer = _add_soort_diploma(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add soort diploma: {e}")
+    Args:
+        columns (Optional[List[str]]): requested columns, None for all columns.
+        steps (List[EnrichmentStep], optional): all enrichment steps. Defaults to ENRICHMENT_STEPS.
 
-    try:
-        eencijfer = _add_ho_diploma_eerstejaar(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add ho diploma eerstejaar: {e}")
+    Returns:
+        Tuple[List[EnrichmentStep], Optional[List[str]]]: steps to run and source columns to read (None for all).
+    """
+    if columns is None:
+        return steps, None
 
-    try:
-        eencijfer = _add_type_opleiding(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add type opleiding: {e}")
+    needed = set(columns)
+    selected_steps: List[EnrichmentStep] = []
+    for step in reversed(steps):
+        if needed.intersection(step.outputs):
+            selected_steps.insert(0, step)
+            needed.update(step.inputs)
 
-    try:
-        eencijfer = _add_lokale_naam_opleiding_faculteit(eencijfer)
-    except Exception as e:
-        logger.error(f"Failed to add lokale naam opleiding faculteit: {e}")
+    produced = {col for step in selected_steps for col in step.outputs}
+    source_columns = [col for col in needed if col not in produced and col != "Aantal"]
+
+    skipped = [step.description for step in steps if step not in selected_steps]
+    logger.debug(f"Skipping steps that are not needed for requested columns: {skipped}")
+
+    return selected_steps, sorted(source_columns)
+
+
+def _plan_levels(steps: List[EnrichmentStep]) -> List[List[EnrichmentStep]]:
+    """Group steps in levels; steps in a level do not depend on each other.
+
+    Args:
+        steps (List[EnrichmentStep]): steps in order of the pipeline.
+
+    Returns:
+        List[List[EnrichmentStep]]: levels, every level only uses outputs of previous levels.
+    """
+    levels: List[List[EnrichmentStep]] = []
+    level_of_column: dict = {}
+    for step in steps:
+        level = max([level_of_column.get(col, -1) for col in step.inputs], default=-1) + 1
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(step)
+        for col in step.outputs:
+            level_of_column[col] = level
+    return levels
+
+
+def _share_postcode_tables(steps: List[EnrichmentStep]) -> List[EnrichmentStep]:
+    """Read the postcode tables once and give them to every gemeente step.
+
+    Without this, every gemeente step reads all Dec_postcodecijfers-tables itself. When the
+    tables can not be read, the steps are returned unchanged and fail (and are skipped) on their own.
+
+    Args:
+        steps (List[EnrichmentStep]): steps to run.
+
+    Returns:
+        List[EnrichmentStep]: steps, the gemeente steps with the postcode tables as argument.
+    """
+    gemeente_steps = [step for step in steps if getattr(step.add_columns, 'func', step.add_columns) is _add_gemeente]
+    if len(gemeente_steps) == 0:
+        return steps
 
     try:
-        eencijfer = _add_pa_cohort(eencijfer)
+        with _profile_stage("read", name="postcode tables") as stage:
+            postcodes = _read_postcode_tables(config.getpath('default', 'source_dir'))
+            stage["rows_out"] = len(postcodes)
     except Exception as e:
-        logger.error(f"Failed to add pa cohort: {e}")
+        logger.error(f"Failed to read postcode tables: {e}")
+        return steps
+
+    return [
+        step._replace(add_columns=partial(step.add_columns, postcodes=postcodes)) if step in gemeente_steps else step
+        for step in steps
+    ]
+
+
+def _compute_step(step: EnrichmentStep, eencijfer: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Run a step on a shallow copy of eencijfer and return the columns it added.
 
+    Args:
+        step (EnrichmentStep): step to run.
+        eencijfer (pd.DataFrame): eencijfer, this dataframe is not changed.
+
+    Raises:
+        Exception: failure of a required step.
+
+    Returns:
+        Optional[pd.DataFrame]: added columns, None if the step failed.
+    """
     try:
-        eencijfer = _add_isced(eencijfer)
+        with _profile_stage("enrich", name=step.description, rows_in=len(eencijfer)) as stage:
+            result = step.add_columns(eencijfer.copy(deep=False))
+            stage["rows_out"] = len(result)
     except Exception as e:
-        logger.error(f"Failed to add isced: {e}")
+        logger.error(f"Failed to add {step.description}: {e}")
+        if step.required:
+            raise
+        return None
+
+    nieuwe_kolommen = [col for col in result.columns if col not in eencijfer.columns]
+    return result[nieuwe_kolommen]
+
+
+def _run_enrichment_steps(
+    eencijfer: pd.DataFrame,
+    steps: List[EnrichmentStep],
+    max_workers: Optional[int] = None,
+    memory_usage: Optional[dict] = None,
+) -> pd.DataFrame:
+    """Run enrichment steps and add their columns to eencijfer.
+
+    Steps in the same level run concurrently on (shallow copies of) the same
+    eencijfer; their columns are added once the whole level is done, in the order
+    of the steps. When memory_usage is given, steps run one at a time so the peak
+    memory of every step can be recorded.
+
+    Args:
+        eencijfer (pd.DataFrame): eencijfer.
+        steps (List[EnrichmentStep]): steps to run.
+        max_workers (Optional[int], optional): maximum number of steps that run at the same time. Defaults to None,
+            one at a time with a memory budget (see `memory_budget`).
+        memory_usage (Optional[dict], optional): dictionary for peak memory per step. Defaults to None.
+
+    Returns:
+        pd.DataFrame: eencijfer with the columns of all successful steps.
+    """
+    max_workers = memory_budget.max_workers(max_workers)
+    for level in _plan_levels(steps):
+        if memory_usage is not None:
+            results = []
+            for step in level:
+                with _track_peak_memory(step.description, memory_usage):
+                    results.append(_compute_step(step, eencijfer))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_in_current_stage(lambda step: _compute_step(step, eencijfer)), level))
+
+        for nieuwe_kolommen in results:
+            if nieuwe_kolommen is not None:
+                eencijfer = _append_columns(eencijfer, nieuwe_kolommen)
+    return eencijfer
+
+
+def _create_eencijfer_df(
+    source_dir: Path,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Tuple]] = None,
+    max_workers: Optional[int] = None,
+    track_memory: bool = False,
+) -> pd.DataFrame:
+    """Pipeline voor verrijken van eencijfer-basisbestand.
+
+    Every step adds columns to eencijfer, the table itself is never copied. When
+    columns are given, only the source columns and steps needed for those columns
+    are used. Filters are pushed down to the parquet-reader where possible, so rows
+    that are filtered out are not read or enriched; callers still have to apply the
+    filter themselves.
+
+    Args:
+        source_dir (Path): Path to directory with converted eencijfer-files.
+        columns (Optional[List[str]], optional): Columns to return. Defaults to None (all columns).
+        filters (Optional[List[Tuple]], optional): Row filters on source columns. Defaults to None.
+        max_workers (Optional[int], optional): Maximum number of steps running at the same time. Defaults to None.
+        track_memory (bool, optional): Log the peak memory of every step. Defaults to False.
+
+    Returns:
+        pd.DataFrame: Enriched eencijfer.
+    """
+    memory_usage: dict = {}
+    started_memory_tracking = _start_memory_tracking() if track_memory else False
+
+    steps, source_columns = _plan_enrichment(columns)
+    steps = _share_postcode_tables(steps)
+
+    eencijfer_fname = _get_eencijfer_datafile(source_dir)
+    if eencijfer_fname:
+        eencijfer_fpath = _latest_delivery(Path(source_dir / eencijfer_fname).with_suffix('.parquet'))
+        with _track_peak_memory("read eencijfer", memory_usage):
+            with _profile_stage("read", name=eencijfer_fpath.name) as stage:
+                eencijfer = _read_parquet(eencijfer_fpath, columns=source_columns, filters=filters)
+                stage["rows_out"] = len(eencijfer)
+
+    if not isinstance(eencijfer, pd.DataFrame):
+        raise Exception(f'No data found {eencijfer_fname}')
+
+    input_size = _dataframe_size(eencijfer) if track_memory else 0
+
+    eencijfer["Aantal"] = 1
+
+    eencijfer = _run_enrichment_steps(
+        eencijfer,
+        steps,
+        max_workers=max_workers,
+        memory_usage=memory_usage if track_memory else None,
+    )
+
+    _debug(logger, lambda: f"Columns in eencijfer: {eencijfer.columns.tolist()}")
+
+    if track_memory:
+        _log_memory_usage(memory_usage, input_size)
+    if started_memory_tracking:
+        _stop_memory_tracking()
+
+    eencijfer = _as_category(eencijfer, CATEGORY_COLUMNS)
 
-    logger.critical(f"Columns in eencijfer: {eencijfer.columns}")
+    if columns is not None:
+        eencijfer = eencijfer[[col for col in columns if col in eencijfer.columns]]
 
     return eencijfer
@@ -6,19 +6,122 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 
+from eencijfer.assets.transformations.dtypes import _as_category
 from eencijfer.assets.transformations.vooropleiding import _add_oorspronkelijke_vooropleiding, _add_vooropleiding_kort
+from eencijfer.io.files import _latest_delivery, _read_parquet
 from eencijfer.utils.detect_eencijfer_files import _get_eindexamen_datafile
 from eencijfer.settings import config
 
 
 logger = logging.getLogger(__name__)
 
+# velden uit het eindexamenbestand (VAKHAVW) die nodig zijn voor eindexamencijfers
+EINDEXAMEN_SOURCE_FIELDS = [
+    "PersoonsgebondenNummer",
+    "VooropleidingOorspronkelijkeCode",
+    "Diplomajaar",
+    "VakCode",
+    "VakAfkorting",
+    "CijferSchoolexamen",
+    "CijferEersteCentraalExamen",
+    "CijferTweedeCentraalExamen",
+    "CijferDerdeCentraalExamen",
+]
+
+
+# pogingen centraal examen, van laatste naar eerste
+CENTRAAL_EXAMEN_POGINGEN = [
+    (3, "CijferDerdeCentraalExamen"),
+    (2, "CijferTweedeCentraalExamen"),
+    (1, "CijferEersteCentraalExamen"),
+]
+
+# kolommen met waarden die vaak herhaald worden
+EINDEXAMEN_CATEGORY_COLUMNS = ["VakCode", "VakAfkorting", "SoortExamen"]
+
+EINDEXAMEN_ID_FIELDS = [
+    "PersoonsgebondenNummer",
+    "Vooropleiding",
+    "Diplomajaar",
+    "VakCode",
+    "VakAfkorting",
+]
+
+
+def _add_laatste_poging_centraal_examen(eindexamencijfers: pd.DataFrame) -> pd.DataFrame:
+    """Add grade and number of the last attempt of the central exam that has a grade.
+
+    The grades of the attempts are coalesced from the last to the first attempt,
+    so every row keeps one grade for the central exam.
 
-def _create_eindexamencijfer_df(source_dir: Path) -> pd.DataFrame:
+    Args:
+        eindexamencijfers (pd.DataFrame): VAKHAVW with a column per attempt.
+
+    Returns:
+        pd.DataFrame: eindexamencijfers with CijferCentraalExamen and PogingCentraalExamen.
+    """
+    cijfers = eindexamencijfers[[column for _, column in CENTRAAL_EXAMEN_POGINGEN]].to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    pogingen = np.array([poging for poging, _ in CENTRAAL_EXAMEN_POGINGEN], dtype=float)
+
+    heeft_cijfer = ~np.isnan(cijfers)
+    heeft_poging = heeft_cijfer.any(axis=1)
+    laatste = heeft_cijfer.argmax(axis=1)
+
+    eindexamencijfers["CijferCentraalExamen"] = np.where(
+        heeft_poging, cijfers[np.arange(len(cijfers)), laatste], np.nan
+    )
+    eindexamencijfers["PogingCentraalExamen"] = np.where(heeft_poging, pogingen[laatste], np.nan)
+    return eindexamencijfers
+
+
+def _to_long_format(eindexamencijfers: pd.DataFrame) -> pd.DataFrame:
+    """Create a row for the central exam and a row for the school exam.
+
+    Only the last attempt per student, vooropleiding, soort examen and vak is kept.
+
+    Args:
+        eindexamencijfers (pd.DataFrame): eindexamencijfers in wide format.
+
+    Returns:
+        pd.DataFrame: eindexamencijfers with columns Cijfer, Poging and SoortExamen.
+    """
+    centraal_examen = eindexamencijfers.loc[
+        eindexamencijfers.CijferCentraalExamen.notna(),
+        EINDEXAMEN_ID_FIELDS + ["CijferCentraalExamen", "PogingCentraalExamen"],
+    ].rename(columns={"CijferCentraalExamen": "Cijfer", "PogingCentraalExamen": "Poging"})
+    centraal_examen["SoortExamen"] = "CSE"
+
+    schoolexamen = eindexamencijfers.loc[
+        eindexamencijfers.CijferSchoolexamen.notna(), EINDEXAMEN_ID_FIELDS + ["CijferSchoolexamen"]
+    ].rename(columns={"CijferSchoolexamen": "Cijfer"})
+    schoolexamen["Poging"] = 1.0
+    schoolexamen["SoortExamen"] = "School"
+
+    result = pd.concat([centraal_examen, schoolexamen], ignore_index=True)
+
+    # bij meer rijen voor hetzelfde vak de laatste poging vasthouden
+    return result.sort_values(by="Poging", ascending=False, kind="stable").drop_duplicates(
+        subset=[
+            "PersoonsgebondenNummer",
+            "Vooropleiding",
+            "SoortExamen",
+            "VakAfkorting",
+            "VakCode",
+        ],
+        keep="first",
+        ignore_index=True,
+    )
+
+
+def _create_eindexamencijfer_df(source_dir: Path, long_format: bool = True) -> pd.DataFrame:
     """Create table with eindexamencijfers.
 
     Args:
         source_dir (Path): Path to directory with converted eencijfer-files.
+        long_format (bool, optional): Return a row per soort examen (CSE or School) with
+            Cijfer and Poging, or (False) a row per vak. Defaults to True.
 
     Raises:
         Exception: _description_
@@ -30,77 +133,30 @@ def _create_eindexamencijfer_df(source_dir: Path) -> pd.DataFrame:
     eindexamencijfers_fname = _get_eindexamen_datafile(source_dir)
     if eindexamencijfers_fname is None:
         raise Exception('No eindexamenfile found!')
-    eindexamencijfers = pd.read_parquet(Path(source_dir / eindexamencijfers_fname).with_suffix('.parquet'))
-    eindexamencijfers = _add_oorspronkelijke_vooropleiding(eindexamencijfers)
+    eindexamencijfers = _read_parquet(
+        _latest_delivery(Path(source_dir / eindexamencijfers_fname).with_suffix('.parquet')),
+        columns=EINDEXAMEN_SOURCE_FIELDS,
+    )
+    eindexamencijfers = _add_oorspronkelijke_vooropleiding(
+        eindexamencijfers, columns=["OmschrijvingVooropleidingOorspronkelijkeCode"]
+    )
     eindexamencijfers = _add_vooropleiding_kort(
         eindexamencijfers,
         source_column="OmschrijvingVooropleidingOorspronkelijkeCode",
         new_column="Vooropleiding",
     )
 
-    fields = [
-        "PersoonsgebondenNummer",
-        "Diplomajaar",
-        "VakCode",
-        "VakAfkorting",
-        "Vooropleiding",
-        "CijferEersteCentraalExamen",
-        "CijferTweedeCentraalExamen",
-        "CijferDerdeCentraalExamen",
-        "CijferSchoolexamen",
-    ]
+    logger.debug("...laatste poging centraal examen...")
+    eindexamencijfers = _add_laatste_poging_centraal_examen(eindexamencijfers)
+
+    fields = EINDEXAMEN_ID_FIELDS + ["CijferCentraalExamen", "PogingCentraalExamen", "CijferSchoolexamen"]
     logger.debug("Filter op kolommen:")
     logger.debug("")
     logger.debug(f"{fields}")
+    eindexamencijfers = eindexamencijfers[fields]
 
-    logger.debug("...melt...")
-    result = pd.melt(
-        eindexamencijfers[fields],
-        id_vars=[
-            "PersoonsgebondenNummer",
-            "Vooropleiding",
-            "Diplomajaar",
-            "VakCode",
-            "VakAfkorting",
-        ],
-    )
-    logger.debug("...lege waarden weghalen...")
-    result = result.dropna(subset=["value"])
-
-    result["Poging"] = np.where(result.variable.str.contains("Eerste"), 1, np.nan)
-    result["Poging"] = np.where(result.variable.str.contains("Tweede"), 2, result["Poging"])
-    result["Poging"] = np.where(result.variable.str.contains("Derde"), 3, result["Poging"])
-    result["Poging"] = result["Poging"].fillna(1)
-
-    result["SoortExamen"] = np.where(result.variable.str.contains("Centraal"), "CSE", "School")
-
-    # sorteer de pogingen van hoog naar laag, dan ontdubbelen en de eerste waarde (de laatste poging dus)
-    # vasthouden.
-    laatste_cijfer = result.sort_values(
-        by=[
-            "PersoonsgebondenNummer",
-            "Vooropleiding",
-            "SoortExamen",
-            "VakAfkorting",
-            "VakCode",
-            "Poging",
-        ],
-        ascending=False,
-    ).drop_duplicates(
-        subset=[
-            "PersoonsgebondenNummer",
-            "Vooropleiding",
-            "SoortExamen",
-            "VakAfkorting",
-            "VakCode",
-        ],
-        keep="first",
-        ignore_index=True,
-    )
-
-    laatste_cijfer.rename(columns={"value": "Cijfer"}, inplace=True)
-
-    if "variable" in laatste_cijfer:
-        del laatste_cijfer["variable"]
+    if long_format:
+        logger.debug("...long format...")
+        eindexamencijfers = _to_long_format(eindexamencijfers)
 
-    return laatste_cijfer
+    return _as_category(eindexamencijfers, EINDEXAMEN_CATEGORY_COLUMNS)
@@ -0,0 +1,15 @@
+"""Engines for data assets, without importing pandas."""
+
+from enum import Enum
+
+
+class CohortEngine(str, Enum):
+    """Engine used to compute the indicators of cohorten.
+
+    Args:
+        str (_type_): _description_
+        Enum (_type_): _description_
+    """
+
+    pandas = "pandas"
+    duckdb = "duckdb"
@@ -0,0 +1,48 @@
+"""Compact dtypes for columns of data assets."""
+
+import logging
+from typing import List
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _as_category(data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Store columns with few distinct (string) values as category.
+
+    Every value is then stored once, the rows only hold a code. In parquet these
+    columns are written dictionary-encoded and they are read back as category.
+    Columns that are not in data or have no values are left as they are.
+
+    Args:
+        data (pd.DataFrame): data asset.
+        columns (List[str]): columns to store as category.
+
+    Returns:
+        pd.DataFrame: data, with the columns as category.
+    """
+    for col in columns:
+        if col not in data.columns or isinstance(data[col].dtype, pd.CategoricalDtype):
+            continue
+        if data[col].isna().all():
+            continue
+        data[col] = data[col].astype("category")
+    return data
+
+
+def _without_categories(values: pd.Series) -> pd.Series:
+    """Give a categorical column the dtype of its categories.
+
+    Values of a categorical column can not be replaced by values that are not a category,
+    use this before `replace`.
+
+    Args:
+        values (pd.Series): column.
+
+    Returns:
+        pd.Series: column, not categorical.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(values.cat.categories.dtype)
+    return values
@@ -0,0 +1,190 @@
+"""Index-based lookups for enriching eencijfer with decode tables."""
+
+import logging
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from eencijfer.utils.debug import _debug
+
+logger = logging.getLogger(__name__)
+
+
+def _as_list(columns: Union[str, List[str]]) -> List[str]:
+    """Wrap a single column name in a list.
+
+    Args:
+        columns (Union[str, List[str]]): column name or list of column names.
+
+    Returns:
+        List[str]: list of column names.
+    """
+    if isinstance(columns, str):
+        return [columns]
+    return list(columns)
+
+
+def _key_index(data: pd.DataFrame, columns: List[str]) -> pd.Index:
+    """Create an index on the key column(s) of a dataframe.
+
+    Args:
+        data (pd.DataFrame): dataframe containing the key columns.
+        columns (List[str]): key columns.
+
+    Returns:
+        pd.Index: Index for a single key, MultiIndex for composite keys.
+    """
+    if len(columns) == 1:
+        return pd.Index(data[columns[0]])
+    return pd.MultiIndex.from_frame(data[columns])
+
+
+def _key_kind(values: pd.Series) -> str:
+    """Kind of the values of a key column, to tell whether two keys can match.
+
+    Args:
+        values (pd.Series): key column.
+
+    Returns:
+        str: "numeric", "bool", "datetime" or "string".
+    """
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _key_kind(pd.Series(dtype.categories))
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if dtype == object:
+        # zoals pd.merge: een object-kolom met alleen getallen past op een numerieke sleutel
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        if inferred in ("integer", "floating", "mixed-integer-float", "decimal"):
+            return "numeric"
+        if inferred == "boolean":
+            return "bool"
+    return "string"
+
+
+def _check_key_dtypes(data: pd.DataFrame, lookup: pd.DataFrame, left_on: List[str], right_on: List[str]) -> None:
+    """Check that the keys in data and lookup can match.
+
+    `pd.Index.get_indexer` does not match an int64 key against a key of strings, every row
+    would silently get missing values. Like `pd.merge` this raises instead.
+
+    Args:
+        data (pd.DataFrame): dataframe to enrich.
+        lookup (pd.DataFrame): decode table.
+        left_on (List[str]): key columns in data.
+        right_on (List[str]): key columns in lookup.
+
+    Raises:
+        Exception: Key columns are of a different kind, e.g. numbers and strings.
+    """
+    for left, right in zip(left_on, right_on):
+        left_kind = _key_kind(data[left])
+        right_kind = _key_kind(lookup[right])
+        if left_kind != right_kind:
+            raise Exception(
+                f"Can not look up {left} ({data[left].dtype}) in {right} ({lookup[right].dtype}): "
+                f"the keys should both be {left_kind} or both be {right_kind}, convert one of them first."
+            )
+
+
+def _gather_lookup_columns(
+    data: pd.DataFrame,
+    lookup: pd.DataFrame,
+    left_on: Union[str, List[str]],
+    right_on: Optional[Union[str, List[str]]] = None,
+    suffix: str = "_lookup",
+) -> pd.DataFrame:
+    """Look up the columns of a decode table for every row in data.
+
+    Works like a left `pd.merge`, but only the columns coming from `lookup` are
+    gathered. The keys in data are matched against an index on the lookup key,
+    so the (wide) data-frame itself is never copied. Column naming follows
+    `pd.merge`: the lookup key is dropped when it has the same name as the key
+    in data, and columns already present in data get `suffix`.
+
+    Args:
+        data (pd.DataFrame): dataframe to enrich, e.g. eencijfer.
+        lookup (pd.DataFrame): decode table with one row per key.
+        left_on (Union[str, List[str]]): key column(s) in data.
+        right_on (Optional[Union[str, List[str]]], optional): key column(s) in lookup. Defaults to left_on.
+        suffix (str, optional): suffix for columns that already exist in data. Defaults to "_lookup".
+
+    Raises:
+        Exception: Key is not unique in lookup, keys do not match or are of a different kind.
+
+    Returns:
+        pd.DataFrame: New columns with the same index as data.
+    """
+    left_on = _as_list(left_on)
+    right_on = left_on if right_on is None else _as_list(right_on)
+
+    if len(left_on) != len(right_on):
+        raise Exception("left_on and right_on should have the same number of columns.")
+
+    _check_key_dtypes(data, lookup, left_on, right_on)
+
+    index = _key_index(lookup, right_on)
+    if not index.is_unique:
+        raise Exception(f"Lookup key {right_on} is not unique.")
+
+    indexer = index.get_indexer(_key_index(data, left_on))
+    _debug(logger, lambda: f"...{(indexer == -1).sum()} rows without a match on {left_on}.")
+
+    shared_keys = [right for left, right in zip(left_on, right_on) if left == right]
+    new_columns = {}
+    for col in lookup.columns:
+        if col in shared_keys:
+            continue
+        name = col + suffix if col in data.columns else col
+        new_columns[name] = pd.api.extensions.take(lookup[col].array, indexer, allow_fill=True)
+
+    return pd.DataFrame(new_columns, index=data.index)
+
+
+def _append_columns(data: pd.DataFrame, new_columns: pd.DataFrame) -> pd.DataFrame:
+    """Append columns to data without copying the existing columns.
+
+    Args:
+        data (pd.DataFrame): dataframe to add columns to.
+        new_columns (pd.DataFrame): columns with the same index as data.
+
+    Raises:
+        Exception: Number of rows does not match.
+
+    Returns:
+        pd.DataFrame: data with the columns added.
+    """
+    if not len(data) == len(new_columns):
+        raise Exception("Number of rows does not match, columns can not be added.")
+
+    for col in new_columns.columns:
+        data[col] = new_columns[col].array
+    return data
+
+
+def _add_lookup_columns(
+    data: pd.DataFrame,
+    lookup: pd.DataFrame,
+    left_on: Union[str, List[str]],
+    right_on: Optional[Union[str, List[str]]] = None,
+    suffix: str = "_lookup",
+) -> pd.DataFrame:
+    """Enrich data with the columns of a decode table.
+
+    Args:
+        data (pd.DataFrame): dataframe to enrich, e.g. eencijfer.
+        lookup (pd.DataFrame): decode table with one row per key.
+        left_on (Union[str, List[str]]): key column(s) in data.
+        right_on (Optional[Union[str, List[str]]], optional): key column(s) in lookup. Defaults to left_on.
+        suffix (str, optional): suffix for columns that already exist in data. Defaults to "_lookup".
+
+    Returns:
+        pd.DataFrame: data with the columns of lookup added.
+    """
+    new_columns = _gather_lookup_columns(data, lookup, left_on=left_on, right_on=right_on, suffix=suffix)
+    return _append_columns(data, new_columns)
@@ -6,7 +6,9 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 
+from eencijfer.assets.transformations.lookup import _append_columns, _gather_lookup_columns
 from eencijfer.settings import config
+from eencijfer.utils.debug import _debug
 
 HERE = Path(__file__).parent.absolute()
 DATASETS_DIR = HERE / "datasets"
@@ -29,13 +31,11 @@ def _add_naam_actuele_instelling(eencijfer: pd.DataFrame) -> pd.DataFrame:
     if not len(Dec_actuele_instelling) == Dec_actuele_instelling.Instellingscode.nunique():
         raise Exception('Something went, Dec_actuele_instelling is not unique.')
     
-    result = pd.merge(
+    nieuwe_kolommen = _gather_lookup_columns(
         eencijfer,
         Dec_actuele_instelling,
         left_on="ActueleInstelling",
-        right_on="ActueleInstelling",
-        how="left",
-        suffixes=["", "_instelling"],
+        suffix="_instelling",
     )
     
     # logger.debug("Controleer het resultaat...")
@@ -62,10 +62,8 @@ def _add_naam_actuele_instelling(eencijfer: pd.DataFrame) -> pd.DataFrame:
     # for col in removable_cols:
     #     del result[col]
 
-    nieuwe_cols = set(result.columns) - set(eencijfer.columns)
-    logger.info("De volgende kolommen zijn toegevoegd:")
-    logger.info(f"{nieuwe_cols}")
-    return result
+    _debug(logger, lambda: f"De volgende kolommen zijn toegevoegd: {nieuwe_kolommen.columns.tolist()}")
+    return _append_columns(eencijfer, nieuwe_kolommen)
 
 def _add_naam_opleiding(eencijfer: pd.DataFrame) -> pd.DataFrame:
     """Add column with Croho-name.
@@ -83,22 +81,21 @@ def _add_naam_opleiding(eencijfer: pd.DataFrame) -> pd.DataFrame:
     if not len(Dec_isat) == Dec_isat.Opleidingscode.nunique():
         raise Exception('Something went, Isat is not unique.')
 
-    result = pd.merge(
+    nieuwe_kolommen = _gather_lookup_columns(
         eencijfer,
         Dec_isat,
         left_on="OpleidingActueelEquivalent",
         right_on="Opleidingscode",
-        how="left",
-        suffixes=["", "_opleiding"],
+        suffix="_opleiding",
     )
 
     logger.debug("Controleer het resultaat...")
     logger.debug("... geen missende namen")
-    if not result.NaamOpleiding.isnull().sum() == 0:
+    if not nieuwe_kolommen.NaamOpleiding.isnull().sum() == 0:
         raise Exception("Niet alle opleidingen hebben een naam")
 
-    if result.NaamOpleiding.isnull().sum() > 0:
-        opleidingen_zonder_naam = result[result.NaamOpleiding.isnull()][
+    if nieuwe_kolommen.NaamOpleiding.isnull().sum() > 0:
+        opleidingen_zonder_naam = eencijfer[nieuwe_kolommen.NaamOpleiding.isnull()][
             [
                 "OpleidingActueelEquivalent",
             ]
@@ -107,19 +104,16 @@ def _add_naam_opleiding(eencijfer: pd.DataFrame) -> pd.DataFrame:
         logger.info("Er zijn opleidingen zonder naam:")
         logger.info(f"{opleidingen_zonder_naam}")
         logger.info("Missende waarden worden op 'onbekend' gezet.")
-        result.NaamOpleiding.fillna("onbekend", inplace=True)
+        nieuwe_kolommen["NaamOpleiding"] = nieuwe_kolommen.NaamOpleiding.fillna("onbekend")
 
     logger.info("Hernoem NaamOpleiding naar NaamOpleidingCroho")
-    result.rename(columns={"NaamOpleiding": "NaamOpleidingCroho"}, inplace=True)
+    nieuwe_kolommen = nieuwe_kolommen.rename(columns={"NaamOpleiding": "NaamOpleidingCroho"})
 
-    removable_cols = [col for col in result.columns if "_opleiding" in col]
-    for col in removable_cols:
-        del result[col]
+    removable_cols = [col for col in nieuwe_kolommen.columns if "_opleiding" in col]
+    nieuwe_kolommen = nieuwe_kolommen.drop(columns=removable_cols)
 
-    nieuwe_cols = set(result.columns) - set(eencijfer.columns)
-    logger.info("De volgende kolommen zijn toegevoegd:")
-    logger.info(f"{nieuwe_cols}")
-    return result
+    _debug(logger, lambda: f"De volgende kolommen zijn toegevoegd: {nieuwe_kolommen.columns.tolist()}")
+    return _append_columns(eencijfer, nieuwe_kolommen)
 
 
 def _add_isced(eencijfer: pd.DataFrame) -> pd.DataFrame:
@@ -138,31 +132,24 @@ def _add_isced(eencijfer: pd.DataFrame) -> pd.DataFrame:
     if not len(Dec_ho_ISCED) == Dec_ho_ISCED.Opleidingscode.nunique():
         raise Exception('Something went, Opleidingscode is not unique.')
 
-    logger.debug("Merge eencijfer with Dec_ho_ISCED")
-    result = pd.merge(
-        eencijfer,
-        Dec_ho_ISCED,
-        left_on="Opleidingscode",
-        right_on="Opleidingscode",
-        how="left",
-        suffixes=["", "_opleiding"],
-    )
+    logger.debug("Look up Opleidingscode in Dec_ho_ISCED")
+    new_cols = _gather_lookup_columns(eencijfer, Dec_ho_ISCED, left_on="Opleidingscode", suffix="_opleiding")
 
-    if not len(result) == len(eencijfer):
+    if not len(new_cols) == len(eencijfer):
         raise Exception("Something went wrong when merging.")
 
-    if not result.ISCEDF2013Rubriek.isnull().sum() == 0:
+    rubriek = new_cols.ISCEDF2013Rubriek if "ISCEDF2013Rubriek" in new_cols else eencijfer.ISCEDF2013Rubriek
+    if not rubriek.isnull().sum() == 0:
         raise Exception("Not all rows have ISCEDF2013Rubriek")
 
-    new_cols = set(result.columns) - set(eencijfer.columns)
-    if len(new_cols) == 0:
+    if len(new_cols.columns) == 0:
         raise Exception("Merge did not give new columns.")
 
     logger.info("Following columns were added:")
-    for col in new_cols:
+    for col in new_cols.columns:
         logger.info(f" - {col}")
 
-    return result
+    return _append_columns(eencijfer, new_cols)
 
 
 def _add_lokale_naam_opleiding_faculteit(eencijfer: pd.DataFrame) -> pd.DataFrame:
@@ -181,18 +168,19 @@ def _add_lokale_naam_opleiding_faculteit(eencijfer: pd.DataFrame) -> pd.DataFram
 
     lokale_namen = pd.read_csv(lokale_namen_fpath, sep=";", dtype="object")
 
-    result = pd.merge(
+    nieuwe_kolommen = _gather_lookup_columns(
         eencijfer,
         lokale_namen,
         left_on="OpleidingActueelEquivalent",
         right_on="Opleidingscode",
-        how="left",
-        suffixes=["", "_naam"],
+        suffix="_naam",
     )
-    if "Opleidingscode_naam" in result:
-        del result["Opleidingscode_naam"]
-    if not len(eencijfer) == len(result):
+    if "Opleidingscode_naam" in nieuwe_kolommen:
+        del nieuwe_kolommen["Opleidingscode_naam"]
+    if not len(eencijfer) == len(nieuwe_kolommen):
         raise Exception("Something went wrong merging.")
+
+    result = _append_columns(eencijfer, nieuwe_kolommen)
     if result.CodeOpleiding.isnull().sum() > 0:
         logger.info("Er zijn opleidingen zonder lokale naam:")
         opleidingen_zonder_lokale_naam = result[result.CodeOpleiding.isnull()][
@@ -200,9 +188,7 @@ def _add_lokale_naam_opleiding_faculteit(eencijfer: pd.DataFrame) -> pd.DataFram
         ].drop_duplicates()
         logger.info(f"{opleidingen_zonder_lokale_naam}")
 
-    nieuwe_cols = set(result.columns) - set(eencijfer.columns)
-    logger.info("De volgende kolommen zijn toegevoegd:")
-    logger.info(f"{nieuwe_cols}")
+    _debug(logger, lambda: f"De volgende kolommen zijn toegevoegd: {nieuwe_kolommen.columns.tolist()}")
 
     return result
 
@@ -216,8 +202,6 @@ def _add_type_opleiding(eencijfer: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Eencijfer with added column.
     """
-    result = eencijfer.copy()
-
     typeOpleiding = {
         "O": "oude stijl (toegestaan t/m studiejaar 1992-1993)",
         "P": "propedeuse",
@@ -234,14 +218,11 @@ def _add_type_opleiding(eencijfer: pd.DataFrame) -> pd.DataFrame:
         "Q": "post-initiële master",
     }
     logger.debug("...voeg TypeOpleiding toe op basis van Opleidingsfase")
-    result["TypeOpleiding"] = result.Opleidingsfase.replace(typeOpleiding)
-    result["TypeOpleiding"] = result["TypeOpleiding"].fillna("onbekend")
+    eencijfer["TypeOpleiding"] = eencijfer.Opleidingsfase.replace(typeOpleiding).fillna("onbekend")
 
-    nieuwe_cols = set(result.columns) - set(eencijfer.columns)
-    logger.info("De volgende kolommen zijn toegevoegd:")
-    logger.info(f"{nieuwe_cols}")
+    logger.debug("De volgende kolommen zijn toegevoegd: ['TypeOpleiding']")
 
-    return result
+    return eencijfer
 
 
 def _add_opleiding(eencijfer: pd.DataFrame) -> pd.DataFrame:
@@ -273,8 +254,6 @@ def _add_croho_onderdeel(eencijfer: pd.DataFrame) -> pd.DataFrame:
     if "CrohoOnderdeelActueleOpleiding" not in eencijfer:
         raise Exception("CrohoOnderdeelActueleOpleiding niet gevonden in dataset")
 
-    result = eencijfer.copy()
-
     croho_sectoren = {
         1: "onderwijs",
         2: "landbouw en natuurlijke omgeving",
@@ -288,6 +267,6 @@ def _add_croho_onderdeel(eencijfer: pd.DataFrame) -> pd.DataFrame:
         0: "sectoroverstijgend",
     }
     logger.debug("...voeg CrohoOnderdeel toe op basis van CrohoOnderdeelActueleOpleiding")
-    result["CrohoOnderdeel"] = result.CrohoOnderdeelActueleOpleiding.replace(croho_sectoren).fillna("onbekend")
+    eencijfer["CrohoOnderdeel"] = eencijfer.CrohoOnderdeelActueleOpleiding.replace(croho_sectoren).fillna("onbekend")
 
-    return result
+    return eencijfer
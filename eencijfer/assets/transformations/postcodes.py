@@ -1,52 +1,118 @@
 """Add postcodes and gemeente."""
 
 import logging
+import re
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
+from eencijfer.assets.transformations.lookup import _append_columns, _gather_lookup_columns
+from eencijfer.io.files import _read_parquet
 from eencijfer.settings import config
+from eencijfer.utils.catalog import file_catalog
 
-HERE = Path(__file__).parent.absolute()
-DATASETS_DIR = HERE / "datasets"
 logger = logging.getLogger(__name__)
 
+POSTCODE_FIELDS = ["Postcodecijfers", "Postbus", "GemeenteCode", "GemeenteNaam"]
 
-def _add_isced(eencijfer: pd.DataFrame) -> pd.DataFrame:
-    """Add columns with ISCED-codes.
+
+def _read_postcode_tables(source_dir: Path) -> pd.DataFrame:
+    """Read all yearly postcode tables (Dec_postcodecijfers_<jaar>) into one table.
 
     Args:
-        eencijfer (pd.DataFrame): _description_
+        source_dir (Path): directory with converted decode tables.
+
+    Raises:
+        Exception: no postcode tables found.
 
     Returns:
-        pd.DataFrame: _description_
+        pd.DataFrame: postcode tables with the year of the table in column PostcodeTabelJaar,
+            one row per postcode and year.
     """
-    logger.debug("Check whether Dec_ho_ISCED has Opleidingscode as index.")
-    source_dir = config.getpath('default', 'source_dir')
-    Dec_ho_ISCED = pd.read_parquet(source_dir / 'Dec_ho_ISCED.parquet')
-
-    if not len(Dec_ho_ISCED) == Dec_ho_ISCED.Opleidingscode.nunique():
-        raise Exception('Something went, Opleidingscode is not unique.')
-
-    logger.debug("Merge eencijfer with Dec_ho_ISCED")
-    result = pd.merge(
-        eencijfer,
-        Dec_ho_ISCED,
-        left_on="Opleidingscode",
-        right_on="Opleidingscode",
-        how="left",
-        suffixes=["", "_opleiding"],
-    )
+    tables = []
+    postcode_files = [
+        entry.path
+        for entry in file_catalog.entries(source_dir)
+        if entry.name.startswith('Dec_postcodecijfers_') and entry.suffix == '.parquet'
+    ]
+    for fpath in sorted(postcode_files):
+        match = re.fullmatch(r'Dec_postcodecijfers_(\d{4})', fpath.stem)
+        if match is None:
+            logger.debug(f"Skipping {fpath.name}, no year in name.")
+            continue
+        table = _read_parquet(fpath, columns=POSTCODE_FIELDS)
+        table["PostcodeTabelJaar"] = int(match.group(1))
+        tables.append(table)
+
+    if len(tables) == 0:
+        raise Exception(f"No postcode tables (Dec_postcodecijfers_<jaar>) found in {source_dir}.")
+
+    postcodes = pd.concat(tables, ignore_index=True)
+    postcodes["Postcodecijfers"] = pd.to_numeric(postcodes.Postcodecijfers, errors="coerce").astype("Int64")
+    postcodes = postcodes[postcodes.Postcodecijfers.notna()]
+
+    # postbus-nummers alleen gebruiken als er geen gewone postcode is
+    postcodes = postcodes.sort_values(by="Postbus", key=lambda postbus: postbus == "J", kind="stable")
+    postcodes = postcodes.drop_duplicates(subset=["Postcodecijfers", "PostcodeTabelJaar"], keep="first")
+    return postcodes.reset_index(drop=True)
+
+
+def _postcode_tabel_jaar(jaar: pd.Series, tabel_jaren: np.ndarray) -> np.ndarray:
+    """Select for every year the most recent postcode table of that year or before.
+
+    Years before the first table use the first table, rows without a year the most recent table.
+
+    Args:
+        jaar (pd.Series): year of every row, e.g. Inschrijvingsjaar.
+        tabel_jaren (np.ndarray): sorted years of the available postcode tables.
+
+    Returns:
+        np.ndarray: year of the postcode table for every row.
+    """
+    positie = np.searchsorted(tabel_jaren, jaar.to_numpy(dtype="int64", na_value=tabel_jaren[-1]), side="right") - 1
+    return tabel_jaren[np.clip(positie, 0, None)]
 
-    if not result.ISCEDF2013Rubriek.isnull().sum() == 0:
-        raise Exception("Not all rows have ISCEDF2013Rubriek")
 
-    new_cols = set(result.columns) - set(eencijfer.columns)
-    if len(new_cols) == 0:
-        raise Exception("Merge did not give new columns.")
+def _add_gemeente(
+    eencijfer: pd.DataFrame,
+    postcode_field: str = "PostcodecijfersStudentOp1Oktober",
+    suffix: str = "Student",
+    jaar_field: str = "Inschrijvingsjaar",
+    postcodes: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """Add gemeente of a postcode, using the postcode table that was valid in that year.
+
+    Every row gets the postcode table of its jaar_field (or the most recent table before
+    that year) and is looked up on postcode and table year at once, instead of a merge per year.
+
+    Args:
+        eencijfer (pd.DataFrame): eencijfer.
+        postcode_field (str, optional): column with the digits of the postcode.
+            Defaults to "PostcodecijfersStudentOp1Oktober".
+        suffix (str, optional): suffix of the new columns. Defaults to "Student".
+        jaar_field (str, optional): column with the year. Defaults to "Inschrijvingsjaar".
+        postcodes (Optional[pd.DataFrame], optional): postcode tables, see `_read_postcode_tables`.
+            Defaults to None (read from source_dir).
 
-    logger.info("Following columns were added:")
-    for col in new_cols:
-        logger.info(f" - {col}")
+    Returns:
+        pd.DataFrame: eencijfer with GemeenteCode<suffix>, GemeenteNaam<suffix> and Postbus<suffix>.
+    """
+    if postcodes is None:
+        postcodes = _read_postcode_tables(config.getpath('default', 'source_dir'))
+
+    tabel_jaren = np.sort(postcodes.PostcodeTabelJaar.unique())
+    logger.debug(f"...postcode tables for years {list(tabel_jaren)}")
+
+    keys = pd.DataFrame(
+        {
+            "Postcodecijfers": pd.to_numeric(eencijfer[postcode_field], errors="coerce").astype("Int64").array,
+            "PostcodeTabelJaar": _postcode_tabel_jaar(eencijfer[jaar_field], tabel_jaren),
+        },
+        index=eencijfer.index,
+    )
+    nieuwe_kolommen = _gather_lookup_columns(keys, postcodes, left_on=["Postcodecijfers", "PostcodeTabelJaar"])
+    nieuwe_kolommen = nieuwe_kolommen.rename(columns={col: col + suffix for col in nieuwe_kolommen.columns})
 
-    return result
+    return _append_columns(eencijfer, nieuwe_kolommen)
@@ -17,14 +17,15 @@ def _add_pa_cohort(eencijfer: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: Eencijfer with column indicating whether row is part of PA-cohort.
     """
     # Voeg een hulpkolom toe:
-    logger.debug('Add column Aantal')
-    eencijfer["Aantal"] = 1
+    if "Aantal" not in eencijfer:
+        logger.debug('Add column Aantal')
+        eencijfer["Aantal"] = 1
     # Filter: actief op 1 oktober
     filter_actiefopPeildatum = eencijfer.IndicatieActiefOpPeildatum == 1
 
     # Hoofdinschrijving
     # srt_inschr_typeho: Soort inschrijving type ho binnen soort ho
-    filter_soortinschrijving_ho = eencijfer.SoortInschrijvingHogerOnderwijs == 1
+    filter_soortinschrijving_ho = eencijfer.SoortInschrijvingHogerOnderwijs == '1'
     # Bacheloropleiding
     filter_type_ho = eencijfer.TypeHogerOnderwijsBinnenSoortHogerOnderwijs == "ba"
     # Geen AD
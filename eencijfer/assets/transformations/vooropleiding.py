@@ -2,9 +2,13 @@
 
 import logging
 import re
+from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 
+from eencijfer.assets.transformations.lookup import _append_columns, _gather_lookup_columns
+from eencijfer.io.files import _read_parquet
 from eencijfer.settings import config
 
 logger = logging.getLogger(__name__)
@@ -16,49 +20,70 @@ logger = logging.getLogger(__name__)
 # 3. InstellingVanDeHoogsteVooropleidingBinnenHetHo:
 
 
+# korte omschrijving per (exacte) term in de omschrijving van de vooropleiding, bij meerdere
+# termen wint de term die het hoogst in de lijst staat.
+VOOROPLEIDING_KORT = [
+    ("mbo", "mbo"),
+    ("vwo", "vwo"),
+    ("havo", "havo"),
+    ("hbo-p", "hbo-p"),
+    ("hbo-ba", "hbo-ba"),
+    ("hbo-ad", "hbo-ad"),
+    ("hbo-vo/ma", "hbo-master"),
+    ("hbo-pim", "hbo-master"),
+    ("wo-p", "wo-p"),
+    ("wo-ba", "wo-ba"),
+    ("wo-on/ma", "wo-master"),
+    ("wo-pim", "wo-master"),
+    ("wo-vo/ma/bf", "wo-master"),
+]
+VOOROPLEIDING_OVERIG = "overig"
+
+# Eén patroon voor alle termen; de lookahead vindt ook termen die elkaar overlappen.
+VOOROPLEIDING_PATTERN = re.compile(r"(?=\b(" + "|".join(re.escape(term) for term, _ in VOOROPLEIDING_KORT) + r")\b)")
+VOOROPLEIDING_PRIORITEIT = {term: i for i, (term, _) in enumerate(VOOROPLEIDING_KORT)}
+
+
 def _determine_vooropleiding(string: str) -> str:
     """Short description of vooropleiding.
 
     Args:
-        string (str): _description_
+        string (str): description of vooropleiding, e.g. OmschrijvingVooropleiding.
 
     Returns:
-        str: _description_
+        str: short description (mbo, havo, vwo, et cetera) or 'overig'.
     """
 
-    string = string.lower()
-
     # zoek exacte strings middels regular expressions
-    if re.search(r'\bmbo\b', string):
-        return "mbo"
-    elif re.search(r'\bvwo\b', string):
-        return "vwo"
-    elif re.search(r'\bhavo\b', string):
-        return "havo"
-    elif re.search(r'\bhbo-p\b', string):
-        return "hbo-p"
-    elif re.search(r'\bhbo-ba\b', string):
-        return "hbo-ba"
-    elif re.search(r'\bhbo-ad\b', string):
-        return "hbo-ad"
-    elif re.search(r'\bhbo-vo/ma\b', string):
-        return "hbo-master"
-    elif re.search(r'\bhbo-pim\b', string):
-        return "hbo-master"
-    elif re.search(r'\bwo-p\b', string):
-        return "wo-p"
-    elif re.search(r'\bwo-ba\b', string):
-        return "wo-ba"
-    elif re.search(r'\bwo-on/ma\b', string):
-        return "wo-master"
-    elif re.search(r'\bwo-pim\b', string):
-        return "wo-master"
-    elif re.search(r'\bwo-vo/ma/bf\b', string):
-        return "wo-master"
-    elif re.search(r'\bwo-ba\b', string):
-        return "wo-ba"
-    else:
-        return "overig"
+    terms = VOOROPLEIDING_PATTERN.findall(string.lower())
+    if not terms:
+        return VOOROPLEIDING_OVERIG
+
+    term = min(terms, key=VOOROPLEIDING_PRIORITEIT.__getitem__)
+    return VOOROPLEIDING_KORT[VOOROPLEIDING_PRIORITEIT[term]][1]
+
+
+def _determine_vooropleiding_kort(omschrijvingen: pd.Series) -> pd.Categorical:
+    """Short description of vooropleiding for a whole column.
+
+    Every distinct description is classified once, the result is broadcast back
+    to all rows with categorical codes. Missing descriptions stay missing.
+
+    Args:
+        omschrijvingen (pd.Series): column with descriptions of vooropleiding.
+
+    Returns:
+        pd.Categorical: short description per row.
+    """
+    codes, uniques = pd.factorize(omschrijvingen)
+    logger.debug(f"...{len(uniques)} unieke omschrijvingen voor {len(omschrijvingen)} rijen.")
+
+    categories = sorted({kort for _, kort in VOOROPLEIDING_KORT} | {VOOROPLEIDING_OVERIG})
+    category_codes = {kort: i for i, kort in enumerate(categories)}
+    unique_codes = np.array([category_codes[_determine_vooropleiding(u)] for u in uniques] + [-1], dtype="int8")
+
+    # code -1 (missende omschrijving) verwijst naar het laatste element: ook -1.
+    return pd.Categorical.from_codes(unique_codes[codes], categories=categories)
 
 
 # def _add_vooropleiding_kort(
@@ -100,7 +125,7 @@ def _add_vooropleiding_kort(
     logger.info(f"Initial DataFrame shape: {initial_shape}")
     
     logger.info("...voeg korte omschrijving vooropleiding toe (mbo, vwo, etc)")
-    Dec_vopl[new_column] = Dec_vopl[source_column].apply(_determine_vooropleiding)
+    Dec_vopl[new_column] = _determine_vooropleiding_kort(Dec_vopl[source_column])
     
     # After check
     final_shape = Dec_vopl.shape
@@ -197,22 +222,21 @@ def _add_vooropleiding(
     vooropleiding = _add_profiel_havo_vwo(Dec_vopl)
     vooropleiding = _add_vooropleiding_kort(vooropleiding)
 
-    result = pd.merge(
+    nieuwe_kolommen = _gather_lookup_columns(
         eencijfer,
         vooropleiding,
         left_on=vooropleiding_field,
         right_on="VooropleidingCode",
-        how="left",
-        suffixes=["", "_Vooropleiding"],
+        suffix="_Vooropleiding",
     )
-    if not len(result) == len(eencijfer):
+    if not len(nieuwe_kolommen) == len(eencijfer):
         raise Exception("Something went wrong merging.")
 
     # toekomst: 'VooropleidingKort' bestaat niet, want die heet 'Vooropleiding' (hierin staat de korte omschrijving),
     # maar als je 'Vooropleiding' omzet naar vooropleiding_field, wat 'HoogsteVooropleiding' is
     # krijg je tweemaal een kolom met dezelfde naam, maar andere invulling (codes vs korte beschrijvingen)
     # lijkt me ongewest.
-    result.rename(
+    nieuwe_kolommen.rename(
         columns={
             "OmschrijvingVooropleiding": vooropleiding_field + "Volledig",
             "ProfielVooropleiding": vooropleiding_field + "Profiel",
@@ -224,31 +248,34 @@ def _add_vooropleiding(
 
     # assert len(eencijfer.columns) == len(result.columns) - 3
 
-    return result
+    return _append_columns(eencijfer, nieuwe_kolommen)
 
 
-def _add_oorspronkelijke_vooropleiding(data: pd.DataFrame) -> pd.DataFrame:
+def _add_oorspronkelijke_vooropleiding(data: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """Voegt gegevens toe over type vooropleiding aan eindexamencijfers.
 
     Args:
         data (pd.DataFrame): dataframe met eindexamencijfers.
+        columns (Optional[List[str]], optional): kolommen uit Dec_vooropl die toegevoegd worden.
+            Defaults to None (alle).
 
     Returns:
         pd.DataFrame: dataframe met extra informatie over voorpleiding
     """
     source_dir = config.getpath('default', 'source_dir')
-    Dec_vooropl = pd.read_parquet(source_dir / 'Dec_vooropl.parquet')
+    if columns is not None:
+        columns = ["VooropleidingOorspronkelijkeCode"] + columns
+    Dec_vooropl = _read_parquet(source_dir / 'Dec_vooropl.parquet', columns=columns)
 
-    result = pd.merge(
+    nieuwe_kolommen = _gather_lookup_columns(
         data,
         Dec_vooropl,
         left_on=["VooropleidingOorspronkelijkeCode"],
-        right_on=["VooropleidingOorspronkelijkeCode"],
-        how="left",
+        suffix="_Vooropleiding",
     )
-    if len(data) != len(result):
+    if len(data) != len(nieuwe_kolommen):
         raise Exception('Lengths of dataframes do not match, something went wrong merging.')
-    return result
+    return _append_columns(data, nieuwe_kolommen)
 
 
 def _add_naam_instelling_vooropleiding(
@@ -290,15 +317,13 @@ def _add_naam_instelling_vooropleiding(
     }
 
     instelling_vooropleiding = Dec_brinvestigingsnummer.rename(columns=rename_fields)
-    result = pd.merge(
+    nieuwe_kolommen = _gather_lookup_columns(
         eencijfer,
         instelling_vooropleiding,
         left_on=[brin, vestiging],
-        right_on=[brin, vestiging],
-        how="left",
-        suffixes=["", "_Vooropleiding"],
+        suffix="_Vooropleiding",
     )
-    if not len(result) == len(eencijfer):
+    if not len(nieuwe_kolommen) == len(eencijfer):
         raise Exception("Er ging iets mis met mergen...")
 
-    return result
+    return _append_columns(eencijfer, nieuwe_kolommen)
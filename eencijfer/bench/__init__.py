@@ -0,0 +1 @@
+"""Benchmarks for the main stages of eencijfer, see `eencijfer bench`."""
@@ -0,0 +1,81 @@
+"""Input data for benchmarks in several scales."""
+
+import logging
+import shutil
+import zlib
+from pathlib import Path
+
+import pandas as pd
+
+from eencijfer.convert.eencijfer import _create_dict_matching_eencijfer_and_definition_files
+
+logger = logging.getLogger(__name__)
+
+PGN = "PersoonsgebondenNummer"
+
+# nauwkeurigheid van de steekproef van studenten
+SAMPLE_BUCKETS = 10_000
+
+
+def _pgn_slice(definition_file: Path) -> slice:
+    """Positions of PersoonsgebondenNummer in the records of a fixed-width file.
+
+    Args:
+        definition_file (Path): definition-file of the fixed-width file.
+
+    Raises:
+        Exception: PersoonsgebondenNummer is not in the definition.
+
+    Returns:
+        slice: positions of PersoonsgebondenNummer in a record.
+    """
+    definition = pd.read_csv(definition_file)
+    velden = definition[definition.Label == PGN]
+    if velden.empty:
+        raise Exception(f"{PGN} is not in {definition_file.name}.")
+    start = int(velden.StartingPosition.iloc[0]) - 1
+    return slice(start, start + int(velden.NumberOfPositions.iloc[0]))
+
+
+def _scale_source_dir(source_dir: Path, target_dir: Path, scale: float) -> Path:
+    """Copy eencijfer-files to target_dir, keeping a fraction of the students.
+
+    Students are selected on a hash of PersoonsgebondenNummer, so a student is in all
+    files or in none, and the sample for a smaller scale is part of the sample for a
+    bigger scale. Files without PersoonsgebondenNummer (decode tables) are copied as they are.
+
+    Args:
+        source_dir (Path): directory with eencijfer-files (.asc).
+        target_dir (Path): directory the files are written to.
+        scale (float): fraction of the students to keep, between 0 and 1.
+
+    Raises:
+        Exception: scale is not between 0 and 1.
+
+    Returns:
+        Path: target_dir.
+    """
+    if not 0 < scale <= 1:
+        raise Exception(f"Scale should be between 0 and 1, not {scale}.")
+
+    target_dir.mkdir(parents=True, exist_ok=True)
+    grens = int(scale * SAMPLE_BUCKETS)
+
+    for fpath, definition_file in _create_dict_matching_eencijfer_and_definition_files(source_dir).items():
+        target_fpath = target_dir / fpath.name
+        if target_fpath.is_file():
+            continue
+
+        labels = pd.read_csv(definition_file).Label.tolist()
+        if scale == 1 or PGN not in labels:
+            shutil.copyfile(fpath, target_fpath)
+            continue
+
+        logger.debug(f"...writing {scale:.0%} of the students in {fpath.name} to {target_dir}")
+        pgn = _pgn_slice(definition_file)
+        with open(fpath, "rb") as source, open(target_fpath, "wb") as target:
+            for record in source:
+                if zlib.crc32(record[pgn]) % SAMPLE_BUCKETS < grens:
+                    target.write(record)
+
+    return target_dir
@@ -0,0 +1,324 @@
+"""Time and memory-profile the main stages of eencijfer and compare with a baseline.
+
+Every stage is run `repeat` times for the time (the median is compared) and once more
+with tracemalloc for the peak memory, so tracing does not slow down the timed runs.
+The asset-cache is cleared before every run, so every run creates the asset again.
+tracemalloc only sees memory allocated by Python, numpy and pandas; memory used inside
+duckdb or arrow is not part of the peak memory.
+"""
+
+import gc
+import json
+import logging
+import platform
+import shutil
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from eencijfer import __version__
+from eencijfer.assets.cache import asset_cache
+from eencijfer.assets.cohorten import CohortEngine, create_cohorten_met_indicatoren
+from eencijfer.assets.eencijfer import _create_eencijfer_df
+from eencijfer.assets.eindexamencijfers import _create_eindexamencijfer_df
+from eencijfer.bench.data import _scale_source_dir
+from eencijfer.convert.eencijfer import (
+    _convert_to_parquet,
+    _create_dict_matching_eencijfer_and_definition_files,
+    read_asc,
+)
+from eencijfer.convert.pii import _replace_all_pgn_with_pseudo_id_remove_pii_local_id
+from eencijfer.io.db import _create_duckdb
+from eencijfer.io.files import ExportFormat, _save_to_file
+from eencijfer.settings import config
+from eencijfer.utils.memory import MB, _start_memory_tracking, _stop_memory_tracking, _track_peak_memory
+
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+
+# verschillen in tijd onder deze grens zijn ruis en geen regressie
+MIN_SECONDS = 0.05
+
+EXCEL_MAX_ROWS = 1_048_575
+
+
+class BenchResult(NamedTuple):
+    """Time and peak memory of a stage on one scale of the input."""
+
+    stage: str
+    scale: float
+    rows: Optional[int]
+    seconds: List[float]
+    median_seconds: float
+    peak_memory_mb: Optional[float]
+
+
+class Regression(NamedTuple):
+    """Change of a stage compared with the baseline."""
+
+    stage: str
+    scale: float
+    time_ratio: Optional[float]
+    memory_ratio: Optional[float]
+    regression: bool
+
+
+@contextmanager
+def _use_source_dir(source_dir: Path) -> Iterator[None]:
+    """Temporarily read decode tables from source_dir instead of the configured source_dir."""
+    previous = config.get('default', 'source_dir')
+    config.set('default', 'source_dir', Path(source_dir).as_posix())
+    try:
+        yield
+    finally:
+        config.set('default', 'source_dir', previous)
+
+
+def _measure(
+    stage: str, scale: float, func: Callable[[], Any], repeat: int = 3, track_memory: bool = True
+) -> Tuple[BenchResult, Any]:
+    """Time a stage and measure its peak memory.
+
+    Args:
+        stage (str): name of the stage.
+        scale (float): scale of the input.
+        func (Callable[[], Any]): runs the stage.
+        repeat (int, optional): number of timed runs. Defaults to 3.
+        track_memory (bool, optional): do an extra run with tracemalloc for the peak memory. Defaults to True.
+
+    Returns:
+        Tuple[BenchResult, Any]: result and the output of the last run.
+    """
+    logger.info(f"Benchmarking {stage} (scale {scale})...")
+    seconds = []
+    for _ in range(repeat):
+        asset_cache.clear()
+        gc.collect()
+        start = time.perf_counter()
+        output = func()
+        seconds.append(time.perf_counter() - start)
+
+    peak_memory_mb = None
+    if track_memory:
+        asset_cache.clear()
+        gc.collect()
+        memory_usage: dict = {}
+        started_memory_tracking = _start_memory_tracking()
+        try:
+            with _track_peak_memory(stage, memory_usage):
+                func()
+        finally:
+            if started_memory_tracking:
+                _stop_memory_tracking()
+        peak_memory_mb = round(memory_usage[stage] / MB, 2)
+
+    rows = len(output) if hasattr(output, '__len__') else None
+    result = BenchResult(
+        stage=stage,
+        scale=scale,
+        rows=rows,
+        seconds=[round(s, 4) for s in seconds],
+        median_seconds=round(statistics.median(seconds), 4),
+        peak_memory_mb=peak_memory_mb,
+    )
+    logger.info(f"...{stage}: {result.median_seconds:.3f} s, {peak_memory_mb} MB")
+    return result, output
+
+
+def _bench_scale(
+    source_dir: Path, work_dir: Path, scale: float, repeat: int = 3, track_memory: bool = True
+) -> List[BenchResult]:
+    """Benchmark all stages on one scale of the eencijfer-files in source_dir.
+
+    Args:
+        source_dir (Path): directory with eencijfer-files (.asc) and decode tables.
+        work_dir (Path): directory for the scaled input and the output of the stages.
+        scale (float): fraction of the students in source_dir, see `_scale_source_dir`.
+        repeat (int, optional): number of timed runs per stage. Defaults to 3.
+        track_memory (bool, optional): measure peak memory of every stage. Defaults to True.
+
+    Returns:
+        List[BenchResult]: result per stage.
+    """
+    scale_dir = work_dir / f"scale_{scale:g}"
+    asc_dir = _scale_source_dir(source_dir, scale_dir / 'asc', scale)
+    parquet_dir = scale_dir / 'parquet'
+    export_dir = scale_dir / 'export'
+    for directory in [parquet_dir, export_dir]:
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+
+    results = []
+
+    def _run(stage: str, func: Callable[[], Any]) -> Any:
+        result, output = _measure(stage, scale, func, repeat=repeat, track_memory=track_memory)
+        results.append(result)
+        return output
+
+    for fpath, definition_file in _create_dict_matching_eencijfer_and_definition_files(asc_dir).items():
+        if fpath.stem.startswith('Dec_'):
+            continue
+        for use_column_converters in [False, True]:
+            _run(
+                f"read_asc[{fpath.stem},converters={'on' if use_column_converters else 'off'}]",
+                lambda: read_asc(fpath, definition_file, use_column_converters=use_column_converters),
+            )
+
+    # geen onderdeel van de benchmark: invoer voor de volgende stappen
+    _convert_to_parquet(asc_dir, parquet_dir, use_column_converters=True)
+
+    _run(
+        "_replace_all_pgn_with_pseudo_id_remove_pii_local_id",
+        lambda: _replace_all_pgn_with_pseudo_id_remove_pii_local_id(parquet_dir),
+    )
+
+    with _use_source_dir(parquet_dir):
+        eencijfer = _run("_create_eencijfer_df", lambda: _create_eencijfer_df(source_dir=parquet_dir))
+        for engine in CohortEngine:
+            _run(
+                f"create_cohorten_met_indicatoren[engine={engine.value}]",
+                lambda: create_cohorten_met_indicatoren(source_dir=parquet_dir, eencijfer=eencijfer, engine=engine),
+            )
+        _run(
+            "_create_eindexamencijfer_df",
+            lambda: _create_eindexamencijfer_df(source_dir=parquet_dir, long_format=True),
+        )
+
+    for export_format in ExportFormat:
+        stage = f"export[{export_format.value}]"
+        if export_format == ExportFormat.duckdb:
+            _run(stage, lambda: _create_duckdb(parquet_dir, export_dir, 'eencijfer.duckdb'))
+        elif export_format == ExportFormat.xlsx and len(eencijfer) > EXCEL_MAX_ROWS:
+            logger.warning(f"Skipping {stage}, eencijfer has more rows than fit in Excel.")
+        else:
+            _run(
+                stage, lambda: _save_to_file(eencijfer, dir=export_dir, fname='eencijfer', export_format=export_format)
+            )
+
+    asset_cache.clear()
+    return results
+
+
+def _run_benchmarks(
+    source_dir: Path,
+    work_dir: Path,
+    scales: List[float],
+    repeat: int = 3,
+    track_memory: bool = True,
+) -> dict:
+    """Benchmark all stages on every scale.
+
+    Args:
+        source_dir (Path): directory with eencijfer-files (.asc) and decode tables.
+        work_dir (Path): directory for the scaled input and the output of the stages.
+        scales (List[float]): fractions of the students in source_dir.
+        repeat (int, optional): number of timed runs per stage. Defaults to 3.
+        track_memory (bool, optional): measure peak memory of every stage. Defaults to True.
+
+    Returns:
+        dict: results, with the version of eencijfer and the machine they were measured on.
+    """
+    results = []
+    for scale in sorted(scales):
+        results.extend(_bench_scale(source_dir, work_dir, scale, repeat=repeat, track_memory=track_memory))
+
+    return {
+        "results_version": RESULTS_VERSION,
+        "eencijfer_version": __version__,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "source_dir": Path(source_dir).as_posix(),
+        "repeat": repeat,
+        "results": [result._asdict() for result in results],
+    }
+
+
+def _save_results(results: dict, fpath: Path) -> None:
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    fpath.write_text(json.dumps(results, indent=2))
+    logger.info(f"Benchmark results saved to {fpath}")
+
+
+def _read_results(fpath: Path) -> dict:
+    """Read saved benchmark results.
+
+    Args:
+        fpath (Path): json-file with results, see `_save_results`.
+
+    Raises:
+        Exception: file is not a benchmark result of this version.
+
+    Returns:
+        dict: results.
+    """
+    results = json.loads(Path(fpath).read_text())
+    if results.get("results_version") != RESULTS_VERSION:
+        raise Exception(f"{fpath} does not contain benchmark results of version {RESULTS_VERSION}.")
+    return results
+
+
+def _ratio(value: Optional[float], baseline: Optional[float]) -> Optional[float]:
+    if value is None or not baseline:
+        return None
+    return round(value / baseline, 3)
+
+
+def _compare_with_baseline(results: dict, baseline: dict, threshold: float = 0.2) -> List[Regression]:
+    """Compare results with a baseline, per stage and scale.
+
+    A stage is a regression when its median time or peak memory is more than
+    `threshold` higher than in the baseline. Times below MIN_SECONDS are not compared.
+    Stages that are not in the baseline are skipped.
+
+    Args:
+        results (dict): results, see `_run_benchmarks`.
+        baseline (dict): baseline results.
+        threshold (float, optional): allowed relative increase. Defaults to 0.2.
+
+    Returns:
+        List[Regression]: comparison per stage and scale.
+    """
+    baseline_results = {(result["stage"], result["scale"]): result for result in baseline["results"]}
+
+    comparison = []
+    for result in results["results"]:
+        base = baseline_results.get((result["stage"], result["scale"]))
+        if base is None:
+            logger.debug(f"{result['stage']} (scale {result['scale']}) is not in the baseline.")
+            continue
+
+        time_ratio = _ratio(result["median_seconds"], base["median_seconds"])
+        memory_ratio = _ratio(result["peak_memory_mb"], base["peak_memory_mb"])
+        slower = (
+            time_ratio is not None
+            and time_ratio > 1 + threshold
+            and max(result["median_seconds"], base["median_seconds"]) >= MIN_SECONDS
+        )
+        more_memory = memory_ratio is not None and memory_ratio > 1 + threshold
+        comparison.append(
+            Regression(result["stage"], result["scale"], time_ratio, memory_ratio, regression=slower or more_memory)
+        )
+    return comparison
+
+
+def _format_results(results: dict, comparison: Optional[List[Regression]] = None) -> str:
+    """Format results (and the comparison with a baseline) as a table."""
+    compared = {(row.stage, row.scale): row for row in comparison or []}
+
+    lines = [f"{'stage':<62} {'scale':>6} {'rows':>10} {'median s':>10} {'peak MB':>10} {'time':>7} {'memory':>7}"]
+    for result in results["results"]:
+        row = compared.get((result["stage"], result["scale"]))
+        time_ratio = f"{row.time_ratio:.2f}x" if row and row.time_ratio is not None else ""
+        memory_ratio = f"{row.memory_ratio:.2f}x" if row and row.memory_ratio is not None else ""
+        peak = f"{result['peak_memory_mb']:.1f}" if result["peak_memory_mb"] is not None else ""
+        rows = result["rows"] if result["rows"] is not None else ""
+        lines.append(
+            f"{result['stage']:<62} {result['scale']:>6g} {rows:>10} {result['median_seconds']:>10.3f} "
+            f"{peak:>10} {time_ratio:>7} {memory_ratio:>7}{'  REGRESSION' if row and row.regression else ''}"
+        )
+    return "\n".join(lines)
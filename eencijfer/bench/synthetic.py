@@ -0,0 +1,712 @@
+"""Synthetic eencijfer-files for benchmarks and tests.
+
+The files are written in the fixed-width format of the definitions in the
+import_definitions_dir, so they are read and converted like a real delivery. Students
+are generated in blocks with numpy: every student gets a cohort, instelling, opleiding,
+vooropleiding and a number of years, and every year becomes a row in EV. Students drop
+out, switch opleiding and get propedeuse-, bachelor-, ad- and master-diplomas, so the
+indicators of cohorten are not trivial. Students with havo or vwo as vooropleiding have
+eindexamencijfers in VAKHAVW. Every code (instelling, opleiding, vooropleiding, school,
+postcode, land, nationaliteit, vak) is in the decode table (Dec_*) it is looked up in.
+
+Fields that are not used by eencijfer get a plausible code of the right width.
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from eencijfer.utils.catalog import file_catalog
+from eencijfer.utils.detect_eencijfer_files import _delivery_year, _get_list_of_definition_files
+
+logger = logging.getLogger(__name__)
+
+# aantal studenten dat in één keer wordt gegenereerd
+BLOCK_SIZE = 50_000
+
+DEFAULT_DELIVERY_YEAR = 2024
+COHORT_YEARS = 14
+
+BLANK = -1
+
+# rijen die in één keer in de buffer worden gezet; een stuk past in de cache
+RECORDS_PER_CHUNK = 2048
+
+# "0000" t/m "9999", vier bytes per getal
+DIGITS = np.array([f"{i:04d}" for i in range(10_000)], dtype="S4").view(np.uint32)
+
+# (code, naam, soort hoger onderwijs, kans)
+INSTELLINGEN = [
+    ("21PL", "Hogeschool Noord", "hbo", 0.7),
+    ("21RI", "Hogeschool Zuid", "hbo", 0.1),
+    ("22OJ", "Hogeschool Oost", "hbo", 0.08),
+    ("21PC", "Universiteit West", "wo", 0.07),
+    ("21PM", "Universiteit Midden", "wo", 0.05),
+]
+
+OPLEIDING_NAMEN = [
+    "Bedrijfskunde", "Rechten", "Psychologie", "Verpleegkunde", "Informatica", "Werktuigbouwkunde",
+    "Pedagogiek", "Communicatie", "Accountancy", "Logistiek", "Bouwkunde", "Biologie",
+    "Social Work", "Leraar Basisonderwijs", "Economie", "Geschiedenis", "Fysiotherapie",
+    "Elektrotechniek", "Journalistiek", "Voeding en Dietetiek",
+]
+
+# (type, fase eerste jaar, fase latere jaren, fase diploma, nominale duur, aantal opleidingen, eerste code)
+OPLEIDING_TYPES = [
+    ("ba", "D", "B", "B", 4, 40, 34000),
+    ("ad", "A", "A", "A", 2, 8, 80000),
+    ("ma", "M", "M", "M", 1, 12, 60000),
+]
+OPLEIDING_TYPE_KANSEN = [0.8, 0.08, 0.12]
+
+# kans op 1, 2, ... 7 jaar ingeschreven per type opleiding
+JAREN_KANSEN = {
+    "ba": [0.22, 0.08, 0.07, 0.3, 0.19, 0.09, 0.05],
+    "ad": [0.3, 0.45, 0.2, 0.05, 0, 0, 0],
+    "ma": [0.1, 0.7, 0.15, 0.05, 0, 0, 0],
+}
+
+# SoortDiplomaSoortHogerOnderwijs per fase van het diploma
+SOORT_DIPLOMA = {"D": 1, "A": 3, "B": 4, "M": 5}
+
+# (code, omschrijving, onderwijssector, kans); havo en vwo hebben eindexamencijfers
+VOOROPLEIDINGEN = [
+    ("00201", "havo algemeen", "VO", 0.4),
+    ("00401", "vwo algemeen", "VO", 0.2),
+    ("00500", "mbo niveau 4 bol", "BVE", 0.25),
+    ("00601", "hbo-p propedeuse", "HO", 0.03),
+    ("00701", "hbo-ba bachelor", "HO", 0.04),
+    ("00801", "wo-ba bachelor", "HO", 0.03),
+    ("00999", "buitenlands diploma", "OV", 0.05),
+]
+VO_VOOROPLEIDINGEN = ["00201", "00401"]
+
+# (code, afkorting, vak); de eerste twee vakken heeft iedereen
+VAKKEN = [
+    ("0010", "ne", "Nederlandse taal en literatuur"),
+    ("0020", "en", "Engelse taal en literatuur"),
+    ("0030", "wiA", "Wiskunde A"),
+    ("0031", "wiB", "Wiskunde B"),
+    ("0040", "na", "Natuurkunde"),
+    ("0041", "sk", "Scheikunde"),
+    ("0042", "biol", "Biologie"),
+    ("0050", "econ", "Economie"),
+    ("0051", "beco", "Bedrijfseconomie"),
+    ("0060", "gs", "Geschiedenis"),
+    ("0061", "ak", "Aardrijkskunde"),
+    ("0070", "du", "Duitse taal en literatuur"),
+]
+VAKKEN_PER_STUDENT = 7
+
+# (landcode, land, kans)
+LANDEN = [
+    ("6030", "Nederland", 0.82),
+    ("5010", "Belgie", 0.02),
+    ("9089", "Duitsland", 0.04),
+    ("6043", "Turkije", 0.03),
+    ("5022", "Marokko", 0.03),
+    ("5095", "Suriname", 0.02),
+    ("6003", "Indonesie", 0.02),
+    ("5001", "Canada", 0.02),
+]
+
+# (nationaliteitscode, nationaliteit, kans)
+NATIONALITEITEN = [
+    ("0001", "Nederlandse", 0.9),
+    ("0052", "Belgische", 0.02),
+    ("0055", "Duitse", 0.04),
+    ("0056", "Turkse", 0.02),
+    ("0058", "Marokkaanse", 0.02),
+]
+
+VO_SCHOLEN = 300
+POSTCODES = np.arange(1000, 10000)
+GEMEENTE_POSTCODES = 30
+
+
+def _kansen(values: List[tuple]) -> np.ndarray:
+    kansen = np.array([value[-1] for value in values], dtype=float)
+    return kansen / kansen.sum()
+
+
+def _codes(values: List[str]) -> np.ndarray:
+    return np.array(values, dtype="S")
+
+
+def _fixed_width(values: np.ndarray, width: int) -> np.ndarray:
+    """Format a column as fixed-width field.
+
+    Integers are zero-padded to width, BLANK (negative) integers become spaces.
+    Strings are left-aligned and padded with spaces; longer strings are cut off.
+
+    Args:
+        values (np.ndarray): integers, bytes or strings.
+        width (int): number of positions of the field.
+
+    Returns:
+        np.ndarray: uint8-array with a row of width characters per value.
+    """
+    if values.dtype.kind in "iu":
+        # per vier cijfers opzoeken in DIGITS, in plaats van een deling per cijfer
+        values = values.astype(np.int64)
+        blank = values < 0
+        rest = np.where(blank, 0, values) if blank.any() else values
+        chunks = -(-width // 4)
+        digits = np.empty((len(values), chunks), dtype=np.uint32)
+        for chunk in range(chunks - 1, -1, -1):
+            digits[:, chunk] = DIGITS[rest % 10_000]
+            if chunk > 0:
+                rest = rest // 10_000
+        field = digits.view(np.uint8)[:, 4 * chunks - width :]
+        field[blank] = ord(" ")
+        return field
+
+    if values.dtype.kind != "S":
+        values = np.char.encode(values.astype(str), "latin1")
+    field = values.astype(f"S{width}").view(np.uint8).reshape(len(values), width)
+    return np.where(field == 0, ord(" "), field).astype(np.uint8)
+
+
+def _records(definition: pd.DataFrame, columns: Dict[str, np.ndarray], n: int) -> bytes:
+    """Fixed-width records, one line per row.
+
+    Args:
+        definition (pd.DataFrame): definition with Label, StartingPosition and NumberOfPositions.
+        columns (Dict[str, np.ndarray]): values per label; labels without values are left blank.
+        n (int): number of rows.
+
+    Returns:
+        bytes: records, separated by newlines.
+    """
+    fields = [
+        (int(start) - 1, _fixed_width(np.asarray(columns[label]), int(width)))
+        for label, start, width in zip(definition.Label, definition.StartingPosition, definition.NumberOfPositions)
+        if label in columns
+    ]
+
+    end = definition.StartingPosition + definition.NumberOfPositions - 1
+    buffer = np.full((n, int(end.max()) + 1), ord(" "), dtype=np.uint8)
+    buffer[:, -1] = ord("\n")
+
+    # per stuk van RECORDS_PER_CHUNK rijen, zodat het stuk van buffer in de cache blijft
+    for first in range(0, n, RECORDS_PER_CHUNK):
+        last = first + RECORDS_PER_CHUNK
+        for start, field in fields:
+            buffer[first:last, start : start + field.shape[1]] = field[first:last]
+    return buffer.tobytes()
+
+
+def _write_table(fpath: Path, definition: pd.DataFrame, columns: Dict[str, list]) -> None:
+    n = max(len(values) for values in columns.values())
+    fpath.write_bytes(_records(definition, {label: np.asarray(values) for label, values in columns.items()}, n))
+
+
+def _read_definitions(definition_dir: Optional[Path] = None) -> Dict[str, pd.DataFrame]:
+    """Read definitions of EV, VAKHAVW and Dec_*-files, by file name.
+
+    Args:
+        definition_dir (Optional[Path], optional): directory with definitions.
+            Defaults to None (import_definitions_dir in config).
+
+    Returns:
+        Dict[str, pd.DataFrame]: definition per file name (without suffix).
+    """
+    definition_files = _get_list_of_definition_files(definition_dir)
+
+    definitions = {}
+    for fpath in sorted(definition_files):
+        if fpath.stem.startswith(("EV", "VAKH", "Dec_")):
+            definition = pd.read_csv(fpath, skipinitialspace=True)
+            definition["Label"] = definition.Label.str.strip()
+            definitions[fpath.stem] = definition
+    return definitions
+
+
+class _Domain:
+    """Codes that are shared by EV, VAKHAVW and the decode tables."""
+
+    def __init__(self):
+        self.opleiding_codes = []
+        self.opleiding_namen = []
+        self.opleiding_type = []
+        self.opleiding_kansen = []
+        for type_index, (type_ho, *_, aantal, eerste_code) in enumerate(OPLEIDING_TYPES):
+            kansen = 1 / np.arange(1, aantal + 1)
+            for i in range(aantal):
+                self.opleiding_codes.append(eerste_code + 37 * i)
+                prefix = {"ba": "B", "ad": "Ad", "ma": "M"}[type_ho]
+                self.opleiding_namen.append(f"{prefix} {OPLEIDING_NAMEN[i % len(OPLEIDING_NAMEN)]} {i // 20 + 1}")
+                self.opleiding_type.append(type_index)
+            self.opleiding_kansen.extend(OPLEIDING_TYPE_KANSEN[type_index] * kansen / kansen.sum())
+        self.opleiding_codes = np.array(self.opleiding_codes)
+        self.opleiding_type = np.array(self.opleiding_type)
+        self.opleiding_kansen = np.array(self.opleiding_kansen) / np.sum(self.opleiding_kansen)
+        self.croho_onderdeel = self.opleiding_codes % 10
+
+        self.scholen = np.array(
+            [f"{10 + i // 26:02d}{chr(65 + i % 26)}{chr(65 + (7 * i) % 26)}" for i in range(VO_SCHOLEN)], dtype="S4"
+        )
+        self.school_postcodes = POSTCODES[np.arange(VO_SCHOLEN) * 29 % len(POSTCODES)]
+
+    def gemeente(self, postcodes: np.ndarray, jaar: int, eerste_jaar: int) -> np.ndarray:
+        """Gemeentecode of postcodes; after the first table some gemeenten are merged (herindeling)."""
+        gemeente = postcodes // GEMEENTE_POSTCODES
+        samengevoegd = (gemeente % 17 == 0) & (jaar > eerste_jaar)
+        return np.where(samengevoegd, gemeente + 1, gemeente)
+
+
+def _decode_tables(domain: _Domain, definitions: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, list]]:
+    """Columns of every decode table, by file name.
+
+    Args:
+        domain (_Domain): codes used in EV and VAKHAVW.
+        definitions (Dict[str, pd.DataFrame]): definitions by file name.
+
+    Returns:
+        Dict[str, Dict[str, list]]: columns per decode table.
+    """
+    instellingen = [code for code, *_ in INSTELLINGEN]
+    instelling_namen = [naam for _, naam, *_ in INSTELLINGEN]
+    scholen = domain.scholen.astype(str).tolist()
+    school_namen = [f"Scholengemeenschap {i}" for i in range(VO_SCHOLEN)]
+    school_postcodes = domain.school_postcodes.tolist()
+    plaatsen = [f"Plaats {postcode // GEMEENTE_POSTCODES}" for postcode in school_postcodes]
+    landen = [code for code, *_ in LANDEN]
+    land_namen = [naam for _, naam, _ in LANDEN]
+    nationaliteiten = [code for code, *_ in NATIONALITEITEN]
+    etniciteit = ["1" if code == "6030" else "2" for code in landen]
+
+    tables = {
+        "Dec_actuele_instelling": {"ActueleInstelling": instellingen, "NaamActueleInstelling": instelling_namen},
+        "Dec_ho-inst": {"Instellingscode": instellingen, "NaamInstelling": instelling_namen},
+        "Dec_isat": {"Opleidingscode": domain.opleiding_codes, "NaamOpleiding": domain.opleiding_namen},
+        "Dec_ho_ISCED": {
+            "Opleidingscode": domain.opleiding_codes,
+            "ISCEDF2013Detailgroep": [f"0{onderdeel}11" for onderdeel in domain.croho_onderdeel],
+            "ISCEDF2013DetailgroepOmschrijving": [f"Detailgroep {naam}" for naam in domain.opleiding_namen],
+            "ISCEDF2013Rubriek": [f"0{onderdeel}1100" for onderdeel in domain.croho_onderdeel],
+            "ISCEDF2013RubriekOmschrijving": [f"Rubriek {onderdeel}" for onderdeel in domain.croho_onderdeel],
+        },
+        "Dec_vopl": {
+            "VooropleidingCode": [code for code, *_ in VOOROPLEIDINGEN],
+            "OmschrijvingVooropleiding": [omschrijving for _, omschrijving, *_ in VOOROPLEIDINGEN],
+        },
+        "Dec_vooropl": {
+            "VooropleidingOorspronkelijkeCode": [code for code, *_ in VOOROPLEIDINGEN],
+            "Onderwijssector": [sector for _, _, sector, _ in VOOROPLEIDINGEN],
+            "OmschrijvingVooropleidingOorspronkelijkeCode": [omschrijving for _, omschrijving, *_ in VOOROPLEIDINGEN],
+        },
+        "Dec_brinvestigingsnummer": {
+            "Brinnummer": scholen,
+            "Vestigingsnummer": ["00"] * VO_SCHOLEN,
+            "NaamInstellingVooropleiding": school_namen,
+            "PostcodeInstellingVooropleiding": school_postcodes,
+            "PlaatsInstellingVooropleiding": plaatsen,
+            "DatumOprichtingInstellingVooropleiding": ["19680801"] * VO_SCHOLEN,
+            "DenominatieInstellingVooropleidingCode": ["1", "2", "3"] * (VO_SCHOLEN // 3),
+            "NaamDenominatieInstellingVooropleiding": ["Openbaar", "Rooms-Katholiek", "Algemeen bijzonder"]
+            * (VO_SCHOLEN // 3),
+        },
+        "Dec_brinnummer": {
+            "Brinnummer": scholen,
+            "NaamInstelling": school_namen,
+            "Postcodecijfers": school_postcodes,
+            "Plaats": plaatsen,
+            "DatumOprichting": ["19680801"] * VO_SCHOLEN,
+        },
+        "Dec_vakcode": {
+            "VakCode": [code for code, *_ in VAKKEN],
+            "VakOmschrijving": [vak for *_, vak in VAKKEN],
+            "Vak": [vak for *_, vak in VAKKEN],
+            "VakAfkorting": [afkorting for _, afkorting, _ in VAKKEN],
+        },
+        "Dec_landcode": {
+            "LandCode": landen,
+            "Land": land_namen,
+            "EtniciteitCode": etniciteit,
+            "Etniciteit": ["Nederlands" if e == "1" else "Overig" for e in etniciteit],
+        },
+        "Dec_land_naar_herkomstindikking": {
+            "CodeLand": landen,
+            "HerkomstIndikkingVolgensCbsDefinitie": ["01" if e == "1" else "02" for e in etniciteit],
+            "HerkomstIndikkingVolgensCbsDefinitieOmschrijving": land_namen,
+        },
+        "Dec_nationaliteitscode": {
+            "NationaliteitCode": nationaliteiten,
+            "Nationaliteit": [naam for _, naam, _ in NATIONALITEITEN],
+            "EtniciteitCode": ["1"] + ["2"] * (len(nationaliteiten) - 1),
+        },
+    }
+    for name in ["Dec_vestnr_ho", "Dec_vestnr_ho_compleet"]:
+        gemeenten = [f"{i + 1:04d}" for i in range(len(INSTELLINGEN))]
+        tables[name] = {
+            "Brinnummer": instellingen,
+            "Vestigingsnummer": ["00"] * len(INSTELLINGEN),
+            "GemeentenaamCroho": [f"Gemeente {gemeente}" for gemeente in gemeenten],
+            "GemeenteCode": gemeenten,
+            "Gemeentenaam": [f"Gemeente {gemeente}" for gemeente in gemeenten],
+        }
+
+    postcode_jaren = sorted(
+        int(match.group(1))
+        for match in (re.fullmatch(r"Dec_postcodecijfers_(\d{4})", name) for name in definitions)
+        if match
+    )
+    for jaar in postcode_jaren:
+        gemeente_codes = domain.gemeente(POSTCODES, jaar, postcode_jaren[0])
+        tables[f"Dec_postcodecijfers_{jaar}"] = {
+            "Postcodecijfers": POSTCODES,
+            "Postbus": np.full(len(POSTCODES), b"N"),
+            "GemeenteCode": gemeente_codes,
+            "GemeenteNaam": np.char.add("Gemeente ", gemeente_codes.astype(str)),
+        }
+
+    # decode tables zonder model: alleen een unieke code in het eerste veld
+    for name, definition in definitions.items():
+        if name.startswith("Dec_") and name not in tables:
+            logger.debug(f"...no model for {name}, writing codes only.")
+            tables[name] = {definition.Label.iloc[0]: np.arange(1, 11)}
+
+    return {name: columns for name, columns in tables.items() if name in definitions}
+
+
+def _students(rng: np.random.Generator, domain: _Domain, first_pgn: int, n: int, delivery_year: int) -> dict:
+    """Properties of a block of students.
+
+    Args:
+        rng (np.random.Generator): random generator.
+        domain (_Domain): codes to choose from.
+        first_pgn (int): PersoonsgebondenNummer of the first student.
+        n (int): number of students.
+        delivery_year (int): last year in the delivery.
+
+    Returns:
+        dict: array per property, one value per student.
+    """
+    cohort = rng.integers(delivery_year - COHORT_YEARS + 1, delivery_year + 1, n)
+    opleiding = rng.choice(len(domain.opleiding_codes), n, p=domain.opleiding_kansen)
+    type_index = domain.opleiding_type[opleiding]
+
+    kansen = np.array([JAREN_KANSEN[type_ho] for type_ho, *_ in OPLEIDING_TYPES])
+    cumulatief = np.cumsum(kansen, axis=1)[type_index]
+    gewenste_jaren = (rng.random(n)[:, None] > cumulatief).sum(axis=1) + 1
+    jaren = np.minimum(gewenste_jaren, delivery_year - cohort + 1)
+
+    nominaal = np.array([duur for *_, duur, _, _ in OPLEIDING_TYPES])[type_index]
+    bachelor = type_index == 0
+
+    # propedeuse in het eerste of tweede jaar, eindexamen (diploma) in het laatste jaar
+    propedeuse_jaar = np.where(rng.random(n) < 0.7, 0, 1)
+    propedeuse = bachelor & (jaren > propedeuse_jaar + 1) & (rng.random(n) < 0.85)
+    diploma = (jaren == gewenste_jaren) & (jaren >= nominaal) & (rng.random(n) < 0.9)
+
+    # switch naar een andere bachelor na het eerste jaar
+    switch = bachelor & (jaren >= 3) & ~(propedeuse & (propedeuse_jaar == 0)) & (rng.random(n) < 0.1)
+    bachelors = np.flatnonzero(domain.opleiding_type == 0)
+    tweede_opleiding = np.where(switch, rng.choice(bachelors, n), opleiding)
+
+    vooropleiding = rng.choice(len(VOOROPLEIDINGEN), n, p=_kansen(VOOROPLEIDINGEN))
+    eerder_ho = np.where(rng.random(n) < 0.8, 0, rng.integers(1, 4, n))
+
+    return {
+        "pgn": first_pgn + np.arange(n),
+        "cohort": cohort,
+        "jaren": jaren,
+        "instelling": rng.choice(len(INSTELLINGEN), n, p=_kansen(INSTELLINGEN)),
+        "opleiding": opleiding,
+        "tweede_opleiding": tweede_opleiding,
+        "switch": switch,
+        "propedeuse": propedeuse,
+        "propedeuse_jaar": propedeuse_jaar,
+        "diploma": diploma,
+        "opleidingsvorm": rng.choice(3, n, p=[0.85, 0.1, 0.05]) + 1,
+        "vooropleiding": vooropleiding,
+        "eerder_ho": eerder_ho,
+        "school": rng.integers(0, VO_SCHOLEN, n),
+        "eindcijfer_vo": rng.normal(66, 5, n).clip(55, 95).astype(np.int64),
+        "geslacht": rng.random(n) < 0.5,
+        "leeftijd": 17 + eerder_ho + rng.poisson(1.0, n),
+        "postcode": rng.choice(POSTCODES, n),
+        "land": rng.choice(len(LANDEN), n, p=_kansen(LANDEN)),
+        "nationaliteit": rng.choice(len(NATIONALITEITEN), n, p=_kansen(NATIONALITEITEN)),
+        "bsn": rng.integers(100_000_000, 999_999_999, n),
+        "onderwijsnummer": rng.integers(100_000_000, 999_999_999, n),
+    }
+
+
+def _ev_columns(rng: np.random.Generator, domain: _Domain, students: dict, definition: pd.DataFrame) -> dict:
+    """EV-rows of a block of students: one row per student and year.
+
+    Args:
+        rng (np.random.Generator): random generator.
+        domain (_Domain): codes.
+        students (dict): properties of the students, see `_students`.
+        definition (pd.DataFrame): definition of EV.
+
+    Returns:
+        dict: column per label, plus "_n" with the number of rows.
+    """
+    jaren = students["jaren"]
+    n = int(jaren.sum())
+    s = {key: np.repeat(values, jaren) for key, values in students.items()}
+    jaar_index = np.arange(n) - np.repeat(np.cumsum(jaren) - jaren, jaren)
+    jaar = s["cohort"] + jaar_index
+    laatste_jaar = jaar_index == s["jaren"] - 1
+
+    opleiding = np.where(s["switch"] & (jaar_index >= 1), s["tweede_opleiding"], s["opleiding"])
+    type_index = domain.opleiding_type[opleiding]
+    eerste_fase = np.array([fase for _, fase, *_ in OPLEIDING_TYPES], dtype="S1")[type_index]
+    latere_fase = np.array([fase for _, _, fase, *_ in OPLEIDING_TYPES], dtype="S1")[type_index]
+    diploma_fase = np.array([fase for *_, fase, _, _, _ in OPLEIDING_TYPES], dtype="S1")[type_index]
+    eerste_jaar_opleiding = np.where(s["switch"] & (jaar_index >= 1), s["cohort"] + 1, s["cohort"])
+    opleiding_jaar_index = jaar - eerste_jaar_opleiding
+
+    fase_diploma = np.full(n, b"", dtype="S1")
+    is_propedeuse = s["propedeuse"] & (jaar_index == s["propedeuse_jaar"])
+    fase_diploma[is_propedeuse] = b"D"
+    is_diploma = s["diploma"] & laatste_jaar
+    fase_diploma[is_diploma] = diploma_fase[is_diploma]
+    heeft_diploma = is_propedeuse | is_diploma
+    soort_diploma = np.zeros(n, dtype=np.int64)
+    for fase, soort in SOORT_DIPLOMA.items():
+        soort_diploma[fase_diploma == fase.encode()] = soort
+
+    instelling = _codes([code for code, *_ in INSTELLINGEN])[s["instelling"]]
+    soort_ho = _codes([soort for _, _, soort, _ in INSTELLINGEN])[s["instelling"]]
+    vooropleiding = _codes([code for code, *_ in VOOROPLEIDINGEN])[s["vooropleiding"]]
+    is_vo = np.isin(vooropleiding, _codes(VO_VOOROPLEIDINGEN))
+    school = np.where(is_vo, domain.scholen[s["school"]], b"")
+    eerste_jaar_ho = s["cohort"] - s["eerder_ho"]
+    verblijfsjaar = jaar_index + 1
+    eerstejaars = (jaar_index == 0).astype(np.int64)
+    peildatum = np.where(rng.random(n) < 0.96, 1, 2)
+    hoofdinschrijving = np.where(rng.random(n) < 0.97, b"1", b"2")
+    nationaliteit = _codes([code for code, *_ in NATIONALITEITEN])[s["nationaliteit"]].astype(np.int64)
+    land = _codes([code for code, *_ in LANDEN])[s["land"]].astype(np.int64)
+    historisch = np.where(
+        rng.random(n) < 0.05, domain.opleiding_codes[rng.integers(0, len(domain.opleiding_codes), n)], BLANK
+    )
+
+    columns = {
+        "PersoonsgebondenNummer": s["pgn"],
+        "Inschrijvingsjaar": jaar,
+        "Instellingscode": instelling,
+        "ActueleInstelling": instelling,
+        "ActueleInstellingVoorBesturenfusies": instelling,
+        "Opleidingscode": domain.opleiding_codes[opleiding],
+        "OpleidingActueelEquivalent": domain.opleiding_codes[opleiding],
+        "OpleidingHistorischEquivalent": historisch,
+        "Opleidingsvorm": s["opleidingsvorm"],
+        "Opleidingsfase": np.where(opleiding_jaar_index == 0, eerste_fase, latere_fase),
+        "OpleidingsfaseActueel": np.where(opleiding_jaar_index == 0, eerste_fase, latere_fase),
+        "MaandVanaf": np.full(n, 9),
+        "MaandTot": np.where(laatste_jaar & ~is_diploma, rng.integers(1, 9, n), 8),
+        "BekostigingsCode": np.full(n, b"B"),
+        "EersteJaarAanDezeInstelling": s["cohort"],
+        "EersteJaarAanDezeActueleInstelling": s["cohort"],
+        "GecorrigeerdEersteJaarAanDezeInstelling": s["cohort"],
+        "EersteJaarAanDezeOpleidingInstelling": eerste_jaar_opleiding,
+        "EersteJaarInHetHogerOnderwijs": eerste_jaar_ho,
+        "EersteJaarAanDezeSoortHogerOnderwijs": eerste_jaar_ho,
+        "Inschrijvingsvorm": np.full(n, b"I"),
+        "SoortHogerOnderwijs": soort_ho,
+        "CrohoOnderdeelActueleOpleiding": domain.croho_onderdeel[opleiding],
+        "CrohoSubonderdeelActueleOpleiding": rng.integers(1, 20, n),
+        "TypeHogerOnderwijsBinnenSoortHogerOnderwijs": _codes([t for t, *_ in OPLEIDING_TYPES])[type_index],
+        "IndicatieActiefOpPeildatum": peildatum,
+        "SoortInschrijvingHogerOnderwijs": hoofdinschrijving,
+        "VerblijfsjaarHogerOnderwijs": verblijfsjaar + s["eerder_ho"],
+        "VerblijfsjaarSoortHo": verblijfsjaar + s["eerder_ho"],
+        "VerblijfsjaarTypeHoBinnenSoortHo": verblijfsjaar,
+        "VerblijfsjaarTypeHoBinnenHo": verblijfsjaar,
+        "VerblijfsjaarActueleOpleiding": opleiding_jaar_index + 1,
+        "VerblijfsjaarActueleInstelling": verblijfsjaar,
+        "VerblijfsjaarActueleOpleidingInstelling": opleiding_jaar_index + 1,
+        "IndicatieEerstejaarsOpleidingActueelEquivalent": (opleiding_jaar_index == 0).astype(np.int64),
+        "IndicatieEerstejaarsActueleInstelling": eerstejaars,
+        "IndicatieEerstejaarsActueleOplInstelling": (opleiding_jaar_index == 0).astype(np.int64),
+        "IndicatieEerstejrsActInstTypeHoBinnenSoortHo": eerstejaars,
+        "IndicatieEerstejaarsContinuHogerOnderwijs": eerstejaars * (s["eerder_ho"] == 0),
+        "IndicatieEerstejaarsContinuActueleInstelling": eerstejaars,
+        "Diplomajaar": np.where(heeft_diploma, jaar, 0),
+        "OpleidingsfaseActueelVanHetDiploma": fase_diploma,
+        "SoortDiplomaHogerOnderwijs": soort_diploma,
+        "SoortDiplomaSoortHogerOnderwijs": soort_diploma,
+        "SoortDiplomaInstelling": soort_diploma,
+        "SoortDiplomaHogerOnderwijsInternatStatistiek": soort_diploma,
+        "DatumTekeningDiploma": np.where(heeft_diploma, (jaar + 1) * 10_000 + 701, BLANK),
+        "HoogsteVooropleiding": vooropleiding,
+        "HoogsteVooropleidingVoorHetHo": vooropleiding,
+        "HoogsteVooropleidingVoorHetHoOorspronkelijkeCode": vooropleiding,
+        "DiplomajaarHoogsteVooropleiding": eerste_jaar_ho - 1,
+        "DiplomajaarVanDeHoogsteVooroplVoorHetHo": eerste_jaar_ho - 1,
+        "InstellingVanDeHoogsteVooropleiding": school,
+        "InstellingVanDeHoogsteVooroplVoorHetHo": school,
+        "VestigingsnummerVanDeHoogsteVooropleiding": np.where(is_vo, b"00", b""),
+        "VestigingsnummerVanDeHoogsteVooroplVoorHetHo": np.where(is_vo, b"00", b""),
+        "DiplomajaarVanDeHoogsteVooroplBinnenHetHo": np.zeros(n, dtype=np.int64),
+        "Geslacht": np.where(s["geslacht"], b"M", b"V"),
+        "LeeftijdPerPeildatum1Oktober": s["leeftijd"] + jaar_index,
+        "LeeftijdPer1Januari": s["leeftijd"] + jaar_index,
+        "Nationaliteit1": nationaliteit,
+        "Geboorteland": land,
+        "GeboortelandOuder1": land,
+        "GeboortelandOuder2": land,
+        "HerkomstlandVolgensCbsDefinitie": land,
+        "Generatie": np.where(land == 6030, 0, 1),
+        "PostcodecijfersStudentOp1Oktober": s["postcode"],
+        "PostcodecijfersVanDeHoogsteVooroplVoorHetHo": np.where(is_vo, domain.school_postcodes[s["school"]], BLANK),
+        "GemEindcijferVoVanDeHoogsteVooroplVoorHetHo": np.where(is_vo, s["eindcijfer_vo"], BLANK),
+        "DatumInschrijving": jaar * 10_000 + 901,
+        "DatumUitschrijving": np.where(laatste_jaar, (jaar + 1) * 10_000 + 831, BLANK),
+        "Vestigingsnummer": np.full(n, b"00"),
+        "VestigingsnummerActueel": np.full(n, b"00"),
+        "IndicatieEerActueel": np.where(nationaliteit == 1, b"J", b"N"),
+        "IndicatieInternationaleStudent": np.where(land == 6030, b"N", b"J"),
+        "IndicatieSoortProgramma": np.full(n, b"1"),
+        "Burgerservicenummer": s["bsn"],
+        "Onderwijsnummer": s["onderwijsnummer"],
+    }
+
+    # overige velden: een code van de juiste breedte
+    for label, width, converter in zip(definition.Label, definition.NumberOfPositions, definition.Converter):
+        if label in columns:
+            continue
+        if converter == "convert_to_int_zero_to_nan":
+            columns[label] = np.zeros(n, dtype=np.int64)
+        elif converter == "convert_to_date":
+            columns[label] = BLANK * np.ones(n, dtype=np.int64)
+        else:
+            columns[label] = rng.integers(0, min(10 ** int(width), 10), n)
+
+    columns["_n"] = n
+    return columns
+
+
+def _vakhavw_columns(rng: np.random.Generator, domain: _Domain, students: dict) -> dict:
+    """VAKHAVW-rows of the students with havo or vwo as vooropleiding: one row per vak.
+
+    Args:
+        rng (np.random.Generator): random generator.
+        domain (_Domain): codes.
+        students (dict): properties of the students, see `_students`.
+
+    Returns:
+        dict: column per label, plus "_n" with the number of rows.
+    """
+    vooropleiding = _codes([code for code, *_ in VOOROPLEIDINGEN])[students["vooropleiding"]]
+    vo = np.flatnonzero(np.isin(vooropleiding, _codes(VO_VOOROPLEIDINGEN)))
+    m = len(vo)
+
+    # Nederlands en Engels, plus een willekeurige keuze uit de overige vakken
+    keuze = np.argsort(rng.random((m, len(VAKKEN) - 2)), axis=1)[:, : VAKKEN_PER_STUDENT - 2] + 2
+    vakken = np.hstack([np.tile([0, 1], (m, 1)), keuze]).ravel()
+    student = np.repeat(vo, VAKKEN_PER_STUDENT)
+    n = len(student)
+
+    schoolexamen = rng.normal(66, 9, n).clip(10, 100).astype(np.int64)
+    eerste_ce = (schoolexamen + rng.normal(-3, 9, n)).clip(10, 100).astype(np.int64)
+    tweede_ce = np.where(rng.random(n) < 0.08, (eerste_ce + rng.normal(8, 6, n)).clip(10, 100), 0).astype(np.int64)
+    derde_ce = np.where((tweede_ce > 0) & (rng.random(n) < 0.05), (tweede_ce + 5).clip(10, 100), 0).astype(np.int64)
+    beste_ce = np.maximum.reduce([eerste_ce, tweede_ce, derde_ce])
+    eindcijfer = np.rint((schoolexamen + beste_ce) / 20).astype(np.int64)
+
+    columns = {
+        "PersoonsgebondenNummer": students["pgn"][student],
+        "BrinnummerVoInstelling": domain.scholen[students["school"]][student],
+        "VestigingsnummerVoVestiging": np.full(n, b"00"),
+        "VooropleidingOorspronkelijkeCode": vooropleiding[student],
+        "Diplomajaar": (students["cohort"] - students["eerder_ho"] - 1)[student],
+        "GemiddeldCijferCijferlijst": students["eindcijfer_vo"][student],
+        "VakCode": _codes([code for code, *_ in VAKKEN])[vakken],
+        "VakAfkorting": _codes([afkorting for _, afkorting, _ in VAKKEN])[vakken],
+        "IndicatieDiplomavak": np.full(n, b"J"),
+        "CijferSchoolexamen": schoolexamen,
+        "CijferEersteCentraalExamen": eerste_ce,
+        "CijferTweedeCentraalExamen": tweede_ce,
+        "CijferDerdeCentraalExamen": derde_ce,
+        "EersteEindcijfer": np.rint((schoolexamen + eerste_ce) / 20).astype(np.int64),
+        "TweedeEindcijfer": np.where(tweede_ce > 0, eindcijfer, 0),
+        "DerdeEindcijfer": np.where(derde_ce > 0, eindcijfer, 0),
+        "CijferCijferlijst": eindcijfer,
+        "Burgerservicenummer": students["bsn"][student],
+        "Onderwijsnummer": students["onderwijsnummer"][student],
+        "_n": n,
+    }
+    return columns
+
+
+def _generate_eencijfer_files(
+    target_dir: Path,
+    rows: int,
+    seed: int = 0,
+    definition_dir: Optional[Path] = None,
+    block_size: int = BLOCK_SIZE,
+) -> Dict[str, int]:
+    """Write synthetic EV-, VAKHAVW- and Dec_*-files (.asc) to target_dir.
+
+    Students are generated in blocks of block_size until EV has at least `rows` rows,
+    so EV has about `rows` rows (whole students). The same seed gives the same files.
+
+    Args:
+        target_dir (Path): directory the files are written to.
+        rows (int): number of rows in EV.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+        definition_dir (Optional[Path], optional): directory with definitions.
+            Defaults to None (import_definitions_dir in config).
+        block_size (int, optional): number of students per block. Defaults to BLOCK_SIZE.
+
+    Raises:
+        Exception: no definition of EV or VAKHAVW found.
+
+    Returns:
+        Dict[str, int]: number of rows per file written.
+    """
+    definitions = _read_definitions(definition_dir)
+    ev_names = [name for name in definitions if name.startswith("EV")]
+    vak_names = [name for name in definitions if name.startswith("VAKH")]
+    if not ev_names or not vak_names:
+        raise Exception("No definitions for EV and VAKHAVW found, can not generate eencijfer-files.")
+    ev_name, vak_name = ev_names[0], vak_names[0]
+    delivery_year = _delivery_year(ev_name) or DEFAULT_DELIVERY_YEAR
+
+    target_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    domain = _Domain()
+    logger.info(f"Generating about {rows} rows of EV (delivery {delivery_year}) in {target_dir}...")
+
+    written = {}
+    for name, table in _decode_tables(domain, definitions).items():
+        _write_table(target_dir / f"{name}.asc", definitions[name], table)
+        written[name] = max(len(values) for values in table.values())
+
+    written[ev_name] = written[vak_name] = 0
+    first_pgn = 100_000_000_000
+    with open(target_dir / f"{ev_name}.asc", "wb") as ev_file, open(target_dir / f"{vak_name}.asc", "wb") as vak_file:
+        while written[ev_name] < rows:
+            students = _students(rng, domain, first_pgn, block_size, delivery_year)
+
+            # het laatste blok afkappen op hele studenten
+            nodig = np.searchsorted(np.cumsum(students["jaren"]), rows - written[ev_name]) + 1
+            students = {key: values[:nodig] for key, values in students.items()}
+
+            for name, fh, create in [
+                (ev_name, ev_file, lambda: _ev_columns(rng, domain, students, definitions[ev_name])),
+                (vak_name, vak_file, lambda: _vakhavw_columns(rng, domain, students)),
+            ]:
+                columns = create()
+                n = columns.pop("_n")
+                fh.write(_records(definitions[name], columns, n))
+                written[name] += n
+
+            first_pgn += len(students["pgn"])
+            logger.debug(f"...{written[ev_name]} rows of EV written.")
+
+    logger.info(f"...written {written[ev_name]} rows to {ev_name} and {written[vak_name]} rows to {vak_name}.")
+    # bestaande bestanden zijn overschreven, dat verandert de mtime van target_dir niet altijd
+    file_catalog.invalidate(target_dir)
+    return written
@@ -1,25 +1,21 @@
-"""Console script for eencijfer."""
+"""Console script for eencijfer.
+
+Modules that import pandas, pyarrow or duckdb are imported in the commands that use
+them, so `eencijfer --version` and `eencijfer --help` start fast.
+"""
 
 import logging
 import shutil
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 import typer
 from typing_extensions import Annotated
 
 from eencijfer import APP_NAME, CONFIG_FILE, __version__
-from eencijfer.assets.cohorten import create_cohorten_met_indicatoren
-from eencijfer.assets.eencijfer import _create_eencijfer_df
-from eencijfer.assets.eindexamencijfers import _create_eindexamencijfer_df
-from eencijfer.convert.eencijfer import _convert_to_parquet
-from eencijfer.convert.pii import _replace_all_pgn_with_pseudo_id_remove_pii_local_id
-from eencijfer.io.db import _create_duckdb
-from eencijfer.io.files import ExportFormat, _convert_to_export_format, _save_to_file
+from eencijfer.assets.engines import CohortEngine
+from eencijfer.io.formats import ExportFormat
 from eencijfer.settings import config
-from eencijfer.utils.detect_eencijfer_files import _get_eencijfer_datafile
-from eencijfer.utils.init import _create_default_config
-from eencijfer.utils.qa import compare_eencijfer_files_and_definitions
 
 logger = logging.getLogger(__name__)
 
@@ -51,20 +47,52 @@ def main(
         callback=_version_callback,
         is_eager=True,
     ),
+    debug: Annotated[
+        bool, typer.Option("--debug", help="Log diagnostics, like value counts, that take extra passes over the data.")
+    ] = False,
+    debug_sample_rows: Annotated[
+        Optional[int], typer.Option(help="Compute the diagnostics of --debug on a random sample of this many rows.")
+    ] = None,
 ) -> None:
     """Eencijfer ETL-tool.
 
     Args:
         version (Optional[bool], optional): _description_. Defaults to typer.Option( None, "--version", "-v",
         help="Show the application's version and exit.", callback=_version_callback, is_eager=True, ).
+        debug (bool, optional): log diagnostics at debug-level. Defaults to False.
+        debug_sample_rows (Optional[int], optional): sample size for diagnostics. Defaults to None (all rows).
     """
     # _version_callback()
+    if debug:
+        from eencijfer.utils.debug import debug_mode
+
+        debug_mode.enable(sample_rows=debug_sample_rows)
     return None
 
 
+def _set_memory_budget(max_memory: Optional[str]) -> None:
+    """Set the memory budget of the run; the asset-cache gets its share of the budget."""
+    if max_memory is None:
+        return
+
+    from eencijfer.assets.cache import asset_cache
+    from eencijfer.utils.memory import _parse_memory_size, memory_budget
+
+    try:
+        memory_budget.set(_parse_memory_size(max_memory))
+    except Exception as e:
+        raise typer.BadParameter(str(e), param_hint="--max-memory")
+    cache_bytes = memory_budget.cache_bytes()
+    # zonder budget houdt de cache zijn eigen maximum
+    if cache_bytes is not None:
+        asset_cache.max_bytes = min(asset_cache.max_bytes, cache_bytes)
+
+
 @app.command()
 def init():
     """Initializes eencijfer-package."""
+    from eencijfer.utils.init import _create_default_config
+
     _create_default_config(CONFIG_FILE)
 
 
@@ -79,95 +107,347 @@ def convert(
     ] = True,
     remove_pii: Annotated[bool, typer.Option("--remove-pii/--do-not-remove-pii", "-p/-P")] = True,
     add_local_id: Annotated[bool, typer.Option("--add-local-id/--do-not-add-local-id", "-s/-S")] = False,
+    max_workers: Annotated[
+        Optional[int],
+        typer.Option(help="Maximum number of files converted at the same time (lower uses less memory)."),
+    ] = None,
+    max_memory: Annotated[
+        Optional[str],
+        typer.Option(help="Memory budget, e.g. 4GB: read and write in chunks, limit DuckDB, run one step at a time."),
+    ] = None,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Record time, memory and rows of every stage and file.")
+    ] = False,
+    profile_output: Annotated[Path, typer.Option(help="Json-file the profile is saved to.")] = Path(
+        "eencijfer-profile.json"
+    ),
 ):
-    """Convert eencijfer-files to desired exportformat, with or without PII."""
+    """Convert eencijfer-files to desired exportformat, with or without PII.
 
-    if source_dir is None:
-        source_dir = config.getpath('default', 'source_dir')
+    The source-dir can hold several deliveries (EV____23.asc, EV____24.asc, ... or a
+    directory per delivery); EV and VAKHAVW are then converted to one dataset each,
+    with a partition per delivery year.
+    """
+    from eencijfer.convert.eencijfer import _convert_to_parquet
+    from eencijfer.convert.pii import _replace_all_pgn_with_pseudo_id_remove_pii_local_id
+    from eencijfer.io.db import _create_duckdb
+    from eencijfer.io.files import _convert_to_export_format
+    from eencijfer.utils.detect_eencijfer_files import _get_eencijfer_datafile
+    from eencijfer.utils.profile import _profile_run
 
-    if result_dir is None:
-        result_dir = config.getpath('default', 'result_dir')
+    _set_memory_budget(max_memory)
 
-    working_dir = result_dir / '.temp_dir'
+    with _profile_run("convert", profile_output, enabled=profile):
+        if source_dir is None:
+            source_dir = config.getpath('default', 'source_dir')
 
-    db_name = config.getpath('default', 'db_name')
+        if result_dir is None:
+            result_dir = config.getpath('default', 'result_dir')
 
-    if not result_dir.is_dir():
-        Path(result_dir).mkdir(parents=True, exist_ok=True)
+        working_dir = result_dir / '.temp_dir'
 
-    if not working_dir.is_dir():
-        Path(working_dir).mkdir(parents=True, exist_ok=True)
+        db_name = config.getpath('default', 'db_name')
 
-    _convert_to_parquet(
-        source_dir=source_dir,
-        result_dir=working_dir,
-        export_format=ExportFormat.parquet,
-        use_column_converters=use_column_converters,
-    )
+        if not result_dir.is_dir():
+            Path(result_dir).mkdir(parents=True, exist_ok=True)
 
-    eencijfer_fname = _get_eencijfer_datafile(working_dir)
-    if eencijfer_fname:
-        _replace_all_pgn_with_pseudo_id_remove_pii_local_id(
-            eencijfer_dir=working_dir, remove_pii=remove_pii, add_local_id=add_local_id
+        if not working_dir.is_dir():
+            Path(working_dir).mkdir(parents=True, exist_ok=True)
+
+        _convert_to_parquet(
+            source_dir=source_dir,
+            result_dir=working_dir,
+            export_format=ExportFormat.parquet,
+            use_column_converters=use_column_converters,
+            max_workers=max_workers,
         )
 
-    if export_format.value == 'duckdb':
-        _create_duckdb(source_dir=working_dir, result_dir=result_dir, db_name=db_name)
-    else:
-        _convert_to_export_format(source_dir=working_dir, result_dir=result_dir, export_format=export_format)
+        eencijfer_fname = _get_eencijfer_datafile(working_dir)
+        if eencijfer_fname:
+            _replace_all_pgn_with_pseudo_id_remove_pii_local_id(
+                eencijfer_dir=working_dir, remove_pii=remove_pii, add_local_id=add_local_id
+            )
+
+        if export_format.value == 'duckdb':
+            _create_duckdb(source_dir=working_dir, result_dir=result_dir, db_name=db_name)
+        else:
+            _convert_to_export_format(source_dir=working_dir, result_dir=result_dir, export_format=export_format)
 
-    logger.debug(f'Removing working dir {working_dir}')
-    shutil.rmtree(working_dir)
+        logger.debug(f'Removing working dir {working_dir}')
+        shutil.rmtree(working_dir)
 
 
 @app.command()
 def qa():
     """Show overlap between eencijfer-files and definitions."""
+    from eencijfer.utils.qa import compare_eencijfer_files_and_definitions
+
     overlap = compare_eencijfer_files_and_definitions()
     typer.echo(overlap)
     typer.echo(Path().absolute())
 
 
 @app.command()
-def create_assets(export_format: ExportFormat = ExportFormat.parquet):
+def validate(
+    source_dir: Annotated[Optional[Path], typer.Option(help="Directory containing eencijfer source files.")] = None,
+):
+    """Check record lengths and encoding of the eencijfer-files without parsing them; exits with 1 on problems."""
+    from eencijfer.convert.eencijfer import _create_dict_matching_eencijfer_and_definition_files, _definition_width
+    from eencijfer.convert.validate import _format_validation, _validate_asc
+
+    if source_dir is None:
+        source_dir = config.getpath('default', 'source_dir')
+
+    valid = True
+    for fpath, definition_file in _create_dict_matching_eencijfer_and_definition_files(source_dir).items():
+        validation = _validate_asc(fpath, width=_definition_width(definition_file))
+        typer.echo(_format_validation(validation))
+        valid = valid and validation.valid
+
+    if not valid:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def create_assets(
+    export_format: ExportFormat = ExportFormat.parquet,
+    track_memory: Annotated[
+        bool, typer.Option("--track-memory/--do-not-track-memory", help="Log peak memory of every step.")
+    ] = False,
+    engine: Annotated[
+        CohortEngine, typer.Option(help="Engine used for the indicators of cohorten.")
+    ] = CohortEngine.pandas,
+    eindexamencijfers_long_format: Annotated[
+        bool,
+        typer.Option(
+            "--eindexamencijfers-long/--eindexamencijfers-wide",
+            help="Save eindexamencijfers with a row per soort examen (long) or a row per vak (wide).",
+        ),
+    ] = True,
+    incremental: Annotated[
+        bool,
+        typer.Option(
+            "--incremental/--full",
+            help="Store cohorten per cohort and only compute cohorts whose input changed since the last run.",
+        ),
+    ] = False,
+    max_workers: Annotated[
+        Optional[int],
+        typer.Option(help="Maximum number of assets created or saved at the same time (lower uses less memory)."),
+    ] = None,
+    max_memory: Annotated[
+        Optional[str],
+        typer.Option(help="Memory budget, e.g. 4GB: read and write in chunks, limit DuckDB, run one step at a time."),
+    ] = None,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Record time, memory and rows of every stage and file.")
+    ] = False,
+    profile_output: Annotated[Path, typer.Option(help="Json-file the profile is saved to.")] = Path(
+        "eencijfer-profile.json"
+    ),
+):
     """Create data-assets and save them to assets-directory."""
+    from eencijfer.assets.build import AssetBuild, _build_assets
+    from eencijfer.assets.cache import asset_cache
+    from eencijfer.assets.cohorten import create_cohorten_met_indicatoren
+    from eencijfer.assets.cohorten_incremental import _create_cohorten_incremental
+    from eencijfer.assets.eencijfer import _create_eencijfer_df
+    from eencijfer.assets.eindexamencijfers import _create_eindexamencijfer_df
+    from eencijfer.io.files import _save_to_file
+    from eencijfer.utils.memory import memory_budget
+    from eencijfer.utils.profile import _profile_run
+
+    _set_memory_budget(max_memory)
+
     source_dir = config.getpath('default', 'source_dir')
 
     assets_dir = config.getpath('default', 'assets_dir')
     if not assets_dir.is_dir():
         Path(assets_dir).mkdir(parents=True, exist_ok=True)
 
-    eencijfer = _create_eencijfer_df(source_dir=source_dir)
-    _save_to_file(eencijfer, dir=assets_dir, fname='eencijfer', export_format=export_format)
-    cohorten = create_cohorten_met_indicatoren(source_dir=source_dir, eencijfer=eencijfer)
-    _save_to_file(cohorten, dir=assets_dir, fname='cohorten', export_format=export_format)
-    eindexamencijfers = _create_eindexamencijfer_df(source_dir=source_dir)
-    _save_to_file(
-        eindexamencijfers,
-        dir=assets_dir,
-        fname='eindexamencijfers',
-        export_format=export_format,
+    if track_memory:
+        # peak memory per step is only meaningful when one asset is built at a time
+        max_workers = 1
+    max_workers = memory_budget.max_workers(max_workers)
+
+    builds = [
+        AssetBuild(
+            'eencijfer',
+            lambda assets: asset_cache.get_or_create(
+                'eencijfer', source_dir, lambda: _create_eencijfer_df(source_dir=source_dir, track_memory=track_memory)
+            ),
+        ),
+        AssetBuild(
+            'cohorten',
+            lambda assets: (
+                _create_cohorten_incremental(
+                    source_dir, partition_dir=assets_dir / 'cohorten', eencijfer=assets['eencijfer'], engine=engine
+                )
+                if incremental
+                else asset_cache.get_or_create(
+                    'cohorten',
+                    source_dir,
+                    lambda: create_cohorten_met_indicatoren(
+                        source_dir=source_dir, eencijfer=assets['eencijfer'], engine=engine
+                    ),
+                    engine=engine.value,
+                )
+            ),
+            depends_on=['eencijfer'],
+        ),
+        AssetBuild(
+            'eindexamencijfers',
+            lambda assets: asset_cache.get_or_create(
+                'eindexamencijfers',
+                source_dir,
+                lambda: _create_eindexamencijfer_df(source_dir=source_dir, long_format=eindexamencijfers_long_format),
+                long_format=eindexamencijfers_long_format,
+            ),
+        ),
+    ]
+
+    with _profile_run("create-assets", profile_output, enabled=profile, track_memory=track_memory):
+        _build_assets(
+            builds,
+            save=lambda name, data: _save_to_file(data, dir=assets_dir, fname=name, export_format=export_format),
+            max_workers=max_workers,
+        )
+
+
+@app.command()
+def bench(
+    source_dir: Annotated[
+        Optional[Path], typer.Option(help="Directory with eencijfer-files (asc) and decode tables.")
+    ] = None,
+    scale: Annotated[
+        Optional[List[float]],
+        typer.Option(help="Fraction of the students in source-dir to benchmark with, repeat for several scales."),
+    ] = None,
+    repeat: Annotated[int, typer.Option(help="Number of timed runs per stage.")] = 3,
+    track_memory: Annotated[
+        bool, typer.Option("--track-memory/--do-not-track-memory", help="Measure peak memory of every stage.")
+    ] = True,
+    output: Annotated[Path, typer.Option(help="Json-file the results are saved to.")] = Path("eencijfer-bench.json"),
+    baseline: Annotated[
+        Optional[Path], typer.Option(help="Json-file with results to compare with, e.g. of the last release.")
+    ] = None,
+    threshold: Annotated[
+        float, typer.Option(help="Relative increase in time or memory that is flagged as regression.")
+    ] = 0.2,
+    update_baseline: Annotated[
+        bool, typer.Option("--update-baseline", help="Save the results as new baseline.")
+    ] = False,
+    work_dir: Annotated[
+        Optional[Path], typer.Option(help="Directory for the scaled input and output, defaults to a temporary dir.")
+    ] = None,
+    generate_rows: Annotated[
+        Optional[int],
+        typer.Option(help="Benchmark with synthetic eencijfer-files with this many EV-rows instead of source-dir."),
+    ] = None,
+    seed: Annotated[int, typer.Option(help="Seed for the synthetic eencijfer-files.")] = 0,
+):
+    """Benchmark the main stages and compare with a baseline; exits with 1 on regressions."""
+    import tempfile
+
+    from eencijfer.bench.runner import (
+        _compare_with_baseline,
+        _format_results,
+        _read_results,
+        _run_benchmarks,
+        _save_results,
     )
+    from eencijfer.bench.synthetic import _generate_eencijfer_files
+
+    if source_dir is None:
+        source_dir = config.getpath('default', 'source_dir')
+
+    scales = scale or [0.1, 1.0]
+
+    with tempfile.TemporaryDirectory(prefix='eencijfer-bench-') as temp_dir:
+        work_dir = work_dir or Path(temp_dir)
+        if generate_rows is not None:
+            source_dir = work_dir / f'synthetic_{generate_rows}_{seed}'
+            if not source_dir.is_dir():
+                _generate_eencijfer_files(source_dir, rows=generate_rows, seed=seed)
+
+        results = _run_benchmarks(
+            source_dir=source_dir,
+            work_dir=work_dir,
+            scales=scales,
+            repeat=repeat,
+            track_memory=track_memory,
+        )
+    _save_results(results, output)
+
+    comparison = None
+    if baseline is not None and baseline.is_file() and not update_baseline:
+        comparison = _compare_with_baseline(results, _read_results(baseline), threshold=threshold)
+
+    typer.echo(_format_results(results, comparison))
+
+    if baseline is not None and (update_baseline or not baseline.is_file()):
+        _save_results(results, baseline)
+        typer.echo(f"Saved results as baseline {baseline}")
+
+    regressions = [row for row in comparison or [] if row.regression]
+    if regressions:
+        typer.echo(f"{len(regressions)} regression(s) compared with {baseline} (threshold {threshold:.0%}).")
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def generate_data(
+    target_dir: Annotated[Path, typer.Option(help="Directory the synthetic eencijfer-files are written to.")] = Path(
+        "synthetic"
+    ),
+    rows: Annotated[int, typer.Option(help="Number of rows in EV (whole students, so about this number).")] = 10_000,
+    seed: Annotated[int, typer.Option(help="Seed of the random generator; the same seed gives the same files.")] = 0,
+):
+    """Write synthetic EV-, VAKHAVW- and Dec_*-files (asc) for benchmarks and tests."""
+    from eencijfer.bench.synthetic import _generate_eencijfer_files
+
+    written = _generate_eencijfer_files(target_dir, rows=rows, seed=seed)
+    for name, n in written.items():
+        typer.echo(f"{name:<40} {n:>12} rows")
+
 
 @app.command()
-def run_pipeline(export_format: ExportFormat = ExportFormat.parquet):
+def run_pipeline(
+    export_format: ExportFormat = ExportFormat.parquet,
+    engine: Annotated[
+        CohortEngine, typer.Option(help="Engine used for the indicators of cohorten.")
+    ] = CohortEngine.pandas,
+    max_memory: Annotated[
+        Optional[str],
+        typer.Option(help="Memory budget, e.g. 4GB: read and write in chunks, limit DuckDB, run one step at a time."),
+    ] = None,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Record time, memory and rows of every stage and file.")
+    ] = False,
+    profile_output: Annotated[Path, typer.Option(help="Json-file the profile is saved to.")] = Path(
+        "eencijfer-profile.json"
+    ),
+):
     """Run the entire pipeline: init, convert, and create-assets."""
+    from eencijfer.utils.profile import _profile_run
+
     try:
         typer.echo("Initializing the project...")
         init()
     except Exception as e:
         logger.error(f"Failed to initialize the project: {e}")
 
-    try:
-        typer.echo("Converting data to the specified export format...")
-        convert(export_format=export_format)
-    except Exception as e:
-        logger.error(f"Failed to convert data: {e}")
-
-    try:
-        typer.echo("Creating data-assets and saving them to assets-directory...")
-        create_assets(export_format=export_format)
-    except Exception as e:
-        logger.error(f"Failed to create data-assets: {e}")
+    with _profile_run("run-pipeline", profile_output, enabled=profile):
+        try:
+            typer.echo("Converting data to the specified export format...")
+            convert(export_format=export_format, max_memory=max_memory)
+        except Exception as e:
+            logger.error(f"Failed to convert data: {e}")
+
+        try:
+            typer.echo("Creating data-assets and saving them to assets-directory...")
+            create_assets(export_format=export_format, engine=engine, max_memory=max_memory)
+        except Exception as e:
+            logger.error(f"Failed to create data-assets: {e}")
 
     typer.echo("Pipeline execution completed.")
\ No newline at end of file
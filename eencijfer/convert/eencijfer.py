@@ -1,31 +1,199 @@
 """Main eencijfer module."""
 
 import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from eencijfer import CONVERTERS
+from eencijfer.convert import column_converters  # noqa: F401, registers the column-converters in CONVERTERS
+from eencijfer.convert.validate import _log_validation, _validate_asc
 from eencijfer.io.files import ExportFormat, _save_to_file
-from eencijfer.utils.detect_eencijfer_files import _get_list_of_definition_files, _get_list_of_eencijfer_files_in_dir
+from eencijfer.utils.catalog import HEADER_BYTES, _common_length, _record_lengths, file_catalog
+from eencijfer.utils.compression import _in_archive, _open_binary
+from eencijfer.utils.detect_eencijfer_files import (
+    DELIVERY_COLUMN,
+    _find_deliveries,
+    _get_list_of_definition_files,
+    _get_list_of_eencijfer_files_in_dir,
+)
+from eencijfer.utils.memory import memory_budget
+from eencijfer.utils.profile import _in_current_stage, _profile_stage
 
 logger = logging.getLogger(__name__)
 
-definition_files = _get_list_of_definition_files()
+# piekgeheugen per teken van een regel bij het inlezen met read_fwf (gemeten: 18 tot 21)
+ASC_BYTES_PER_CHARACTER = 24
 
+# soorten bestanden die per levering worden bewaard, in een dataset met deze naam
+DATASET_NAMES = {'EV': 'EV', 'VAKHAV': 'VAKHAVW'}
 
-def _match_file_to_definition(fpath: Path, definition_files: list = definition_files) -> Optional[Path]:
+
+class _Conversion(NamedTuple):
+    """An eencijfer-file, the definition it is read with and the file it is converted to."""
+
+    fpath: Path
+    definition_file: Path
+    target_fpath: Path
+
+
+class _RecordLengthIndex(NamedTuple):
+    """Record length of every definition, and the definitions per record length."""
+
+    widths: Dict[Path, int]
+    definitions: Dict[int, List[Path]]
+
+
+# index per set definitiebestanden, zodat elke definitie maar één keer wordt gelezen
+_record_length_indexes: Dict[tuple, _RecordLengthIndex] = {}
+
+
+def _definition_width(definition_file: Path) -> int:
+    """Number of characters of a record of a definition, without the line end.
+
+    Fields can overlap (like Etniciteit and EtniciteitLangCode in Dec_landcode), so the width
+    is the end of the last field and not the sum of the widths of the fields.
+    """
+    definition = pd.read_csv(definition_file)
+    return int((definition.StartingPosition + definition.NumberOfPositions - 1).max())
+
+
+def _record_length_index(definition_files: list) -> _RecordLengthIndex:
+    key = tuple(definition_files)
+    index = _record_length_indexes.get(key)
+    if index is None:
+        widths = {definition_file: _definition_width(definition_file) for definition_file in definition_files}
+        definitions: Dict[int, List[Path]] = {}
+        for definition_file, width in widths.items():
+            definitions.setdefault(width, []).append(definition_file)
+        index = _RecordLengthIndex(widths, definitions)
+        _record_length_indexes[key] = index
+    return index
+
+
+def _definition_kind(stem: str) -> str:
+    """EV- and VAKHAVW-definitions of all delivery years are one kind, other definitions are their own kind."""
+    for prefix in ['EV', 'VAKHAV']:
+        if stem.startswith(prefix):
+            return prefix
+    return stem.lower()
+
+
+def _sniff_record_length(fpath: Path) -> Optional[int]:
+    """Record length of an asc-file from its first lines (see `CatalogEntry.record_length`), None if unknown.
+
+    The first lines of a file in a compressed file are decompressed to sniff them.
+    """
+    if _in_archive(fpath):
+        if fpath.suffix.lower() != '.asc':
+            return None
+        with _open_binary(fpath) as file:
+            return _common_length(_record_lengths(file.read(HEADER_BYTES)))
+
+    entry = file_catalog.entry(fpath)
+    if entry is None or entry.suffix.lower() != '.asc':
+        return None
+    return entry.record_length
+
+
+def _match_record_length(
+    fpath: Path, record_length: int, definition_file: Path, definition_files: list
+) -> Optional[Path]:
+    """Check the definition matched on name against the record length of the file.
+
+    When the record length differs from the width of the definition, a definition of the same
+    kind (e.g. EV of another delivery year) with that width is used.
+
+    Args:
+        fpath (Path): Path to .asc-file.
+        record_length (int): record length of the file, without the line end.
+        definition_file (Path): definition matched on name.
+        definition_files (list): definition-files.
+
+    Returns:
+        Optional[Path]: definition that fits the file, None if there is none.
+    """
+    index = _record_length_index(definition_files)
+    width = index.widths[definition_file]
+    if record_length == width:
+        return definition_file
+
+    kind = _definition_kind(definition_file.stem)
+    fitting = [d for d in index.definitions.get(record_length, []) if _definition_kind(d.stem) == kind]
+    if fitting:
+        logger.warning(
+            f"Records of {fpath.name} have {record_length} characters, {definition_file.name} has {width}; "
+            f"using {fitting[0].name} instead."
+        )
+        return fitting[0]
+
+    logger.error(
+        f"Records of {fpath.name} have {record_length} characters, {definition_file.name} has {width} "
+        f"and no other definition of {kind} has {record_length}; {fpath.name} is skipped."
+    )
+    return None
+
+
+def _check_record_length(fpath: Path, definition_file: Path) -> None:
+    """Raise before parsing when the record length of fpath differs from the width of the definition.
+
+    Raises:
+        Exception: records do not fit the definition.
+    """
+    record_length = _sniff_record_length(fpath)
+    width = _definition_width(definition_file)
+    if record_length is not None and record_length != width:
+        raise Exception(
+            f"Records of {fpath.name} have {record_length} characters, {definition_file.name} has {width}; "
+            "check your definitions."
+        )
+
+
+def _match_file_to_definition(fpath: Path, definition_files: Optional[list] = None) -> Optional[Path]:
     """Matches import-definitions to .asc-files in eencijfer-directory.
 
+    A definition is matched on the name of the file and checked against the record length
+    of its first lines, see `_match_record_length`, so a file that does not fit its definition
+    is found without parsing it. The match is kept in the file catalog, so a file is matched
+    once for the same definitions.
+
     Args:
         fpath (Path): Path to .asc-file.
-        config (configparser.ConfigParser, optional): conf-object. Defaults to config.
+        definition_files (Optional[list], optional): definition-files. Defaults to None, the files in
+            the import_definitions_dir of the config.
 
     Returns:
         Optional[Path]: Path to definition file.
     """
+    if definition_files is None:
+        definition_files = _get_list_of_definition_files()
+
+    entry = file_catalog.entry(fpath)
+    key = tuple(definition_files)
+    if entry is not None and entry.definition is not None and entry.definition[0] == key:
+        return entry.definition[1]
 
+    matching_definition_file = _match_file_to_definition_by_name(fpath, definition_files)
+
+    record_length = _sniff_record_length(fpath)
+    if matching_definition_file is not None and record_length is not None:
+        matching_definition_file = _match_record_length(
+            fpath, record_length, matching_definition_file, definition_files
+        )
+
+    logger.debug(f"Definition-file for {fpath.stem} is set to: {matching_definition_file}")
+    if entry is not None:
+        entry.definition = (key, matching_definition_file)
+    return matching_definition_file
+
+
+def _match_file_to_definition_by_name(fpath: Path, definition_files: list) -> Optional[Path]:
     matching_definition_file = None
 
     try:
@@ -50,7 +218,6 @@ def _match_file_to_definition(fpath: Path, definition_files: list = definition_f
         except IndexError:
             pass
 
-    logger.debug(f"Definition-file for {fpath.stem} is set to: {matching_definition_file}")
     return matching_definition_file
 
 
@@ -65,8 +232,9 @@ def _create_dict_matching_eencijfer_and_definition_files(source_dir: Path) -> di
     if eencijfer_files is None:
         raise Exception('No files found!')
 
+    definition_files = _get_list_of_definition_files()
     for eencijfer_file in eencijfer_files:
-        matching_definition_file = _match_file_to_definition(eencijfer_file)
+        matching_definition_file = _match_file_to_definition(eencijfer_file, definition_files)
         if isinstance(matching_definition_file, Path):
             result_dict[eencijfer_file] = matching_definition_file
             logger.debug(f"{eencijfer_file.stem} is matched to: {matching_definition_file}")
@@ -74,6 +242,59 @@ def _create_dict_matching_eencijfer_and_definition_files(source_dir: Path) -> di
     return result_dict
 
 
+def _plan_conversions(source_dir: Path, result_dir: Path, export_format: ExportFormat) -> List[_Conversion]:
+    """Match the eencijfer-files of every delivery in source_dir to a definition and a target file.
+
+    With one delivery every file is converted to result_dir, as `<name>.<export_format>`.
+    With several deliveries the EV- and VAKHAVW-files are converted to a dataset with a
+    partition per delivery, `result_dir/EV.parquet/Leveringsjaar=<year>/<name>.parquet`, so
+    they can be read as one table; of the other files (decode tables) only the file of the
+    latest delivery is converted.
+
+    Args:
+        source_dir (Path): directory with eencijfer-files, or with a directory per delivery.
+        result_dir (Path): directory the files are converted to.
+        export_format (ExportFormat): export format; datasets are always in parquet.
+
+    Returns:
+        List[_Conversion]: conversions.
+    """
+    deliveries = _find_deliveries(source_dir)
+    if len(deliveries) == 0:
+        raise Exception('No files found!')
+
+    definition_files = _get_list_of_definition_files()
+    matched = []
+    for delivery in deliveries:
+        for fpath in delivery.files:
+            definition_file = _match_file_to_definition(fpath, definition_files)
+            if isinstance(definition_file, Path):
+                logger.debug(f"{fpath.stem} is matched to: {definition_file}")
+                matched.append((delivery.year, fpath, definition_file))
+
+    # per soort bestand de leveringen, oudste eerst
+    kinds: Dict[str, list] = {}
+    for year, fpath, definition_file in matched:
+        kinds.setdefault(_definition_kind(definition_file.stem), []).append(fpath)
+
+    conversions = []
+    for year, fpath, definition_file in matched:
+        files = kinds[_definition_kind(definition_file.stem)]
+        if len(deliveries) > 1 and len(files) > 1:
+            kind = _definition_kind(definition_file.stem)
+            if kind in DATASET_NAMES:
+                partition = result_dir / f"{DATASET_NAMES[kind]}.parquet" / f"{DELIVERY_COLUMN}={year}"
+                conversions.append(_Conversion(fpath, definition_file, partition / f"{fpath.stem}.parquet"))
+                continue
+            if fpath != files[-1]:
+                logger.info(f"...skipping {fpath}, the file of the latest delivery is used: {files[-1]}")
+                continue
+        target_fpath = (result_dir / fpath.name).with_suffix(f".{export_format.value}")
+        conversions.append(_Conversion(fpath, definition_file, target_fpath))
+
+    return conversions
+
+
 def _create_definition_with_converter(
     definition_file: Path,
 ) -> pd.DataFrame:
@@ -135,57 +356,240 @@ def _convert_to_parquet(
     result_dir: Path,
     export_format: ExportFormat = ExportFormat.parquet,
     use_column_converters: bool = False,
+    max_workers: Optional[int] = None,
 ) -> None:
     """Saves data to the export format.
 
     Main function that reads and converts to export-format, to the
-    result-directory specified in the config-file.
+    result-directory specified in the config-file. The files are converted
+    at the same time (at most max_workers at once); when source_dir holds several
+    deliveries, the EV- and VAKHAVW-files are combined in a dataset per kind, see
+    `_plan_conversions`.
 
     Args:
-        df (pd.DataFrame): The DataFrame to be saved.
-        fname (str, optional): The filename to use for saving. Defaults to "unknown".
+        source_dir (Path): directory with eencijfer-files, or with a directory per delivery.
+        result_dir (Path): directory the files are converted to.
         export_format (str, optional): The export format to use. Defaults to 'parquet'.
-        config (configparser.ConfigParser, optional): The configuration parser
-        containing the result directory. Defaults to config.
+        use_column_converters (bool, optional): whether to use column_converters. Defaults to False.
+        max_workers (Optional[int], optional): maximum number of files converted at the same time.
+            Defaults to None, one at a time with a memory budget.
 
     Returns:
         None: This function does not return a value.
     """
-    # get dict with files and definitions:
-    eencijfer_definition_pairs = _create_dict_matching_eencijfer_and_definition_files(source_dir)
-
-    for file, definition_file in eencijfer_definition_pairs.items():
-        target_fpath = Path(result_dir / file.name).with_suffix(f".{export_format.value}")
-
-        logger.info("**************************************")
-        logger.info("**************************************")
-        logger.info("")
-        logger.info(f"   Start reading: {file.name}")
-        logger.info("")
-        logger.info(f"   source_file:{file}")
-        logger.info(f"   definition_file:{definition_file}")
-        logger.info(f"   target_fpath:{target_fpath}")
-        logger.info("")
-        logger.info("**************************************")
-        logger.info("")
+    conversions = _plan_conversions(source_dir, result_dir, export_format)
 
-        try:
-            raw_data = read_asc(file, definition_file, use_column_converters=use_column_converters)
+    def _convert(conversion: _Conversion) -> None:
+        _convert_file(conversion, export_format=export_format, use_column_converters=use_column_converters)
+
+    with ThreadPoolExecutor(max_workers=memory_budget.max_workers(max_workers)) as executor:
+        list(executor.map(_in_current_stage(_convert), conversions))
+
+    # bestanden van een dataset staan in result_dir/<dataset>/Leveringsjaar=<jaar>/
+    dataset_dirs = {c.target_fpath.parent.parent for c in conversions if c.target_fpath.parent != result_dir}
+    for dataset_dir in sorted(dataset_dirs):
+        if dataset_dir.is_dir():
+            _unify_dataset_schema(dataset_dir)
+    return None
+
+
+def _convert_file(
+    conversion: _Conversion, export_format: ExportFormat = ExportFormat.parquet, use_column_converters: bool = False
+) -> None:
+    """Read an eencijfer-file with its definition and save it to the target file of the conversion."""
+    file, definition_file, target_fpath = conversion
+
+    logger.info("**************************************")
+    logger.info("**************************************")
+    logger.info("")
+    logger.info(f"   Start reading: {file.name}")
+    logger.info("")
+    logger.info(f"   source_file:{file}")
+    logger.info(f"   definition_file:{definition_file}")
+    logger.info(f"   target_fpath:{target_fpath}")
+    logger.info("")
+    logger.info("**************************************")
+    logger.info("")
+
+    chunk_rows = None
+    if export_format == ExportFormat.parquet:
+        chunk_rows = memory_budget.chunk_rows(_record_length(definition_file) * ASC_BYTES_PER_CHARACTER)
+
+    try:
+        target_fpath.parent.mkdir(parents=True, exist_ok=True)
+
+        # structuur controleren en records tellen voordat er iets wordt geparsed
+        with _profile_stage("validate", name=file.name) as stage:
+            validation = _validate_asc(file, width=_definition_width(definition_file))
+            stage["rows_out"] = validation.rows
+        _log_validation(validation)
+
+        if chunk_rows is not None and validation.rows > chunk_rows:
+            logger.info(f"...converting {file.name} in chunks of {chunk_rows} rows")
+            rows = _convert_asc_in_chunks(
+                file, definition_file, target_fpath, chunk_rows, use_column_converters=use_column_converters
+            )
+            _check_row_count(file, rows, validation.rows)
+            if rows == 0:
+                logger.info(f"...there does not seem to be data in {file.name}!")
+        else:
+            # de converters draaien tijdens het inlezen, parsen en converteren is één stap
+            with _profile_stage(
+                "parse+convert" if use_column_converters else "parse", name=file.name, rows_in=validation.rows
+            ) as stage:
+                raw_data = read_asc(file, definition_file, use_column_converters=use_column_converters)
+                stage["rows_out"] = len(raw_data)
+            _check_row_count(file, len(raw_data), validation.rows)
 
             if len(raw_data) > 0:
                 logger.warning(f"...reading {file.name} succeeded.")
-                _save_to_file(raw_data, dir=result_dir, fname=file.stem, export_format=export_format)
+                _save_to_file(raw_data, dir=target_fpath.parent, fname=target_fpath.stem, export_format=export_format)
 
             else:
                 logger.info(f"...there does not seem to be data in {file.name}!")
-        except Exception as e:
-            logger.warning(f"...reading of {file.name} failed.")
-            logger.warning(f"{e}")
+            # niet vasthouden terwijl het volgende bestand wordt ingelezen
+            del raw_data
+    except Exception as e:
+        logger.warning(f"...reading of {file.name} failed.")
+        logger.warning(f"{e}")
 
-        logger.info("**************************************")
-    return None
+    logger.info("**************************************")
 
 
+def _unify_dataset_schema(dataset_dir: Path) -> None:
+    """Give the files of all deliveries in a dataset the same schema.
+
+    Definitions change between deliveries: a column can be missing in older deliveries, or
+    have values in one delivery only. The files that differ from the schema that fits all
+    files are rewritten with the missing columns (empty) and the types of that schema.
+
+    Args:
+        dataset_dir (Path): dataset with a partition per delivery.
+    """
+    files = sorted(dataset_dir.glob(f"{DELIVERY_COLUMN}=*/*.parquet"))
+    schemas = [pq.read_schema(fpath).remove_metadata() for fpath in files]
+    try:
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise Exception(f"The deliveries in {dataset_dir} can not be combined: {e}")
+
+    with _profile_stage("unify", name=dataset_dir.name, rows_in=len(files)):
+        for fpath, file_schema in zip(files, schemas):
+            if file_schema.equals(schema):
+                continue
+            missing_columns = [name for name in schema.names if name not in file_schema.names]
+            logger.info(f"...rewriting {fpath} with the schema of all deliveries, adding columns {missing_columns}")
+            _rewrite_parquet(fpath, schema)
+            file_catalog.invalidate(fpath.parent)
+
+
+def _rewrite_parquet(fpath: Path, schema: pa.Schema) -> None:
+    """Rewrite a parquet-file with schema, one row group at a time; missing columns are added empty."""
+    temp_fpath = fpath.with_suffix('.rewrite')
+    parquet_file = pq.ParquetFile(fpath)
+    with pq.ParquetWriter(temp_fpath, schema) as writer:
+        for row_group in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(row_group)
+            columns = [
+                table.column(field.name) if field.name in table.column_names else pa.nulls(len(table), field.type)
+                for field in schema
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, names=schema.names).cast(schema))
+    os.replace(temp_fpath, fpath)
+
+
+def _check_row_count(fpath: Path, rows: int, expected_rows: int) -> None:
+    """Warn when parsing gave another number of rows than the records counted by `_validate_asc`."""
+    if rows != expected_rows:
+        logger.warning(f"...{fpath.name} has {expected_rows} records, but {rows} rows were read.")
+
+
+def _record_length(definition_file: Path) -> int:
+    """Number of characters of a row in the asc-file of a definition, including the line end."""
+    return _definition_width(definition_file) + 1
+
+
+def _safe_convert(func: Callable, skipped_rows: list) -> Callable:
+    """Wrap a column-converter: values it can not convert become NA and are added to skipped_rows."""
+
+    def wrapper(value):
+        try:
+            return func(value)
+        except ValueError:
+            skipped_rows.append(value)
+            return pd.NA
+
+    return wrapper
+
+
+def _read_fwf_options(definition_file: Path, use_column_converters: bool, skipped_rows: list) -> dict:
+    """Options for pd.read_fwf based on a definition-file.
+
+    Args:
+        definition_file (Path): Path to definition-file.
+        use_column_converters (bool): whether to use column_converters defined in the definition-file or not.
+        skipped_rows (list): list values that can not be converted are added to.
+
+    Returns:
+        dict: widths, names, encoding and converters or dtype.
+    """
+    definition = _create_definition_with_converter(definition_file)
+
+    options: dict = {
+        "widths": definition["NumberOfPositions"].tolist(),
+        "names": definition["Label"].tolist(),
+        "encoding": "latin1",
+    }
+    if use_column_converters:
+        converters = pd.Series(definition.ConvertFunction.values, index=definition.Label).to_dict()
+        options["converters"] = {col: _safe_convert(conv, skipped_rows) for col, conv in converters.items()}
+    else:
+        options["dtype"] = 'str'
+    return options
+
+
+def _remove_garbage_column(data: pd.DataFrame, fpath: Path) -> pd.DataFrame:
+    """Check that the garbage-column (characters after the last field) is empty and remove it.
+
+    Args:
+        data (pd.DataFrame): data read from asc-file.
+        fpath (Path): Path to asc-file.
+
+    Raises:
+        AssertionError: the garbage-column is not empty, the definition does not match the file.
+
+    Returns:
+        pd.DataFrame: data without garbage-column.
+    """
+    if 'GarbageColumn' not in data.columns:
+        return data
+
+    number_of_not_null_values_in_garbage_columns = data.GarbageColumn.notnull().sum()
+    if number_of_not_null_values_in_garbage_columns > 0:
+        logger.critical(f'!!!! The garbage-column for {fpath.name} is not empty, check your definitions !!!')
+        logger.critical('!!!! Below are some examples of the rows with non-empty GarbageColumns !!!')
+        logger.critical(' ')
+        examples_non_empty_garbage_columns = data[data.GarbageColumn.notnull()].head(10)
+        logger.critical(f'{examples_non_empty_garbage_columns}')
+        logger.critical(f"{examples_non_empty_garbage_columns.GarbageColumn}")
+        logger.critical('❌' * 80)
+        logger.critical(
+            f'!!!! ❌ ❌ ❌ The garbage-column for {fpath.name} is not empty, check your definitions ❌ ❌ ❌!!!'
+        )
+        logger.critical('❌' * 80)
+        raise AssertionError(f'!!!! The garbage-column for {fpath.name} is not empty, check your definitions !!!')
+
+    logger.debug("No garbage detected.")
+    logger.debug(f'The garbage-column for {fpath.name} is empty, removing GarbageColumn from dataframe.')
+    del data['GarbageColumn']
+    return data
+
+
+def _log_skipped_rows(skipped_rows: list, fpath: Path) -> None:
+    if skipped_rows:
+        logger.warning(f"Skipped {len(skipped_rows)} rows due to conversion errors in {fpath.name}")
+        logger.warning(f"First few skipped values: {skipped_rows[:5]}")
+
 
 def read_asc(fpath: Path, definition_file: Path, use_column_converters: bool = False) -> pd.DataFrame:
     """Reads in asc-file based on definition-file.
@@ -195,90 +599,128 @@ def read_asc(fpath: Path, definition_file: Path, use_column_converters: bool = F
     set a '0-value' as a missing (NaN).
 
     Args:
-        fpath (Path): Path to asc-file.
+        fpath (Path): Path to asc-file, or to an asc-file in a compressed file (see `eencijfer.utils.compression`).
         definition_file (Path): Path to definition-file.
         use_column_converters (bool): whether to use column_converters defined in the definition-file or not.
 
+    Raises:
+        Exception: the record length of the file differs from the definition, see `_check_record_length`.
+
     Returns:
         pd.DataFrame: df with data from asc-file.
     """
-
-    definition = _create_definition_with_converter(definition_file)
-
-    widths = definition["NumberOfPositions"].tolist()
-    names = definition["Label"].tolist()
-    column_converters = pd.Series(definition.ConvertFunction.values, index=definition.Label).to_dict()
+    _check_record_length(fpath, definition_file)
+    skipped_rows: list = []
+    options = _read_fwf_options(definition_file, use_column_converters, skipped_rows)
     logger.info(f"...start reading {fpath.name}")
 
-    skipped_rows = []
-    
-    def safe_convert(func):
-        def wrapper(value):
-            try:
-                return func(value)
-            except ValueError:
-                skipped_rows.append(value)
-                return pd.NA
-        return wrapper
-
-    if use_column_converters:
-        safe_converters = {col: safe_convert(conv) for col, conv in column_converters.items()}
-    else:
-        safe_converters = None
-
     try:
         if use_column_converters:
             logger.info(f"...using column converters for {fpath.name}")
-            data = pd.read_fwf(
-                fpath,
-                widths=widths,
-                names=names,
-                converters=safe_converters,
-                encoding="latin1",
-            )
         else:
             logger.info(f"...import all columns as strings from {fpath.name}")
-            data = pd.read_fwf(
-                fpath,
-                widths=widths,
-                names=names,
-                dtype='str',
-                encoding="latin1",
-            )
+        # bestanden in een gecomprimeerd bestand worden tijdens het inlezen uitgepakt
+        with _open_binary(fpath) as file:
+            data = pd.read_fwf(file, **options)
 
         if len(data) == 0:
             logger.info(f"...no data found in {fpath.name}")
         else:
             logger.info(f"...data was read from {fpath.name}")
-            
-            if 'GarbageColumn' in data.columns:
-                number_of_not_null_values_in_garbage_columns = data.GarbageColumn.notnull().sum()
-                if number_of_not_null_values_in_garbage_columns > 0:
-                    logger.critical(f'!!!! The garbage-column for {fpath.name} is not empty, check your definitions !!!')
-                    logger.critical('!!!! Below are some examples of the rows with non-empty GarbageColumns !!!')
-                    logger.critical(' ')
-                    examples_non_empty_garbage_columns = data[data.GarbageColumn.notnull()].head(10)
-                    logger.critical(f'{examples_non_empty_garbage_columns}')
-                    logger.critical(f"{examples_non_empty_garbage_columns.GarbageColumn}")
-                    logger.critical('❌' * 80)
-                    logger.critical(
-                        f'!!!! ❌ ❌ ❌ The garbage-column for {fpath.name} is not empty, check your definitions ❌ ❌ ❌!!!'
-                    )
-                    logger.critical('❌' * 80)
-                    raise AssertionError(
-                        f'!!!! The garbage-column for {fpath.name} is not empty, check your definitions !!!'
-                    )
-                else:
-                    logger.debug("No garbage detected.")
-                    logger.debug(f'The garbage-column for {fpath.name} is empty, removing GarbageColumn from dataframe.')
-                    del data['GarbageColumn']
-
-        if skipped_rows:
-            logger.warning(f"Skipped {len(skipped_rows)} rows due to conversion errors in {fpath.name}")
-            logger.warning(f"First few skipped values: {skipped_rows[:5]}")
+            data = _remove_garbage_column(data, fpath)
+
+        _log_skipped_rows(skipped_rows, fpath)
 
     except Exception as e:
         logger.warning(f"...reading of {fpath.name} failed.")
         logger.warning(f"{e}")
 
     return data
+
+
+def _read_asc_chunks(
+    fpath: Path, definition_file: Path, chunk_rows: int, use_column_converters: bool = False
+) -> Iterator[pd.DataFrame]:
+    """Read an asc-file in chunks, see `read_asc`.
+
+    Args:
+        fpath (Path): Path to asc-file.
+        definition_file (Path): Path to definition-file.
+        chunk_rows (int): number of rows per chunk.
+        use_column_converters (bool, optional): whether to use column_converters. Defaults to False.
+
+    Yields:
+        Iterator[pd.DataFrame]: chunks of at most chunk_rows rows.
+    """
+    _check_record_length(fpath, definition_file)
+    skipped_rows: list = []
+    options = _read_fwf_options(definition_file, use_column_converters, skipped_rows)
+
+    with _open_binary(fpath) as file, pd.read_fwf(file, chunksize=chunk_rows, **options) as reader:
+        for data in reader:
+            yield _remove_garbage_column(data, fpath)
+
+    _log_skipped_rows(skipped_rows, fpath)
+
+
+def _convert_asc_in_chunks(
+    fpath: Path, definition_file: Path, target_fpath: Path, chunk_rows: int, use_column_converters: bool = False
+) -> int:
+    """Convert an asc-file to parquet without reading the whole file in memory.
+
+    Every chunk is written to a separate parquet-file first. The type of a column can differ
+    between chunks (a chunk with only empty values, or with missing values in a column of
+    integers), so the chunks are combined into target_fpath with the types the whole file
+    would have had, one row group at a time.
+
+    Args:
+        fpath (Path): Path to asc-file.
+        definition_file (Path): Path to definition-file.
+        target_fpath (Path): parquet-file to write.
+        chunk_rows (int): number of rows per chunk.
+        use_column_converters (bool, optional): whether to use column_converters. Defaults to False.
+
+    Returns:
+        int: number of rows; no file is written when there are none.
+    """
+    parts_dir = target_fpath.with_suffix('.parts')
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    parts = []
+    try:
+        with _profile_stage("parse+convert" if use_column_converters else "parse", name=fpath.name) as stage:
+            chunks = _read_asc_chunks(fpath, definition_file, chunk_rows, use_column_converters=use_column_converters)
+            for number, chunk in enumerate(chunks):
+                part = parts_dir / f"{number:06d}.parquet"
+                pq.write_table(pa.Table.from_pandas(chunk, preserve_index=False), part)
+                parts.append(part)
+                rows += len(chunk)
+                del chunk
+            stage["rows_out"] = rows
+
+        if rows > 0:
+            with _profile_stage("write", name=target_fpath.name, rows_in=rows):
+                _combine_parquet_parts(parts, target_fpath)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        file_catalog.invalidate(target_fpath.parent)
+
+    return rows
+
+
+def _combine_parquet_parts(parts: List[Path], target_fpath: Path) -> None:
+    """Combine parquet-files with the same columns into one file, with types that fit all parts.
+
+    Args:
+        parts (List[Path]): parquet-files, in order.
+        target_fpath (Path): parquet-file to write.
+    """
+    # null (chunk zonder waarden) en int64 (chunk zonder missende waarden) gaan op in het type van de andere chunks
+    schema = pa.unify_schemas([pq.read_schema(part) for part in parts], promote_options="permissive")
+    schema = schema.remove_metadata()
+
+    with pq.ParquetWriter(target_fpath, schema) as writer:
+        for part in parts:
+            part_file = pq.ParquetFile(part)
+            for row_group in range(part_file.num_row_groups):
+                writer.write_table(part_file.read_row_group(row_group).cast(schema))
@@ -2,13 +2,15 @@
 
 import logging
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 
-from eencijfer.io.files import ExportFormat, _save_to_file
+from eencijfer.io.files import ExportFormat, _dataset_files, _read_parquet, _save_to_file
 from eencijfer.utils.detect_eencijfer_files import _get_eencijfer_datafile, _get_eindexamen_datafile
 from eencijfer.utils.local_data import _add_local_id
+from eencijfer.utils.profile import _profile_stage
 
 logger = logging.getLogger(__name__)
 
@@ -137,45 +139,59 @@ def _replace_all_pgn_with_pseudo_id_remove_pii_local_id(
     if eencijfer_fname is None and vakken_fname is None:
         raise Exception("No eencijfer-file or eindexamens found. So no PII to remove or local_id to add.")
 
-    if eencijfer_fname is not None:
-        eencijfer_fpath = Path(eencijfer_dir / eencijfer_fname).with_suffix('.parquet')
-        eencijfer = pd.read_parquet(eencijfer_fpath)
+    if remove_pii and add_local_id:
+        logger.warning('Not removing local_id! Data still contains PII.')
 
-        if add_local_id:
-            logger.info('Adding local_id to eencijfer and vakken.')
-            eencijfer = _add_local_id(eencijfer)
+    fpaths = [
+        (Path(eencijfer_dir / fname).with_suffix('.parquet'), description)
+        for fname, description in [(eencijfer_fname, 'eencijfer'), (vakken_fname, 'eindexamenvakken')]
+        if fname is not None
+    ]
 
-    if vakken_fname is not None:
-        vakken_fpath = Path(eencijfer_dir / vakken_fname).with_suffix('.parquet')
-        vakken = pd.read_parquet(vakken_fpath)
+    koppeltabel = None
+    if remove_pii:
+        # één tabel voor alle leveringen, zodat een student in elke levering dezelfde pseudo-id krijgt
+        logger.info('Creating table with pseudo-ids...')
+        with _profile_stage("pii", name="pseudo-id table") as stage:
+            koppeltabel = _create_pgn_pseudo_id_table(_read_parquet(fpaths[0][0], columns=["PersoonsgebondenNummer"]))
+            stage["rows_out"] = len(koppeltabel)
 
-        if add_local_id:
-            logger.info('Adding local_id to eindexamenvakken.')
-            vakken = _add_local_id(vakken)
+    # de bestanden (en de leveringen van een dataset) worden na elkaar verwerkt, zodat er maar
+    # één tegelijk in het geheugen staat
+    for dataset_fpath, description in fpaths:
+        for fpath in _dataset_files(dataset_fpath) if dataset_fpath.is_dir() else [dataset_fpath]:
+            _replace_pgn_remove_pii_local_id(fpath, description, koppeltabel, add_local_id=add_local_id)
 
-    if remove_pii:
-        if add_local_id:
-            logger.warning('Not removing local_id! Data still contains PII.')
+    return None
 
-        logger.info('Creating table with pseudo-ids...')
-        if eencijfer_fname:
-            koppeltabel = _create_pgn_pseudo_id_table(eencijfer)
-        else:
-            koppeltabel = _create_pgn_pseudo_id_table(vakken)
 
-        if eencijfer_fname:
-            logger.info(f'...removing pgn from {eencijfer_fpath}')
-            eencijfer = _replace_pgn_with_pseudo_id(eencijfer, koppeltabel)
-            eencijfer = _empty_id_fields(eencijfer)
+def _replace_pgn_remove_pii_local_id(
+    fpath: Path, description: str, koppeltabel: Optional[pd.DataFrame], add_local_id: bool = False
+) -> None:
+    """Replace pgn's with pseudo-id's (when koppeltabel is given), remove PII and add local-id's in a file.
 
-            logger.info(f"Overwriting {eencijfer_fname} to {eencijfer_dir}")
-            _save_to_file(eencijfer, fname=eencijfer_fname, dir=eencijfer_dir, export_format=ExportFormat.parquet)
+    Args:
+        fpath (Path): parquet-file, overwritten.
+        description (str): kind of file, for logging.
+        koppeltabel (Optional[pd.DataFrame]): table with pseudo-id per pgn; None to keep the PII.
+        add_local_id (bool, optional): Add local id. Defaults to False.
+    """
+    with _profile_stage("read", name=fpath.name) as stage:
+        data = pd.read_parquet(fpath)
+        stage["rows_out"] = len(data)
 
-        if vakken_fname:
-            logger.info(f'...removing pgn from {vakken_fpath}')
-            vakken = _replace_pgn_with_pseudo_id(vakken, koppeltabel)
-            vakken = _empty_id_fields(vakken)
+    if add_local_id:
+        logger.info(f'Adding local_id to {description}.')
+        data = _add_local_id(data)
 
-            _save_to_file(vakken, fname=vakken_fname, dir=eencijfer_dir, export_format=ExportFormat.parquet)
+    if koppeltabel is not None:
+        logger.info(f'...removing pgn from {fpath}')
+        with _profile_stage("pii", name=fpath.name, rows_in=len(data)) as stage:
+            data = _replace_pgn_with_pseudo_id(data, koppeltabel)
+            data = _empty_id_fields(data)
+            stage["rows_out"] = len(data)
 
-    return None
+        logger.info(f"Overwriting {fpath.name} to {fpath.parent}")
+        _save_to_file(data, fname=fpath.stem, dir=fpath.parent, export_format=ExportFormat.parquet)
+
+    del data
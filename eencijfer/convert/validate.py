@@ -0,0 +1,222 @@
+"""Validate the structure of fixed-width (asc) eencijfer-files before parsing them.
+
+The file is memory-mapped and scanned in blocks of whole lines with numpy: the positions
+of the line ends give the length of every record, without decoding the file. The scan
+reports records that do not have the width of the definition, the number of records per
+length and bytes that point to an encoding problem (control characters, or UTF-8 where
+latin1 is expected, which also makes the record longer in bytes), with line numbers.
+
+The number of records is exact: blank and whitespace-only lines are not counted, like
+`pd.read_fwf` skips them.
+
+A file in a compressed file (see `eencijfer.utils.compression`) can not be memory-mapped;
+it is decompressed and scanned in blocks of whole lines while it is read.
+"""
+
+import logging
+import mmap
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from eencijfer.utils.compression import _in_archive, _open_binary
+
+logger = logging.getLogger(__name__)
+
+# blokken van hele regels, zodat de tijdelijke arrays klein blijven bij grote bestanden
+BLOCK_BYTES = 16 * 1024 * 1024
+# aantal regelnummers dat per soort probleem wordt bewaard
+MAX_EXAMPLES = 10
+
+NEWLINE = 10
+CARRIAGE_RETURN = 13
+SPACE = 32
+
+
+class AscValidation(NamedTuple):
+    """Result of scanning an asc-file, see `_validate_asc`."""
+
+    fpath: Path
+    width: Optional[int]
+    rows: int
+    blank_lines: int
+    record_lengths: Dict[int, int]
+    malformed: int
+    malformed_lines: List[int]
+    encoding_problems: int
+    encoding_lines: List[int]
+
+    @property
+    def valid(self) -> bool:
+        """Whether the file has no malformed records and no encoding problems."""
+        return self.malformed == 0 and self.encoding_problems == 0
+
+
+def _block_ends(mm: mmap.mmap, size: int) -> List[int]:
+    """End positions of blocks of about BLOCK_BYTES, each ending after a line end (or at the end of the file)."""
+    ends = []
+    start = 0
+    while start < size:
+        end = min(start + BLOCK_BYTES, size)
+        if end < size:
+            last_newline = mm.rfind(b'\n', start, end)
+            if last_newline == -1:
+                # regel langer dan een blok
+                last_newline = mm.find(b'\n', end)
+            end = size if last_newline == -1 else last_newline + 1
+        ends.append(end)
+        start = end
+    return ends
+
+
+def _blocks(fpath: Path) -> Iterator[np.ndarray]:
+    """Blocks of whole lines of a file, as views on the memory-mapped file or decompressed while reading.
+
+    Delete the block before asking for the next one: a memory-mapped file can not be closed
+    while there are views on it.
+    """
+    if _in_archive(fpath):
+        with _open_binary(fpath) as file:
+            rest = b''
+            while True:
+                chunk = file.read(BLOCK_BYTES)
+                if not chunk:
+                    break
+                block = rest + chunk
+                last_newline = block.rfind(b'\n')
+                if last_newline == -1:
+                    # regel langer dan een blok
+                    rest = block
+                    continue
+                rest = block[last_newline + 1 :]
+                yield np.frombuffer(block, dtype=np.uint8, count=last_newline + 1)
+            if rest:
+                yield np.frombuffer(rest, dtype=np.uint8)
+        return
+
+    size = fpath.stat().st_size
+    if size == 0:
+        return
+    with open(fpath, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = np.frombuffer(mm, dtype=np.uint8)
+        start = 0
+        for end in _block_ends(mm, size):
+            yield data[start:end]
+            start = end
+        # de views op de mmap moeten weg voordat die gesloten wordt
+        del data
+
+
+def _encoding_problems(block: np.ndarray) -> np.ndarray:
+    """Sorted positions in block of control characters, lone carriage returns and UTF-8 sequences."""
+    # alleen de (weinige) posities van bytes onder de spatie en vanaf 0xC2 worden verder bekeken
+    low = np.flatnonzero(block < SPACE)
+    values = block[low]
+    # een carriage return hoort alleen direct voor een line feed
+    before_newline = block[np.minimum(low + 1, len(block) - 1)] == NEWLINE
+    control = low[(values != NEWLINE) & ~((values == CARRIAGE_RETURN) & before_newline & (low + 1 < len(block)))]
+
+    # een UTF-8 lead-byte gevolgd door een continuation-byte; in latin1-tekst is dat zeldzaam (bv. Ã©)
+    high = np.flatnonzero(block[:-1] >= 0xC2)
+    following = block[high + 1]
+    utf8 = high[(block[high] <= 0xF4) & (following >= 0x80) & (following <= 0xBF)]
+
+    return np.union1d(control, utf8)
+
+
+def _validate_asc(fpath: Path, width: Optional[int] = None) -> AscValidation:
+    """Scan an asc-file for records of the wrong length and encoding problems.
+
+    Args:
+        fpath (Path): Path to asc-file.
+        width (Optional[int], optional): number of characters of a record according to the definition,
+            without the line end. Defaults to None: no records are marked as malformed.
+
+    Returns:
+        AscValidation: number of records, record lengths and problems with line numbers (1-based,
+            at most MAX_EXAMPLES per kind of problem).
+    """
+    rows = blank_lines = malformed = encoding_problems = 0
+    record_lengths: Counter = Counter()
+    malformed_lines: List[int] = []
+    encoding_lines: List[int] = []
+
+    lines_before = 0
+    for block in _blocks(fpath):
+        line_ends = np.flatnonzero(block == NEWLINE)
+        if block[-1] != NEWLINE:
+            # laatste regel zonder line feed
+            line_ends = np.append(line_ends, len(block))
+        line_starts = np.concatenate([[0], line_ends[:-1] + 1])
+        has_cr = (line_ends > line_starts) & (block[np.maximum(line_ends - 1, 0)] == CARRIAGE_RETURN)
+        lengths = line_ends - line_starts - has_cr
+
+        # regels met alleen spaties slaat read_fwf over; alleen regels die met een spatie
+        # beginnen moeten helemaal worden bekeken
+        has_data = (lengths > 0) & (block[np.minimum(line_starts, len(block) - 1)] != SPACE)
+        starts_with_space = np.flatnonzero((lengths > 0) & ~has_data)
+        if len(starts_with_space) > 0:
+            not_space = (block != SPACE) & (block != NEWLINE) & (block != CARRIAGE_RETURN)
+            has_data[starts_with_space] = np.logical_or.reduceat(not_space, line_starts)[starts_with_space]
+
+        rows += int(has_data.sum())
+        blank_lines += int((~has_data).sum())
+        values, counts = np.unique(lengths[has_data], return_counts=True)
+        record_lengths.update(dict(zip(values.tolist(), counts.tolist())))
+
+        if width is not None:
+            wrong = np.flatnonzero(has_data & (lengths != width))
+            malformed += len(wrong)
+            malformed_lines.extend((lines_before + wrong[: MAX_EXAMPLES - len(malformed_lines)] + 1).tolist())
+
+        problems = _encoding_problems(block)
+        if len(problems) > 0:
+            lines = np.unique(np.searchsorted(line_ends, problems))
+            encoding_problems += len(lines)
+            encoding_lines.extend((lines_before + lines[: MAX_EXAMPLES - len(encoding_lines)] + 1).tolist())
+
+        lines_before += len(line_ends)
+        # de view op de mmap moet weg voordat het volgende blok wordt gevraagd
+        del block
+
+    return AscValidation(
+        fpath=fpath,
+        width=width,
+        rows=rows,
+        blank_lines=blank_lines,
+        record_lengths=dict(sorted(record_lengths.items())),
+        malformed=malformed,
+        malformed_lines=malformed_lines,
+        encoding_problems=encoding_problems,
+        encoding_lines=encoding_lines,
+    )
+
+
+def _format_validation(validation: AscValidation) -> str:
+    """Describe the result of `_validate_asc` in a few lines."""
+    lengths = ", ".join(f"{length}: {count}" for length, count in validation.record_lengths.items())
+    lines = [
+        f"{validation.fpath.name}: {validation.rows} records (expected width {validation.width}), "
+        f"{validation.blank_lines} blank lines, records per length: {lengths or '-'}"
+    ]
+    if validation.malformed:
+        lines.append(
+            f"...{validation.malformed} records do not have {validation.width} characters, "
+            f"e.g. lines {validation.malformed_lines}"
+        )
+    if validation.encoding_problems:
+        lines.append(
+            f"...{validation.encoding_problems} lines have control characters or UTF-8 (latin1 is expected), "
+            f"e.g. lines {validation.encoding_lines}"
+        )
+    return "\n".join(lines)
+
+
+def _log_validation(validation: AscValidation) -> None:
+    if validation.valid:
+        logger.info(f"...validated {validation.fpath.name}: {validation.rows} records of {validation.width} characters")
+    else:
+        for line in _format_validation(validation).split("\n"):
+            logger.warning(line)
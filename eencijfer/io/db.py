@@ -5,15 +5,28 @@ from pathlib import Path
 
 import duckdb
 
+from eencijfer.utils.catalog import file_catalog
 from eencijfer.utils.detect_eencijfer_files import (
     _get_eencijfer_datafile,
     _get_eindexamen_datafile,
     _get_list_of_eencijfer_files_in_dir,
 )
+from eencijfer.utils.memory import memory_budget
+from eencijfer.utils.profile import _profile_stage
 
 logger = logging.getLogger(__name__)
 
 
+def _limit_memory(con: duckdb.DuckDBPyConnection) -> None:
+    """Limit memory and threads of DuckDB to its share of the memory budget; above it DuckDB spills to disk."""
+    memory_limit = memory_budget.duckdb_memory_limit()
+    if memory_limit is not None:
+        threads = memory_budget.duckdb_threads()
+        logger.debug(f"Setting memory_limit of DuckDB to {memory_limit} with {threads} threads.")
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+        con.execute(f"SET threads = {threads}")
+
+
 def _create_duckdb(source_dir: Path, result_dir: Path, db_name: str) -> None:
     """Create a duckdb-db and load parquet-files.
 
@@ -50,30 +63,39 @@ def _create_duckdb(source_dir: Path, result_dir: Path, db_name: str) -> None:
     if eindexamen_fname is not None:
         _create_view(duckdb_path=duckdb_path, source_table=eindexamen_fname, view_name='eindexamen')
 
+    file_catalog.invalidate(result_dir)
     return None
 
 
 def _import_parquet_to_duckdb(eencijfer_files: list, duckdb_path: Path) -> None:
     """Imports parquet-files into duckdb.
 
+    A dataset with a partition per delivery becomes one table, with the delivery
+    year in the column `Leveringsjaar`.
+
     Returns:
         None: _description_
     """
 
     with duckdb.connect(duckdb_path.as_posix()) as con:
+        _limit_memory(con)
         logger.debug(f'Writing to {duckdb_path}')
         for file in eencijfer_files:
             table = (file.stem).replace('-', '_')
             logger.debug(f"...writing {file} to table {table}")
+            source = f"read_parquet('{file}')"
+            if file.is_dir():
+                source = f"read_parquet('{(file / '*' / '*.parquet').as_posix()}', hive_partitioning = true)"
             query = f"""
                 CREATE TABLE
                     {table}
                 AS
                     SELECT *
                     FROM
-                    read_parquet('{file}')"""
+                    {source}"""
 
-            con.execute(query)
+            with _profile_stage("write", name=f"{duckdb_path.name}:{table}"):
+                con.execute(query)
     return None
 
 
@@ -1,44 +1,147 @@
 """Tools to save to files."""
 
 import logging
-from enum import Enum
+import shutil
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
-from eencijfer.settings import config
-from eencijfer.utils.detect_eencijfer_files import _get_list_of_eencijfer_files_in_dir
+from eencijfer.io.formats import ExportFormat, NamingStyle  # noqa: F401
+from eencijfer.utils.catalog import file_catalog
+from eencijfer.utils.detect_eencijfer_files import DELIVERY_COLUMN, _get_list_of_eencijfer_files_in_dir
+from eencijfer.utils.memory import _dataframe_size, memory_budget
+from eencijfer.utils.profile import _profile_stage
 
 logger = logging.getLogger(__name__)
 
-result_dir = config.getpath('default', 'result_dir')
+# geheugen per veld bij exporteren in chunks: ongeveer 10 bytes in pandas, plus de kopie
+# die bij het wegschrijven (arrow of tekst) wordt gemaakt
+BYTES_PER_FIELD = 32
 
 
-class NamingStyle(str, Enum):
-    """Naming schema that is used in files and columns.
+def _filter_matches_schema(schema: pa.Schema, column: str, value) -> bool:
+    """Check whether a filter on column with value can be pushed down to parquet.
 
     Args:
-        str (_type_): _description_
-        Enum (_type_): _description_
+        schema (pa.Schema): schema of the parquet-file.
+        column (str): column to filter on.
+        value (Any): value (or list of values) to compare with.
+
+    Returns:
+        bool: True if column exists and its type matches the type of value.
     """
+    if column not in schema.names:
+        return False
+
+    field_type = schema.field(column).type
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+        return all(isinstance(v, str) for v in values)
+    if pa.types.is_integer(field_type):
+        return all(isinstance(v, int) and not isinstance(v, bool) for v in values)
+    if pa.types.is_floating(field_type):
+        return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+    return False
+
+
+def _open_dataset(fpath: Path) -> ds.Dataset:
+    """Open a parquet-file, or a dataset with a partition per delivery (`Leveringsjaar=<year>`)."""
+    return ds.dataset(fpath, format="parquet", partitioning="hive")
+
 
-    Original = "Original"
-    KebabCase = "kebab-case"
-    SnakeCase = "snake_case"
+def _parquet_schema(fpath: Path) -> pa.Schema:
+    """Schema of a parquet-file or of a dataset, including the partition column."""
+    if Path(fpath).is_dir():
+        return _open_dataset(fpath).schema
+    return pq.read_schema(fpath)
 
 
-class ExportFormat(str, Enum):
-    """File format that will be used to convert to.
+def _dataset_files(dataset_dir: Path) -> List[Path]:
+    """Parquet-files in the partitions of a dataset, oldest delivery first."""
+    files = []
+    for partition in sorted(file_catalog.directories(dataset_dir)):
+        files += sorted(entry.path for entry in file_catalog.entries(partition) if entry.suffix == '.parquet')
+    return files
+
+
+def _latest_delivery(fpath: Path) -> Path:
+    """Partition of the latest delivery when fpath is a dataset, else fpath itself.
+
+    Assets describe the situation of one delivery: every delivery contains the history of
+    the students, so combining deliveries would count the same enrolments several times.
+    """
+    if not Path(fpath).is_dir():
+        return fpath
+    partitions = [d for d in file_catalog.directories(fpath) if d.name.startswith(f"{DELIVERY_COLUMN}=")]
+    if not partitions:
+        raise Exception(f"No deliveries found in {fpath}.")
+    latest = max(partitions, key=lambda d: int(d.name.split("=", 1)[1]))
+    logger.debug(f"...using the latest delivery of {fpath.name}: {latest.name}")
+    files = [entry.path for entry in file_catalog.entries(latest) if entry.suffix == '.parquet']
+    return files[0] if len(files) == 1 else latest
+
+
+def _read_parquet(
+    fpath: Path,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Tuple]] = None,
+) -> pd.DataFrame:
+    """Read a parquet-file, reading only the columns and rows that are needed.
+
+    Columns that are not in the file are ignored. Filters (column, operator, value)
+    are only pushed down when the type of value matches the type of the column, so
+    they never remove rows a filter in pandas with the same value would keep; apply
+    the filter on the result as well.
 
     Args:
-        str (_type_): _description_
-        Enum (_type_): _description_
+        fpath (Path): path to parquet-file.
+        columns (Optional[List[str]], optional): columns to read. Defaults to None (all columns).
+        filters (Optional[List[Tuple]], optional): row filters, e.g. [('IndicatieActiefOpPeildatum', '==', 1)].
+            Defaults to None.
+
+    Returns:
+        pd.DataFrame: data.
     """
+    if columns is None and not filters:
+        return pd.read_parquet(fpath)
+
+    schema = _parquet_schema(fpath)
+
+    if columns is not None:
+        missing_columns = [col for col in columns if col not in schema.names]
+        if missing_columns:
+            logger.debug(f"...columns not in {fpath.name}: {missing_columns}")
+        columns = [col for col in schema.names if col in columns]
 
-    csv = "csv"
-    parquet = "parquet"
-    xlsx = "xlsx"
-    duckdb = "duckdb"
+    pushdown_filters = None
+    if filters:
+        pushdown_filters = [f for f in filters if _filter_matches_schema(schema, f[0], f[2])]
+        skipped_filters = [f for f in filters if f not in pushdown_filters]
+        if skipped_filters:
+            logger.debug(f"...filters not pushed down for {fpath.name}: {skipped_filters}")
+
+    logger.debug(f"Reading {fpath.name} with columns={columns} and filters={pushdown_filters}")
+    return pd.read_parquet(fpath, columns=columns, filters=pushdown_filters or None)
+
+
+def _write_parquet_in_chunks(df: pd.DataFrame, fpath: Path, chunk_rows: int) -> None:
+    """Write a dataframe to parquet, converting chunk_rows rows at a time instead of the whole dataframe.
+
+    Args:
+        df (pd.DataFrame): data.
+        fpath (Path): parquet-file to write.
+        chunk_rows (int): number of rows per chunk (and row group).
+    """
+    logger.debug(f"...writing {fpath.name} in chunks of {chunk_rows} rows")
+    schema = pa.Schema.from_pandas(df)
+    with pq.ParquetWriter(fpath, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start : start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema))
 
 
 def _save_to_file(
@@ -61,30 +164,106 @@ def _save_to_file(
 
     fpath = Path(dir / fname)
 
-    if export_format.value == 'csv':
-        target_fpath = Path(fpath).with_suffix('.csv')
-        logger.info(f"Saving {fname} to {target_fpath}...")
-        df.to_csv(target_fpath, sep=",", index=False)
-
-    if export_format.value == 'parquet':
-        target_fpath = Path(fpath).with_suffix('.parquet')
-        logger.info(f"Saving {fname} to {target_fpath}...")
-        df.to_parquet(target_fpath)
-
-    if export_format.value == 'xlsx':
-        target_fpath = Path(fpath).with_suffix('.xlsx')
-        logger.info(f"Saving {fname} to {target_fpath}...")
-        if len(df) > 10485706:
-            raise Exception(
-                "Saving more than 1.048.576 rows to Excel is not possible.\
+    chunk_rows = None
+    if memory_budget.enabled and export_format.value in ['csv', 'parquet'] and len(df) > 0:
+        # een chunk staat bij het schrijven twee keer in het geheugen: in pandas en omgezet
+        chunk_rows = memory_budget.chunk_rows(2 * _dataframe_size(df) / len(df))
+
+    with _profile_stage("write", name=f"{fname}.{export_format.value}", rows_in=len(df)):
+        if export_format.value == 'csv':
+            target_fpath = Path(fpath).with_suffix('.csv')
+            logger.info(f"Saving {fname} to {target_fpath}...")
+            df.to_csv(target_fpath, sep=",", index=False, chunksize=chunk_rows)
+
+        if export_format.value == 'parquet':
+            target_fpath = Path(fpath).with_suffix('.parquet')
+            logger.info(f"Saving {fname} to {target_fpath}...")
+            if chunk_rows is not None and len(df) > chunk_rows:
+                _write_parquet_in_chunks(df, target_fpath, chunk_rows)
+            else:
+                df.to_parquet(target_fpath)
+
+        if export_format.value == 'xlsx':
+            target_fpath = Path(fpath).with_suffix('.xlsx')
+            logger.info(f"Saving {fname} to {target_fpath}...")
+            if len(df) > 10485706:
+                raise Exception(
+                    "Saving more than 1.048.576 rows to Excel is not possible.\
                             Try using another export-format by using:\
                             eencijfer convert --export-format csv."
-            )
-        df.to_excel(target_fpath, index=False)
+                )
+            df.to_excel(target_fpath, index=False)
 
+    file_catalog.invalidate(fpath.parent)
     return None
 
 
+def _export_chunk_rows(fpath: Path, export_format: ExportFormat) -> Optional[int]:
+    """Rows per chunk for exporting a parquet-file within the memory budget.
+
+    Args:
+        fpath (Path): parquet-file.
+        export_format (ExportFormat): export format; only csv and parquet can be written in chunks.
+
+    Returns:
+        Optional[int]: rows per chunk, None when the file can be exported at once.
+    """
+    if not memory_budget.enabled or export_format.value not in ['csv', 'parquet']:
+        return None
+
+    dataset = _open_dataset(fpath)
+    chunk_rows = memory_budget.chunk_rows(BYTES_PER_FIELD * len(dataset.schema))
+    return chunk_rows if chunk_rows is not None and dataset.count_rows() > chunk_rows else None
+
+
+def _export_in_chunks(fpath: Path, target_fpath: Path, export_format: ExportFormat, chunk_rows: int) -> None:
+    """Export a parquet-file (or dataset) to csv or parquet, reading and writing chunk_rows rows at a time.
+
+    Args:
+        fpath (Path): parquet-file or dataset.
+        target_fpath (Path): file to write.
+        export_format (ExportFormat): csv or parquet.
+        chunk_rows (int): number of rows per chunk.
+    """
+    logger.info(f"...exporting {fpath.name} in chunks of {chunk_rows} rows")
+    dataset = _open_dataset(fpath)
+    with _profile_stage("write", name=target_fpath.name, rows_in=dataset.count_rows()):
+        if export_format.value == 'parquet':
+            with pq.ParquetWriter(target_fpath, dataset.schema) as writer:
+                for batch in dataset.to_batches(batch_size=chunk_rows):
+                    writer.write_batch(batch)
+        else:
+            for number, batch in enumerate(dataset.to_batches(batch_size=chunk_rows)):
+                batch.to_pandas().to_csv(
+                    target_fpath, sep=",", index=False, header=number == 0, mode="w" if number == 0 else "a"
+                )
+    file_catalog.invalidate(target_fpath.parent)
+
+
+def _copy_dataset(fpath: Path, result_dir: Path) -> None:
+    """Copy a dataset with a partition per delivery as it is; it is already in parquet."""
+    target_dir = result_dir / fpath.name
+    logger.info(f"Copying dataset {fpath.name} to {target_dir}...")
+    with _profile_stage("write", name=fpath.name):
+        shutil.copytree(fpath, target_dir, dirs_exist_ok=True)
+    file_catalog.invalidate(result_dir)
+
+
+def _export_file(fpath: Path, result_dir: Path, export_format: ExportFormat) -> None:
+    with _profile_stage("read", name=fpath.name) as stage:
+        raw_data = pd.read_parquet(fpath)
+        stage["rows_out"] = len(raw_data)
+
+    if len(raw_data) > 0:
+        logger.debug(f"...reading {fpath.name} succeeded.")
+        logger.debug(f"...saving to {result_dir}.")
+
+        _save_to_file(raw_data, dir=result_dir, fname=fpath.stem, export_format=export_format)
+
+    else:
+        logger.info(f"...there does not seem to be data in {fpath.name}!")
+
+
 def _convert_to_export_format(
     source_dir: Path,
     result_dir: Path,
@@ -120,16 +299,14 @@ def _convert_to_export_format(
         logger.info("")
 
         try:
-            raw_data = pd.read_parquet(file)
-
-            if len(raw_data) > 0:
-                logger.debug(f"...reading {file.name} succeeded.")
-                logger.debug(f"...saving to {target_fpath}.")
-
-                _save_to_file(raw_data, dir=result_dir, fname=file.stem, export_format=export_format)
-
+            copy_dataset = file.is_dir() and export_format.value == 'parquet'
+            chunk_rows = None if copy_dataset else _export_chunk_rows(file, export_format)
+            if copy_dataset:
+                _copy_dataset(file, result_dir)
+            elif chunk_rows is not None:
+                _export_in_chunks(file, target_fpath, export_format, chunk_rows)
             else:
-                logger.info(f"...there does not seem to be data in {file.name}!")
+                _export_file(file, result_dir, export_format)
         except Exception as e:
             logger.warning(f"...reading of {file.name} failed.")
             logger.warning(f"{e}")
@@ -0,0 +1,30 @@
+"""File formats and naming styles, without importing pandas."""
+
+from enum import Enum
+
+
+class NamingStyle(str, Enum):
+    """Naming schema that is used in files and columns.
+
+    Args:
+        str (_type_): _description_
+        Enum (_type_): _description_
+    """
+
+    Original = "Original"
+    KebabCase = "kebab-case"
+    SnakeCase = "snake_case"
+
+
+class ExportFormat(str, Enum):
+    """File format that will be used to convert to.
+
+    Args:
+        str (_type_): _description_
+        Enum (_type_): _description_
+    """
+
+    csv = "csv"
+    parquet = "parquet"
+    xlsx = "xlsx"
+    duckdb = "duckdb"
@@ -2,7 +2,9 @@
 
 import configparser
 import logging
+import threading
 from pathlib import Path
+from typing import Optional, cast
 
 from eencijfer import CONFIG_FILE, PACKAGE_PROVIDED_IMPORT_DEFINTIONS_DIR
 
@@ -13,6 +15,7 @@ default_assets_dir = Path().absolute() / "assets"
 default_result_dir = Path().absolute() / "result"
 default_import_definitions_dir = PACKAGE_PROVIDED_IMPORT_DEFINTIONS_DIR
 default_db_name = 'eencijfer.duckdb'
+default_asset_cache_max_mb = 2048
 
 
 def _get_config(
@@ -24,6 +27,7 @@ def _get_config(
     import_definitions_dir: Path = default_import_definitions_dir,
     use_column_converter: bool = False,
     remove_pii: bool = True,
+    asset_cache_max_mb: int = default_asset_cache_max_mb,
 ) -> configparser.ConfigParser:
     config = configparser.ConfigParser(converters={"path": lambda x: Path(x), "list": lambda x: x.split(',')})
 
@@ -46,6 +50,8 @@ def _get_config(
             config.set('default', 'use_column_converter', str(use_column_converter))
         if not config.has_option('default', 'remove_pii'):
             config.set('default', 'remove_pii', str(remove_pii))
+        if not config.has_option('default', 'asset_cache_max_mb'):
+            config.set('default', 'asset_cache_max_mb', str(asset_cache_max_mb))
 
     except Exception as e:
         logger.debug(f"{e}")
@@ -54,4 +60,26 @@ def _get_config(
     return config
 
 
-config = _get_config(CONFIG_FILE)
+class _LazyConfig:
+    """Config that is read from CONFIG_FILE on first use instead of on import.
+
+    Attributes and methods are those of the configparser.ConfigParser returned by `_get_config`.
+    """
+
+    def __init__(self):
+        self._config: Optional[configparser.ConfigParser] = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> configparser.ConfigParser:
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    self._config = _get_config(CONFIG_FILE)
+        return self._config
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+# gedraagt zich als de ConfigParser die het inleest, dus ook zo getypeerd voor wie config gebruikt
+config = cast(configparser.ConfigParser, _LazyConfig())
@@ -0,0 +1,184 @@
+"""Catalog of the files in a directory, scanned once.
+
+Finding eencijfer-files, definitions, decode tables and the fingerprint of the asset-cache
+all need the files in a directory. Listing a directory is slow on network-mounted source
+dirs, so every directory is scanned once (one `os.scandir`, which gives size and mtime
+with the listing) and the stages query the catalog. A directory is scanned again when
+its mtime changes (files added, removed or renamed) or when eencijfer writes to it, see
+`FileCatalog.invalidate`.
+
+The header hash and record length of a file are read from the first HEADER_BYTES of the
+file, only when they are asked for, and are kept in the catalog as well. The record length
+is sniffed from the first SNIFF_RECORDS lines, which must all have the same length.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# de header-hash en de recordlengte worden bepaald op het begin van een bestand
+HEADER_BYTES = 64 * 1024
+SNIFF_RECORDS = 10
+
+
+def _record_lengths(header: bytes) -> Tuple[int, ...]:
+    """Lengths in bytes of the first (at most SNIFF_RECORDS) complete lines of header, without line ending."""
+    # alleen volledige regels, de laatste regel van de header kan afgebroken zijn
+    lines = header.split(b'\n')[:-1][:SNIFF_RECORDS]
+    return tuple(len(line) - 1 if line.endswith(b'\r') else len(line) for line in lines)
+
+
+def _common_length(record_lengths: Tuple[int, ...]) -> Optional[int]:
+    """The length all records have, None when they differ or there are none."""
+    lengths = set(record_lengths)
+    return lengths.pop() if len(lengths) == 1 else None
+
+
+class CatalogEntry:
+    """A file in the catalog, with its size, mtime and (when read) header hash and record length."""
+
+    def __init__(self, path: Path, size: int, mtime_ns: int):
+        """Create an entry from the listing of its directory.
+
+        Args:
+            path (Path): path of the file.
+            size (int): size in bytes.
+            mtime_ns (int): modification time in nanoseconds.
+        """
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._header: Optional[Tuple[str, Tuple[int, ...]]] = None
+        # gezet bij het koppelen aan een importdefinitie: (definitiebestanden, definitie)
+        self.definition: Optional[Tuple[tuple, Optional[Path]]] = None
+        # gezet bij het lezen van een gecomprimeerd bestand: de bestanden erin
+        self.members: Optional[List[Path]] = None
+
+    def __repr__(self) -> str:
+        """Path, size and mtime of the entry."""
+        return f"CatalogEntry({self.path}, size={self.size}, mtime_ns={self.mtime_ns})"
+
+    @property
+    def name(self) -> str:
+        """Name of the file."""
+        return self.path.name
+
+    @property
+    def stem(self) -> str:
+        """Name of the file without its suffix."""
+        return self.path.stem
+
+    @property
+    def suffix(self) -> str:
+        """Suffix of the file, like `.asc`."""
+        return self.path.suffix
+
+    def _read_header(self) -> Tuple[str, Tuple[int, ...]]:
+        if self._header is None:
+            with open(self.path, 'rb') as file:
+                header = file.read(HEADER_BYTES)
+            self._header = (hashlib.sha1(header).hexdigest(), _record_lengths(header))
+        return self._header
+
+    @property
+    def header_hash(self) -> str:
+        """Hash of the first HEADER_BYTES of the file."""
+        return self._read_header()[0]
+
+    @property
+    def record_lengths(self) -> Tuple[int, ...]:
+        """Lengths in bytes of the first (at most SNIFF_RECORDS) lines, without line ending."""
+        return self._read_header()[1]
+
+    @property
+    def record_length(self) -> Optional[int]:
+        """Length in bytes of a record, None when the first lines differ in length or there is no complete line."""
+        return _common_length(self.record_lengths)
+
+
+class FileCatalog:
+    """Files per directory, each directory is scanned once while it does not change."""
+
+    def __init__(self) -> None:
+        """Create an empty catalog; directories are scanned when they are first asked for."""
+        self._dirs: Dict[Path, Tuple[int, List[CatalogEntry], List[Path]]] = {}
+        self._lock = threading.Lock()
+
+    def _scan(self, directory: Path) -> Tuple[int, List[CatalogEntry], List[Path]]:
+        directory = Path(directory).absolute()
+        mtime_ns = directory.stat().st_mtime_ns
+        with self._lock:
+            cached = self._dirs.get(directory)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached
+
+        logger.debug(f"Scanning {directory}...")
+        entries = []
+        subdirectories = []
+        with os.scandir(directory) as listing:
+            for item in listing:
+                if item.is_dir():
+                    subdirectories.append(Path(item.path))
+                elif item.is_file():
+                    stat = item.stat()
+                    entries.append(CatalogEntry(Path(item.path), stat.st_size, stat.st_mtime_ns))
+        logger.debug(f"...{len(entries)} files found in {directory}.")
+
+        scanned = (mtime_ns, entries, subdirectories)
+        with self._lock:
+            self._dirs[directory] = scanned
+        return scanned
+
+    def entries(self, directory: Path) -> List[CatalogEntry]:
+        """Files in directory (no subdirectories), in the order of the listing.
+
+        Args:
+            directory (Path): directory.
+
+        Raises:
+            FileNotFoundError: directory does not exist.
+
+        Returns:
+            List[CatalogEntry]: files in directory.
+        """
+        return self._scan(directory)[1]
+
+    def directories(self, directory: Path) -> List[Path]:
+        """Subdirectories of directory, from the same scan as `entries`.
+
+        Raises:
+            FileNotFoundError: directory does not exist.
+        """
+        return self._scan(directory)[2]
+
+    def entry(self, fpath: Path) -> Optional[CatalogEntry]:
+        """Entry of a file, None when the file is not in (the directory of) the catalog.
+
+        A file in a compressed file (see `eencijfer.utils.compression`) has no entry.
+        """
+        fpath = Path(fpath).absolute()
+        try:
+            entries = self.entries(fpath.parent)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return next((entry for entry in entries if entry.path == fpath), None)
+
+    def invalidate(self, directory: Optional[Path] = None) -> None:
+        """Scan directory (or all directories when None) again on the next query.
+
+        Writing to a file that already exists does not always change the mtime of its
+        directory, so functions that write files call this.
+        """
+        with self._lock:
+            if directory is None:
+                self._dirs.clear()
+            else:
+                self._dirs.pop(Path(directory).absolute(), None)
+
+
+file_catalog = FileCatalog()
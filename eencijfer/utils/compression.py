@@ -0,0 +1,108 @@
+"""Read eencijfer-files from compressed deliveries (.gz, .zip, .zst) without unpacking them.
+
+A file in a compressed file gets a path inside that file: `levering.zip/EV____24.asc` for a
+file in a zip-archive (every file of the archive is an eencijfer-file, also in directories of
+the archive) and `EV____24.asc.gz/EV____24.asc` for a gzip- or zstd-file. The name, stem and
+suffix of such a path are those of the decompressed file, so the file is matched to its
+definition and converted like an asc-file in the source dir. `_open_binary` decompresses the
+file while it is read, nothing is written to disk.
+
+Reading .zst-files needs the package zstandard (or Python 3.14, with `compression.zstd`).
+"""
+
+import gzip
+import logging
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple, cast
+
+from eencijfer.utils.catalog import CatalogEntry
+
+try:
+    import zstandard as zstd  # type: ignore
+except ImportError:
+    try:
+        from compression import zstd  # type: ignore  # Python 3.14
+    except ImportError:
+        zstd = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_SUFFIXES = ('.gz', '.zip', '.zst')
+
+
+def _is_compressed(fpath: Path) -> bool:
+    return Path(fpath).suffix.lower() in COMPRESSED_SUFFIXES
+
+
+def _members(entry: CatalogEntry) -> List[Path]:
+    """Paths of the files in a compressed file, kept in the catalog entry of the compressed file.
+
+    Args:
+        entry (CatalogEntry): compressed file.
+
+    Returns:
+        List[Path]: every file of a zip-archive, or the decompressed file of a .gz- or .zst-file;
+            empty when the zip-archive can not be read.
+    """
+    if entry.members is None:
+        if entry.suffix.lower() == '.zip':
+            try:
+                with zipfile.ZipFile(entry.path) as archive:
+                    entry.members = [entry.path / info.filename for info in archive.infolist() if not info.is_dir()]
+            except zipfile.BadZipFile as e:
+                logger.warning(f"...{entry.name} is not a valid zip-archive, it is skipped: {e}")
+                entry.members = []
+        else:
+            entry.members = [entry.path / entry.stem]
+    return entry.members
+
+
+def _split_archive(fpath: Path) -> Optional[Tuple[Path, str]]:
+    """Compressed file and the name of the file in it, None when fpath is not in a compressed file."""
+    fpath = Path(fpath)
+    for parent in fpath.parents:
+        if _is_compressed(parent) and parent.is_file():
+            return parent, fpath.relative_to(parent).as_posix()
+    return None
+
+
+def _in_archive(fpath: Path) -> bool:
+    return _split_archive(fpath) is not None
+
+
+@contextmanager
+def _open_binary(fpath: Path) -> Iterator[IO[bytes]]:
+    """Open an eencijfer-file for reading bytes; a file in a compressed file is decompressed while it is read.
+
+    Args:
+        fpath (Path): file, or file in a compressed file (see `_members`).
+
+    Raises:
+        Exception: a .zst-file is read, but zstandard is not installed.
+
+    Yields:
+        Iterator[IO[bytes]]: binary file object.
+    """
+    split = _split_archive(fpath)
+    if split is None:
+        with open(fpath, 'rb') as file:
+            yield file
+        return
+
+    archive, member = split
+    suffix = archive.suffix.lower()
+    logger.debug(f"...decompressing {member} from {archive.name}")
+    if suffix == '.zip':
+        with zipfile.ZipFile(archive) as zip_file, zip_file.open(member) as file:
+            yield file
+    elif suffix == '.gz':
+        with gzip.open(archive, 'rb') as gzip_file:
+            # GzipFile leest bytes zoals elk ander bestand, maar is geen IO[bytes] voor mypy
+            yield cast(IO[bytes], gzip_file)
+    else:
+        if zstd is None:
+            raise Exception(f"Reading {archive.name} needs the package zstandard: pip install zstandard")
+        with zstd.open(archive, 'rb') as file:
+            yield file
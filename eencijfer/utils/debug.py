@@ -0,0 +1,85 @@
+"""Diagnostics that are only computed in debug mode.
+
+Diagnostics like value counts or the number of rows matching a filter pass over the
+data. They are given as a function, which is only called when debug mode is on
+(`eencijfer --debug ...`), so normal runs do no extra work for them. In debug mode
+the diagnostics on data can be computed on a sample of the rows.
+"""
+
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# vaste seed, zodat een debug-run steeds dezelfde steekproef geeft
+SAMPLE_SEED = 0
+
+
+class _DebugMode:
+    """Whether diagnostics are computed, and on how many rows."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.sample_rows: Optional[int] = None
+
+    def enable(self, sample_rows: Optional[int] = None) -> None:
+        """Compute diagnostics and log them at debug-level.
+
+        Args:
+            sample_rows (Optional[int], optional): compute diagnostics on data on a random sample of
+                this many rows. Defaults to None (all rows).
+        """
+        self.enabled = True
+        self.sample_rows = sample_rows
+        logging.getLogger("eencijfer").setLevel(logging.DEBUG)
+        logger.debug(f"Debug mode enabled (sample rows: {sample_rows}).")
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.sample_rows = None
+
+
+debug_mode = _DebugMode()
+
+
+def _debug_enabled(log: logging.Logger) -> bool:
+    return debug_mode.enabled and log.isEnabledFor(logging.DEBUG)
+
+
+def _debug(log: logging.Logger, describe: Callable[[], Any]) -> None:
+    """Log a diagnostic, that is only computed in debug mode.
+
+    Args:
+        log (logging.Logger): logger of the module.
+        describe (Callable[[], Any]): returns the message.
+    """
+    if _debug_enabled(log):
+        log.debug(describe(), stacklevel=2)
+
+
+def _debug_data(
+    log: logging.Logger, name: str, data: "pd.DataFrame", describe: Callable[["pd.DataFrame"], Any]
+) -> None:
+    """Log a diagnostic on data, that is only computed in debug mode.
+
+    When debug mode has `sample_rows`, describe gets a random sample of that many rows and
+    the message says so.
+
+    Args:
+        log (logging.Logger): logger of the module.
+        name (str): name of the diagnostic.
+        data (pd.DataFrame): data.
+        describe (Callable[[pd.DataFrame], Any]): computes the diagnostic on (a sample of) data.
+    """
+    if not _debug_enabled(log):
+        return
+
+    sample = data
+    sample_rows = debug_mode.sample_rows
+    if sample_rows is not None and len(data) > sample_rows:
+        sample = data.sample(n=sample_rows, random_state=SAMPLE_SEED)
+    scope = f" (sample of {len(sample)} of {len(data)} rows)" if sample is not data else ""
+    log.debug(f"{name}{scope}: {describe(sample)}", stacklevel=2)
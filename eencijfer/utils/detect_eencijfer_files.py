@@ -1,26 +1,60 @@
-"""Detect eencijfer-files."""
+"""Detect eencijfer-files.
+
+The files are looked up in the file catalog, see `eencijfer.utils.catalog`, so a
+directory is only listed once.
+
+A source dir can hold several deliveries: several EV-files (EV____23, EV____24, ...)
+or subdirectories with a delivery each. Converted files of which there is one per
+delivery are combined into a dataset: a directory `<name>.parquet` with a partition
+`Leveringsjaar=<year>` per delivery.
+"""
 
 import logging
+import re
 from pathlib import Path
-from typing import Optional
+from typing import List, NamedTuple, Optional
 
 import typer
 
 from eencijfer.settings import config
+from eencijfer.utils.catalog import file_catalog
+from eencijfer.utils.compression import _is_compressed, _members
 
 logger = logging.getLogger(__name__)
 
+DELIVERY_COLUMN = "Leveringsjaar"
+
+
+class Delivery(NamedTuple):
+    """Eencijfer-files of one delivery."""
+
+    year: Optional[int]
+    files: List[Path]
+
+
+def _delivery_year(name: str) -> Optional[int]:
+    """Year of the delivery in the name of an EV-file (EV____24 is 2024) or of a directory (2024)."""
+    match = re.fullmatch(r"(\d{4})", name) or re.search(r"EV\w*?(\d{2})$", name)
+    if match is None:
+        return None
+    year = int(match.group(1))
+    return year if year >= 1000 else 2000 + year
+
 
-def _get_list_of_definition_files() -> list:
+def _get_list_of_definition_files(definition_dir: Optional[Path] = None) -> list:
     """Get list of definition-file paths.
 
+    Args:
+        definition_dir (Optional[Path], optional): directory with definitions.
+            Defaults to None (import_definitions_dir in config).
+
     Returns:
         list: list of paths.
     """
-    definition_dir = config.getpath('default', 'import_definitions_dir')
-    logger.debug(f"Create a list of files in {definition_dir}.")
-    definition_files = [p for p in definition_dir.iterdir() if p.suffix in [".csv"]]
-    logger.debug(f"...{len(definition_files)} files found in {definition_dir}.")
+    if definition_dir is None:
+        definition_dir = config.getpath('default', 'import_definitions_dir')
+    definition_files = [entry.path for entry in file_catalog.entries(definition_dir) if entry.suffix in [".csv"]]
+    logger.debug(f"...{len(definition_files)} definition files in {definition_dir}.")
 
     return definition_files
 
@@ -39,15 +73,8 @@ def _get_list_of_eencijfer_files_in_dir(source_dir: Path) -> Optional[list]:
     """
     files = None
 
-    possible_files = _get_list_of_definition_files()
-    possible_names = [f.stem.lower() for f in possible_files]
-
     try:
-        logger.debug("Getting list of files ending with '.asc'...")
-        files = [p for p in source_dir.iterdir() if p.stem.lower() in possible_names]
-        logger.debug("...looking for file starting with 'EV'...")
-        files = files + [p for p in source_dir.iterdir() if p.stem.startswith('EV')]
-        files = files + [p for p in source_dir.iterdir() if p.stem.startswith('VAK')]
+        files = _eencijfer_files(source_dir)
         if len(files) == 0:
             typer.echo(f"No files found that in {source_dir} that could be eencijfer-files. Aborting...")
             raise typer.Exit()
@@ -60,6 +87,103 @@ def _get_list_of_eencijfer_files_in_dir(source_dir: Path) -> Optional[list]:
     return files
 
 
+def _eencijfer_files(source_dir: Path, datasets: bool = True) -> list:
+    """Files (and datasets of converted files) in source_dir that might be eencijfer-files.
+
+    The files in compressed files (.gz, .zip, .zst) are included with their path in the
+    compressed file, see `eencijfer.utils.compression`.
+
+    Args:
+        source_dir (Path): directory.
+        datasets (bool, optional): include datasets, see `_is_dataset`. Defaults to True.
+
+    Raises:
+        FileNotFoundError: source_dir does not exist.
+    """
+    possible_names = [f.stem.lower() for f in _get_list_of_definition_files()]
+
+    paths = []
+    for entry in file_catalog.entries(source_dir):
+        paths += _members(entry) if _is_compressed(entry.path) else [entry.path]
+    # eerst de bestanden met de naam van een definitie, dan de overige EV- en VAK-bestanden
+    files = [path for path in paths if path.stem.lower() in possible_names]
+    files = files + [path for path in paths if path.stem.startswith(('EV', 'VAK')) and path not in files]
+    if datasets:
+        files = files + [d for d in file_catalog.directories(source_dir) if d.suffix == '.parquet' and _is_dataset(d)]
+    return files
+
+
+def _is_dataset(directory: Path) -> bool:
+    """Whether directory is a dataset with a partition per delivery."""
+    return any(d.name.startswith(f"{DELIVERY_COLUMN}=") for d in file_catalog.directories(directory))
+
+
+def _find_deliveries(source_dir: Path) -> List[Delivery]:
+    """Find the deliveries in source_dir and its subdirectories, oldest first.
+
+    Every EV-file (asc) is a delivery. The other eencijfer-files in its directory belong
+    to it; when a directory has several EV-files, they belong to the latest of them.
+    Files in a directory without EV-file (like shared decode tables in source_dir) belong
+    to the latest delivery. The year of a delivery is taken from the name of the EV-file
+    or else from the name of its directory.
+
+    Args:
+        source_dir (Path): directory with eencijfer-files, or with a directory per delivery.
+
+    Raises:
+        Exception: two deliveries of the same year, or a delivery without year when there are several.
+
+    Returns:
+        List[Delivery]: deliveries; one delivery (year None when unknown) when there is only one.
+    """
+    directories = [Path(source_dir)]
+    deliveries: List[Delivery] = []
+    shared: list = []
+    while directories:
+        directory = directories.pop(0)
+        # verborgen mappen (zoals .temp_dir van convert) bevatten geen leveringen
+        directories.extend(sorted(d for d in file_catalog.directories(directory) if not d.name.startswith('.')))
+
+        files = _eencijfer_files(directory, datasets=False)
+        ev_files = [f for f in files if f.stem.startswith('EV') and f.suffix.lower() == '.asc']
+        if directory != Path(source_dir) and not ev_files:
+            continue
+        if not ev_files:
+            shared.extend(files)
+            continue
+
+        ev_files = sorted(ev_files, key=lambda f: _delivery_year(f.stem) or _delivery_year(directory.name) or 0)
+        for ev_file in ev_files[:-1]:
+            deliveries.append(Delivery(_delivery_year(ev_file.stem), [ev_file]))
+        year = _delivery_year(ev_files[-1].stem) or _delivery_year(directory.name)
+        deliveries.append(Delivery(year, [f for f in files if f not in ev_files[:-1]]))
+
+    if len(deliveries) == 0:
+        return [Delivery(None, shared)] if shared else []
+
+    if len(deliveries) > 1:
+        missing = [delivery.files[0] for delivery in deliveries if delivery.year is None]
+        if missing:
+            raise Exception(f"The delivery year of {missing} is unknown, name the file EV____<yy>.")
+        years = [delivery.year for delivery in deliveries if delivery.year is not None]
+        if len(set(years)) < len(years):
+            raise Exception(f"Several deliveries of the same year found in {source_dir}: {sorted(years)}.")
+
+    deliveries = sorted(deliveries, key=lambda delivery: delivery.year or 0)
+    latest = deliveries[-1]
+    deliveries[-1] = Delivery(latest.year, latest.files + [f for f in shared if f not in latest.files])
+    logger.debug(f"Deliveries in {source_dir}: {[delivery.year for delivery in deliveries]}")
+    return deliveries
+
+
+def _datafile(source_dir: Path, marker: str) -> Optional[str]:
+    """Name of the dataset or file with marker in its name; of several files the one of the latest delivery."""
+    candidates = [d.stem for d in file_catalog.directories(source_dir) if d.suffix == '.parquet' and marker in d.stem]
+    files = [entry.stem for entry in file_catalog.entries(source_dir) if marker in entry.stem]
+    candidates += sorted(files, key=lambda stem: -(_delivery_year(stem) or 0))
+    return candidates[0] if candidates else None
+
+
 def _get_eencijfer_datafile(source_dir: Path) -> Optional[str]:
     """Get the name of the eencijfer-file in the given directory.
 
@@ -72,8 +196,10 @@ def _get_eencijfer_datafile(source_dir: Path) -> Optional[str]:
     logger.debug("Set variable eencijfer_datafile to None.")
     eencijfer_datafile = None
     try:
-        logger.debug("Get the name of the first file that starts with `EV`.")
-        eencijfer_datafile = [file.stem for file in Path(source_dir).iterdir() if "EV" in file.stem][0]
+        logger.debug("Get the name of the dataset or the latest file with `EV` in its name.")
+        eencijfer_datafile = _datafile(source_dir, "EV")
+        if eencijfer_datafile is None:
+            raise IndexError
         logger.debug(f"In {source_dir} the file {eencijfer_datafile} will be used as eencijfer.")
 
     except IndexError:
@@ -97,7 +223,9 @@ def _get_eindexamen_datafile(source_dir: Path) -> Optional[str]:
     eindexamen_datafile = None
 
     try:
-        eindexamen_datafile = [file.stem for file in Path(source_dir).iterdir() if "VAKH" in file.stem][0]
+        eindexamen_datafile = _datafile(source_dir, "VAKH")
+        if eindexamen_datafile is None:
+            raise IndexError
         logger.debug(f"In {source_dir} the file {source_dir} will be used as eindexamenfile.")
 
     except IndexError:
@@ -66,6 +66,7 @@ def _create_default_config(CONFIG_FILE: Path) -> None:
     config.set("default", "label_naming_style", "PascalCase")
     config.set("default", "table_naming_style", "original")
 
+    Path(CONFIG_FILE).parent.mkdir(parents=True, exist_ok=True)
     with open(CONFIG_FILE, "w") as configfile:  # save
         config.write(configfile)
 
@@ -0,0 +1,220 @@
+"""Measure memory usage of pipeline steps."""
+
+import logging
+import re
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+UNITS = {"": MB, "K": 1024, "KB": 1024, "M": MB, "MB": MB, "G": 1024 * MB, "GB": 1024 * MB}
+
+# deel van het geheugenbudget voor één chunk bij inlezen en wegschrijven, voor DuckDB
+# en voor de asset-cache; de rest is voor de data die in een stap in het geheugen staat
+CHUNK_SHARE = 0.2
+DUCKDB_SHARE = 0.5
+CACHE_SHARE = 0.25
+MIN_CHUNK_ROWS = 1_000
+
+# DuckDB heeft per thread buffers nodig (blokken van 256 KB per kolom), met minder geheugen
+# faalt het schrijven van brede tabellen ook als DuckDB naar schijf uitwijkt
+DUCKDB_MIN_BYTES = 256 * MB
+DUCKDB_BYTES_PER_THREAD = 256 * MB
+
+# metingen die nog lopen; tracemalloc heeft maar één piek, dus voor een reset wordt
+# de piek tot dan toe doorgegeven aan de metingen die er omheen lopen
+_open_measurements: List[dict] = []
+_measurements_lock = threading.Lock()
+
+
+def _start_memory_tracking() -> bool:
+    """Start tracing memory allocations, if that is not already done.
+
+    Returns:
+        bool: True if tracing was started here, so the caller should also stop it.
+    """
+    if tracemalloc.is_tracing():
+        return False
+    logger.debug("Start tracing memory allocations.")
+    tracemalloc.start()
+    return True
+
+
+def _stop_memory_tracking() -> None:
+    """Stop tracing memory allocations."""
+    if tracemalloc.is_tracing():
+        logger.debug("Stop tracing memory allocations.")
+        tracemalloc.stop()
+
+
+def _pass_peak_to_open_measurements() -> None:
+    _, peak = tracemalloc.get_traced_memory()
+    for measurement in _open_measurements:
+        measurement["peak"] = max(measurement["peak"], peak)
+
+
+@contextmanager
+def _measure_peak_memory() -> Iterator[dict]:
+    """Measure the peak of memory allocated during a block.
+
+    Yields a dictionary; after the block its key `peak` holds the maximum memory (in bytes)
+    allocated on top of what was allocated at the start. Measurements can be nested.
+    Measurements running at the same time in other threads share the peak, so the peak of
+    such a measurement is an upper bound. The dictionary is empty if memory allocations are
+    not traced.
+
+    Yields:
+        Iterator[dict]: measurement.
+    """
+    if not tracemalloc.is_tracing():
+        yield {}
+        return
+
+    with _measurements_lock:
+        _pass_peak_to_open_measurements()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        measurement = {"start": start, "peak": start}
+        _open_measurements.append(measurement)
+    try:
+        yield measurement
+    finally:
+        with _measurements_lock:
+            if tracemalloc.is_tracing():
+                _pass_peak_to_open_measurements()
+            _open_measurements.remove(measurement)
+            measurement["peak"] = max(measurement["peak"] - start, 0)
+
+
+@contextmanager
+def _track_peak_memory(step: str, memory_usage: dict) -> Iterator[None]:
+    """Record the peak of memory allocated during a step.
+
+    The peak is the maximum memory allocated on top of what was allocated at the
+    start of the step, so a step that copies a table shows (at least) the size
+    of that table. Nothing is recorded if memory allocations are not traced.
+
+    Args:
+        step (str): name of the step.
+        memory_usage (dict): dictionary the peak (in bytes) is stored in, with step as key.
+    """
+    measurement: dict = {}
+    try:
+        with _measure_peak_memory() as measurement:
+            yield
+    finally:
+        if measurement:
+            memory_usage[step] = measurement["peak"]
+
+
+def _dataframe_size(data: pd.DataFrame) -> int:
+    """Size of a dataframe in bytes, including the strings in object-columns.
+
+    Args:
+        data (pd.DataFrame): dataframe.
+
+    Returns:
+        int: number of bytes.
+    """
+    return int(data.memory_usage(deep=True).sum())
+
+
+def _log_memory_usage(memory_usage: dict, input_size: int) -> None:
+    """Log peak memory per step relative to the size of the input.
+
+    Args:
+        memory_usage (dict): peak memory in bytes per step.
+        input_size (int): size of the input table in bytes.
+    """
+    if not memory_usage:
+        return
+
+    logger.info(f"Peak memory per step (input: {input_size / MB:.1f} MB):")
+    for step, peak in memory_usage.items():
+        ratio = (input_size + peak) / input_size if input_size else float('nan')
+        logger.info(f" - {step:<40} {peak / MB:10.1f} MB  ({ratio:.2f}x input)")
+
+
+def _parse_memory_size(size: str) -> int:
+    """Parse a memory size like `4GB`, `512MB` or `512` (MB).
+
+    Args:
+        size (str): size with an optional unit K(B), M(B) or G(B).
+
+    Raises:
+        Exception: size can not be parsed.
+
+    Returns:
+        int: size in bytes.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]B?)?\s*", size.upper())
+    if not match:
+        raise Exception(f"Can not parse memory size {size}, use for example 4GB or 512MB.")
+    return int(float(match.group(1)) * UNITS[match.group(2) or ""])
+
+
+class _MemoryBudget:
+    """Memory budget of a run (`--max-memory`) and the limits that follow from it.
+
+    Without a budget there are no limits. With a budget, large files are parsed and
+    written in chunks, DuckDB gets a memory_limit (at least DUCKDB_MIN_BYTES) and fewer
+    threads, and steps run one at a time.
+    """
+
+    def __init__(self) -> None:
+        self.max_bytes: Optional[int] = None
+
+    def set(self, max_bytes: Optional[int]) -> None:
+        self.max_bytes = max_bytes
+        if max_bytes is not None:
+            logger.info(f"Memory budget: {max_bytes / MB:.0f} MB.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes is not None
+
+    def chunk_rows(self, bytes_per_row: float) -> Optional[int]:
+        """Number of rows to read or write at once.
+
+        Args:
+            bytes_per_row (float): estimated memory per row while reading or writing.
+
+        Returns:
+            Optional[int]: rows per chunk, None without a budget.
+        """
+        if self.max_bytes is None:
+            return None
+        return max(int(self.max_bytes * CHUNK_SHARE / max(bytes_per_row, 1)), MIN_CHUNK_ROWS)
+
+    def _duckdb_bytes(self) -> int:
+        return max(int((self.max_bytes or 0) * DUCKDB_SHARE), DUCKDB_MIN_BYTES)
+
+    def duckdb_memory_limit(self) -> Optional[str]:
+        if self.max_bytes is None:
+            return None
+        return f"{self._duckdb_bytes() // MB}MB"
+
+    def duckdb_threads(self) -> Optional[int]:
+        if self.max_bytes is None:
+            return None
+        return max(self._duckdb_bytes() // DUCKDB_BYTES_PER_THREAD, 1)
+
+    def cache_bytes(self) -> Optional[int]:
+        if self.max_bytes is None:
+            return None
+        return int(self.max_bytes * CACHE_SHARE)
+
+    def max_workers(self, max_workers: Optional[int] = None) -> Optional[int]:
+        """Number of workers: one at a time with a budget, unless max_workers is given."""
+        if max_workers is None and self.max_bytes is not None:
+            return 1
+        return max_workers
+
+
+memory_budget = _MemoryBudget()
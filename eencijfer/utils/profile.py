@@ -0,0 +1,288 @@
+"""Profile the stages of a run: time, memory and rows per stage and per file.
+
+Profiling is off by default; `_profile_stage` then only yields an empty record, so the
+stages can stay instrumented. Wall time is measured per stage. Cpu time of a stage on the
+main thread is the cpu time of the whole process during the stage (including threads of
+pyarrow and duckdb); a stage on a thread of a pool (see `_in_current_stage`) only counts
+the cpu time of its own thread, so stages running at the same time are not counted twice.
+The increase of the maximum resident set size shows which stage pushed the memory of the
+process up; with `track_memory` the peak of memory allocated by Python, numpy and pandas
+is measured with tracemalloc as well.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import typer
+
+from eencijfer import __version__
+from eencijfer.utils.memory import MB, _measure_peak_memory, _start_memory_tracking, _stop_memory_tracking
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 2
+
+
+def _max_rss() -> Optional[int]:
+    """Maximum resident set size of the process in bytes, None if it can not be measured."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS geeft bytes, Linux kilobytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class _Profiler:
+    """Collects a record for every stage while profiling is enabled."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.track_memory = False
+        self.stages: List[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_memory_tracking = False
+        self._start = 0.0
+
+    def start(self, track_memory: bool = False) -> None:
+        """Start profiling; records of an earlier run are removed."""
+        self.stages = []
+        self.track_memory = track_memory
+        self._started_memory_tracking = _start_memory_tracking() if track_memory else False
+        self._start = time.perf_counter()
+        self.enabled = True
+
+    def stop(self) -> float:
+        """Stop profiling.
+
+        Returns:
+            float: wall time in seconds since profiling started.
+        """
+        self.enabled = False
+        if self._started_memory_tracking:
+            _stop_memory_tracking()
+        return time.perf_counter() - self._start
+
+    def parent(self) -> Optional[dict]:
+        """Record of the stage that is running on this thread, None outside a stage."""
+        return getattr(self._local, "parent", None)
+
+    def depth(self) -> int:
+        parent = self.parent()
+        return parent["depth"] + 1 if parent is not None else 0
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            record["id"] = len(self.stages)
+            self.stages.append(record)
+
+
+profiler = _Profiler()
+
+
+def _in_current_stage(func: Callable) -> Callable:
+    """Wrap a function that is run on a thread of a pool, so its stages are nested in the current stage.
+
+    The stage that is running is kept per thread; without this, stages of a task on a pool
+    thread would be at the top level of the profile.
+
+    Args:
+        func (Callable): function submitted to the pool, e.g. with `executor.map`.
+
+    Returns:
+        Callable: func, running within the stage that is running on the thread that wraps it.
+    """
+    parent = profiler.parent()
+
+    def _run(*args, **kwargs):
+        previous = profiler.parent()
+        profiler._local.parent = parent
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler._local.parent = previous
+
+    return _run
+
+
+@contextmanager
+def _profile_stage(stage: str, name: Optional[str] = None, rows_in: Optional[int] = None) -> Iterator[dict]:
+    """Profile a stage of the pipeline.
+
+    Yields the record of the stage; set `rows_out` in it when the stage has a result.
+    Stages can be nested; records are kept in the order the stages started.
+
+    Args:
+        stage (str): kind of stage, e.g. parse, write or enrich.
+        name (Optional[str], optional): file or step the stage works on. Defaults to None.
+        rows_in (Optional[int], optional): number of rows the stage starts with. Defaults to None.
+
+    Yields:
+        Iterator[dict]: record of the stage.
+    """
+    record: dict = {"stage": stage, "name": name, "rows_in": rows_in, "rows_out": None}
+    if not profiler.enabled:
+        yield record
+        return
+
+    parent = profiler.parent()
+    record["depth"] = profiler.depth()
+    record["parent"] = parent["id"] if parent is not None else None
+    record["start_seconds"] = round(time.perf_counter() - profiler._start, 4)
+    profiler.add(record)
+    profiler._local.parent = record
+    # op een thread van een pool alleen de cpu-tijd van die thread, anders telt die van stappen die tegelijk lopen mee
+    on_main_thread = threading.current_thread() is threading.main_thread()
+    cpu_time = time.process_time if on_main_thread else time.thread_time
+    record["cpu_clock"] = "process" if on_main_thread else "thread"
+    max_rss_start = _max_rss()
+    cpu_start = cpu_time()
+    wall_start = time.perf_counter()
+    try:
+        with _measure_peak_memory() as measurement:
+            yield record
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+        record["cpu_seconds"] = round(cpu_time() - cpu_start, 4)
+        max_rss = _max_rss()
+        record["max_rss_mb"] = round(max_rss / MB, 1) if max_rss is not None else None
+        record["max_rss_increase_mb"] = (
+            round((max_rss - max_rss_start) / MB, 1) if max_rss is not None and max_rss_start is not None else None
+        )
+        record["peak_memory_mb"] = round(measurement["peak"] / MB, 1) if measurement else None
+        profiler._local.parent = parent
+
+
+def _profile_report(command: str, wall_seconds: float) -> dict:
+    """Report of the stages that finished since profiling started, in the order the stages started."""
+    return {
+        "profile_version": PROFILE_VERSION,
+        "eencijfer_version": __version__,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "command": command,
+        "wall_seconds": round(wall_seconds, 4),
+        "track_memory": profiler.track_memory,
+        "stages": [record for record in profiler.stages if "wall_seconds" in record],
+    }
+
+
+def _save_profile(report: dict, fpath: Path) -> None:
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    fpath.write_text(json.dumps(report, indent=2))
+    logger.info(f"Profile saved to {fpath}")
+
+
+def _wall_time_covered(intervals: List[Tuple[float, float]]) -> float:
+    """Time in which at least one of the intervals (start, end) runs."""
+    covered = 0.0
+    end = float("-inf")
+    for interval_start, interval_end in sorted(intervals):
+        if interval_end > end:
+            covered += interval_end - max(interval_start, end)
+            end = interval_end
+    return covered
+
+
+def _stage_totals(stages: List[dict]) -> dict:
+    """Totals per kind of stage, over all files, of the stages without nested stages.
+
+    Stages that contain other stages are left out, so time is not counted for both the
+    stage and the stages in it. The wall time of a kind is the time in which at least one
+    stage of that kind runs, so stages running at the same time are not counted twice and
+    a total is never more than the wall time of the run.
+
+    Args:
+        stages (List[dict]): records of the stages, see `_profile_stage`.
+
+    Returns:
+        dict: wall time, cpu time and number of stages per kind of stage.
+    """
+    parents = {record["parent"] for record in stages}
+    intervals: dict = {}
+    cpu: dict = {}
+    for record in stages:
+        if record["id"] in parents:
+            continue
+        start = record["start_seconds"]
+        intervals.setdefault(record["stage"], []).append((start, start + record["wall_seconds"]))
+        cpu[record["stage"]] = cpu.get(record["stage"], 0.0) + record["cpu_seconds"]
+    return {
+        stage: (round(_wall_time_covered(stage_intervals), 4), round(cpu[stage], 4), len(stage_intervals))
+        for stage, stage_intervals in intervals.items()
+    }
+
+
+def _format_profile(report: dict) -> str:
+    """Format a profile as a table per stage (nested stages are indented) and the totals per kind of stage.
+
+    See `_stage_totals` for the totals per kind of stage.
+    """
+
+    def _value(value, fmt: str) -> str:
+        return format(value, fmt) if value is not None else ""
+
+    total = report["wall_seconds"]
+    lines = [
+        f"{'stage':<58} {'wall s':>9} {'%':>6} {'cpu s':>9} {'rows in':>10} {'rows out':>10} "
+        f"{'+rss MB':>9} {'peak MB':>9}"
+    ]
+    for record in report["stages"]:
+        label = "  " * record["depth"] + record["stage"] + (f" {record['name']}" if record["name"] else "")
+        share = record["wall_seconds"] / total if total else None
+        lines.append(
+            f"{label[:58]:<58} {record['wall_seconds']:>9.3f} {_value(share, '.1%'):>6} "
+            f"{record['cpu_seconds']:>9.3f} {_value(record['rows_in'], 'd'):>10} {_value(record['rows_out'], 'd'):>10} "
+            f"{_value(record['max_rss_increase_mb'], '.1f'):>9} {_value(record['peak_memory_mb'], '.1f'):>9}"
+        )
+    lines.append(f"{'total':<58} {total:>9.3f}")
+
+    lines.append("")
+    lines.append(f"{'stage (total of leaf stages)':<58} {'wall s':>9} {'%':>6} {'cpu s':>9} {'count':>10}")
+    for stage, (wall, cpu, count) in sorted(_stage_totals(report["stages"]).items(), key=lambda item: -item[1][0]):
+        share = wall / total if total else None
+        lines.append(f"{stage:<58} {wall:>9.3f} {_value(share, '.1%'):>6} {cpu:>9.3f} {count:>10}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def _profile_run(command: str, fpath: Path, enabled: bool = True, track_memory: bool = False) -> Iterator[None]:
+    """Profile a command, save the profile as json and show it as a table.
+
+    When profiling already runs (a command called by run-pipeline), the command is a stage
+    of that profile and nothing is saved here.
+
+    Args:
+        command (str): name of the command.
+        fpath (Path): json-file the profile is saved to.
+        enabled (bool, optional): profile the command. Defaults to True.
+        track_memory (bool, optional): measure peak memory with tracemalloc too. Defaults to False.
+    """
+    if profiler.enabled:
+        with _profile_stage("command", name=command):
+            yield
+        return
+
+    if not enabled:
+        yield
+        return
+
+    profiler.start(track_memory=track_memory)
+    try:
+        yield
+    finally:
+        wall_seconds = profiler.stop()
+        report = _profile_report(command, wall_seconds)
+        _save_profile(report, fpath)
+        typer.echo(_format_profile(report))
@@ -8,6 +8,7 @@ import pandas as pd
 
 from eencijfer.convert.eencijfer import _get_list_of_eencijfer_files_in_dir, _match_file_to_definition
 from eencijfer.settings import config
+from eencijfer.utils.detect_eencijfer_files import _get_list_of_definition_files
 
 
 def _get_definition(row: pd.Series, col_name: str = 'path') -> Optional[Path]:
@@ -42,8 +43,7 @@ def compare_eencijfer_files_and_definitions(config: configparser.ConfigParser =
 
     eencijfer_df['definition'] = eencijfer_df.apply(_get_definition, axis=1)
 
-    definition_dir = config.getpath('default', 'import_definitions_dir')
-    definition_fpaths = [p for p in definition_dir.iterdir() if p.suffix in [".csv"]]
+    definition_fpaths = _get_list_of_definition_files(config.getpath('default', 'import_definitions_dir'))
     definition_files = [f.stem for f in definition_fpaths]
     definition_df = pd.DataFrame({'eencijfer_file': definition_files, 'definition': definition_fpaths})
 
@@ -0,0 +1,45 @@
+"""Fixtures: a small synthetic delivery, and the same delivery converted to parquet."""
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from eencijfer.assets.eencijfer import _create_eencijfer_df
+from eencijfer.bench.synthetic import _generate_eencijfer_files
+from eencijfer.convert.eencijfer import _convert_to_parquet
+from eencijfer.settings import config
+
+# klein genoeg voor een snelle test, groot genoeg voor uitval, switch en diploma's in elk cohort
+GENERATED_ROWS = 3000
+
+
+@pytest.fixture(scope="session")
+def delivery_dir(tmp_path_factory) -> Path:
+    """Directory with a synthetic delivery (EV, VAKHAVW and Dec-files as asc)."""
+    target_dir = tmp_path_factory.mktemp("delivery")
+    _generate_eencijfer_files(target_dir, rows=GENERATED_ROWS, seed=0)
+    return target_dir
+
+
+@pytest.fixture(scope="session")
+def converted_dir(delivery_dir, tmp_path_factory) -> Path:
+    """The synthetic delivery converted to parquet with the column converters, with PII."""
+    result_dir = tmp_path_factory.mktemp("converted")
+    _convert_to_parquet(delivery_dir, result_dir, use_column_converters=True)
+    return result_dir
+
+
+@pytest.fixture
+def source_dir(converted_dir) -> Iterator[Path]:
+    """The converted delivery as source_dir in the config, where the decode tables are read from."""
+    previous = config.get('default', 'source_dir')
+    config.set('default', 'source_dir', converted_dir.as_posix())
+    yield converted_dir
+    config.set('default', 'source_dir', previous)
+
+
+@pytest.fixture
+def eencijfer(source_dir):
+    """Enriched eencijfer of the synthetic delivery."""
+    return _create_eencijfer_df(source_dir)
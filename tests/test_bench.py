@@ -0,0 +1,114 @@
+"""Tests for the benchmark: the scaled input, the comparison with a baseline and memory tracking."""
+
+import tracemalloc
+
+import pytest
+
+from eencijfer.bench.data import _pgn_slice, _scale_source_dir
+from eencijfer.bench.runner import MIN_SECONDS, _compare_with_baseline, _measure
+from eencijfer.convert.eencijfer import _create_dict_matching_eencijfer_and_definition_files
+
+
+def _results(*stages) -> dict:
+    return {
+        "results": [
+            {"stage": stage, "scale": scale, "median_seconds": seconds, "peak_memory_mb": memory}
+            for stage, scale, seconds, memory in stages
+        ]
+    }
+
+
+def test_compare_with_baseline_threshold():
+    """A stage is a regression when its time or memory is more than the threshold higher than the baseline."""
+    baseline = _results(("a", 1, 1.0, 100.0), ("b", 1, 1.0, 100.0), ("c", 1, 1.0, 100.0), ("d", 1, 1.0, 100.0))
+    results = _results(("a", 1, 1.2, 100.0), ("b", 1, 1.3, 100.0), ("c", 1, 1.0, 130.0), ("d", 1, 0.5, 50.0))
+
+    comparison = {row.stage: row for row in _compare_with_baseline(results, baseline, threshold=0.2)}
+
+    assert {stage: row.regression for stage, row in comparison.items()} == {
+        "a": False,
+        "b": True,
+        "c": True,
+        "d": False,
+    }
+    assert comparison["b"].time_ratio == 1.3
+    assert comparison["c"].memory_ratio == 1.3
+    assert [row.regression for row in _compare_with_baseline(results, baseline, threshold=0.5)] == [False] * 4
+
+
+def test_compare_with_baseline_ignores_noise():
+    """A stage that is faster than MIN_SECONDS, before and after, is not slower, whatever the ratio."""
+    fast = MIN_SECONDS / 4
+    baseline = _results(("fast", 1, fast, None), ("slow", 1, fast, None))
+    results = _results(("fast", 1, fast * 3, None), ("slow", 1, MIN_SECONDS, None))
+
+    comparison = _compare_with_baseline(results, baseline)
+
+    assert [(row.stage, row.time_ratio, row.regression) for row in comparison] == [
+        ("fast", 3.0, False),
+        ("slow", 4.0, True),
+    ]
+    assert all(row.memory_ratio is None for row in comparison)
+
+
+def test_compare_with_baseline_skips_new_stages():
+    """Stages or scales that are not in the baseline are not compared."""
+    baseline = _results(("a", 0.5, 1.0, 100.0))
+    results = _results(("a", 0.5, 1.0, 100.0), ("a", 1, 9.0, 900.0), ("new", 0.5, 9.0, 900.0))
+
+    comparison = _compare_with_baseline(results, baseline)
+
+    assert [(row.stage, row.scale, row.regression) for row in comparison] == [("a", 0.5, False)]
+
+
+def _students(source_dir, prefix):
+    """The PersoonsgebondenNummers in the eencijfer-file of source_dir whose name starts with prefix."""
+    for fpath, definition_file in _create_dict_matching_eencijfer_and_definition_files(source_dir).items():
+        if fpath.name.startswith(prefix):
+            pgn = _pgn_slice(definition_file)
+            return {record[pgn] for record in fpath.read_bytes().splitlines()}
+    raise Exception(f"No {prefix}-file in {source_dir}")
+
+
+def test_scale_source_dir_samples_students(delivery_dir, tmp_path):
+    """A smaller sample is part of a bigger one, and a student is in both EV and VAKHAVW or in neither."""
+    ev = _students(delivery_dir, "EV")
+    vakhavw = _students(delivery_dir, "VAKHAVW")
+    assert ev & vakhavw
+
+    samples = {}
+    for scale in [0.3, 0.6]:
+        scale_dir = _scale_source_dir(delivery_dir, tmp_path / f"scale_{scale}", scale)
+        samples[scale] = (_students(scale_dir, "EV"), _students(scale_dir, "VAKHAVW"))
+
+    for sample_ev, sample_vakhavw in samples.values():
+        assert 0 < len(sample_ev) < len(ev)
+        assert sample_ev <= ev and sample_vakhavw <= vakhavw
+        for student in ev & vakhavw:
+            assert (student in sample_ev) == (student in sample_vakhavw)
+
+    assert samples[0.3][0] < samples[0.6][0]
+    assert samples[0.3][1] <= samples[0.6][1]
+    decode_table = "Dec_landcode.asc"
+    assert (tmp_path / "scale_0.3" / decode_table).read_bytes() == (delivery_dir / decode_table).read_bytes()
+
+
+def test_scale_source_dir_checks_scale(delivery_dir, tmp_path):
+    """A scale outside (0, 1] raises."""
+    with pytest.raises(Exception, match="between 0 and 1"):
+        _scale_source_dir(delivery_dir, tmp_path, 0)
+
+
+@pytest.mark.parametrize("tracing", [False, True])
+def test_measure_only_stops_its_own_tracing(tracing):
+    """Tracing memory that was started before _measure is still on afterwards; tracing it started is stopped."""
+    if tracing:
+        tracemalloc.start()
+    try:
+        result, output = _measure("list", 1, lambda: list(range(10_000)), repeat=1)
+        assert tracemalloc.is_tracing() == tracing
+    finally:
+        tracemalloc.stop()
+
+    assert result.rows == len(output) == 10_000
+    assert result.peak_memory_mb > 0
@@ -0,0 +1,97 @@
+"""Tests for the data asset cohorten, with the pandas- and the duckdb-engine."""
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from eencijfer.assets.cohorten import create_cohorten_met_indicatoren, create_inschrijving_jaar2
+from eencijfer.assets.engines import CohortEngine
+from eencijfer.assets.transformations.prestatieafspraken import _add_pa_cohort
+
+
+@pytest.fixture
+def cohorten(source_dir, eencijfer):
+    """Cohorten of the synthetic delivery, computed with pandas."""
+    return create_cohorten_met_indicatoren(source_dir, eencijfer=eencijfer, use_cache=False)
+
+
+def test_duckdb_engine_equals_pandas_engine(source_dir, eencijfer, cohorten):
+    """The duckdb-engine gives the same table as the pandas-engine, column for column and with the same dtypes."""
+    result = create_cohorten_met_indicatoren(
+        source_dir, eencijfer=eencijfer, engine=CohortEngine.duckdb, use_cache=False
+    )
+
+    assert len(cohorten) > 0
+    assert_frame_equal(result, cohorten, check_dtype=True)
+
+
+def test_inschrijving_jaar2_compares_soort_inschrijving_as_string():
+    """In the converted files SoortInschrijvingHogerOnderwijs is a string, '1' is a hoofdinschrijving."""
+    eencijfer = pd.DataFrame(
+        {
+            "PersoonsgebondenNummer": [1, 2, 3],
+            "opleiding": ["a", "b", "c"],
+            "ActueleInstelling": ["21PL", "21PL", "21PL"],
+            "Opleidingsvorm": ["voltijd", "voltijd", "voltijd"],
+            "OpleidingActueelEquivalent": [1, 2, 3],
+            "Inschrijvingsjaar": [2021, 2021, 2022],
+            "EersteJaarAanDezeActueleInstelling": [2020, 2020, 2020],
+            "SoortInschrijvingHogerOnderwijs": ["1", "2", "1"],
+        }
+    )
+
+    result = create_inschrijving_jaar2(source_dir=None, eencijfer=eencijfer)
+
+    assert result.PersoonsgebondenNummer.tolist() == [1]
+
+
+def test_jaar2_indicators_are_filled(cohorten):
+    """Students with a hoofdinschrijving in their second year are found, so not every student drops out."""
+    assert cohorten.opleiding_2ejaar.notna().any()
+    assert cohorten.ActueleInstelling_2ejaar.notna().any()
+    assert set(cohorten.UitvalEerstejaar.unique()) == {0, 1}
+    assert (cohorten.HerinschrijvingInstelling == 1).any()
+
+
+def _pa_row(**changes) -> dict:
+    row = {
+        "IndicatieActiefOpPeildatum": 1,
+        "SoortInschrijvingHogerOnderwijs": "1",
+        "TypeHogerOnderwijsBinnenSoortHogerOnderwijs": "ba",
+        "Opleidingscode": 34567,
+        "Opleidingsvorm": "voltijd",
+        "HoogsteVooropleiding": 500,
+        "HoogsteVooropleidingVoorHetHo": 500,
+        "EersteJaarInHetHogerOnderwijs": 2020,
+        "Inschrijvingsjaar": 2020,
+    }
+    row.update(changes)
+    return row
+
+
+def test_pa_cohort_definitie():
+    """A voltijd bachelor hoofdinschrijving ('1'), directly after the vooropleiding, is in the PA-cohort."""
+    eencijfer = pd.DataFrame(
+        [
+            _pa_row(),
+            _pa_row(SoortInschrijvingHogerOnderwijs="2"),
+            _pa_row(TypeHogerOnderwijsBinnenSoortHogerOnderwijs="ma"),
+            _pa_row(Opleidingscode=80001),
+            _pa_row(Opleidingsvorm="deeltijd"),
+            _pa_row(HoogsteVooropleidingVoorHetHo=400),
+            _pa_row(EersteJaarInHetHogerOnderwijs=2019),
+            _pa_row(IndicatieActiefOpPeildatum=0),
+        ]
+    )
+
+    result = _add_pa_cohort(eencijfer)
+
+    assert result.InPACohortDefinitie.tolist() == ["Ja"] + ["Nee"] * 7
+
+
+def test_cohort_type_follows_pa_cohort(cohorten):
+    """Cohorten has students in and outside the PA-cohort, with the matching CohortType."""
+    in_pa_cohort = cohorten.InPACohortDefinitie.astype(str) == "Ja"
+    assert in_pa_cohort.any() and not in_pa_cohort.all()
+    assert (cohorten.CohortType[in_pa_cohort].astype(str) == "EersteKeerHO").all()
+    assert (cohorten.CohortType[~in_pa_cohort].astype(str) == "EersteKeerHsl").all()
@@ -0,0 +1,104 @@
+"""Tests for cohorten stored per cohort and rebuilt incremental."""
+
+import json
+
+import pyarrow as pa
+import pytest
+from pandas.testing import assert_frame_equal
+
+import eencijfer.assets.cohorten_incremental as incremental
+from eencijfer.assets.cohorten import create_cohorten_met_indicatoren
+from eencijfer.assets.cohorten_incremental import MANIFEST_FNAME, _create_cohorten_incremental, _partition_fname
+from eencijfer.assets.engines import CohortEngine
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """Cohorts computed by `_create_cohorten_incremental`, one list per run."""
+    runs = []
+
+    def _create_cohorten(*args, **kwargs):
+        cohorten = create_cohorten_met_indicatoren(*args, **kwargs)
+        runs[-1].extend(sorted(cohorten.Cohort.unique().tolist()))
+        return cohorten
+
+    def _run(source_dir, partition_dir, eencijfer, engine=CohortEngine.pandas):
+        runs.append([])
+        return _create_cohorten_incremental(source_dir, partition_dir, eencijfer, engine=engine)
+
+    monkeypatch.setattr(incremental, "create_cohorten_met_indicatoren", _create_cohorten)
+    _run.runs = runs
+    return _run
+
+
+def _full_build(source_dir, eencijfer):
+    """Cohorten computed at once, as stored in parquet (an empty object column is read back with None)."""
+    cohorten = create_cohorten_met_indicatoren(source_dir, eencijfer=eencijfer, use_cache=False)
+    cohorten = cohorten.sort_values("Cohort", kind="stable").reset_index(drop=True)
+    return pa.Table.from_pandas(cohorten, preserve_index=False).to_pandas()
+
+
+def _modified(partition_dir):
+    return {fpath.name: fpath.stat().st_mtime_ns for fpath in partition_dir.glob("cohorten_*.parquet")}
+
+
+def test_full_build(source_dir, eencijfer, tmp_path, computed):
+    """The first run computes every cohort, and gives the same cohorten as a full rebuild."""
+    result = computed(source_dir, tmp_path, eencijfer)
+
+    cohorts = sorted(result.Cohort.unique().tolist())
+    assert computed.runs == [cohorts]
+    assert sorted(_modified(tmp_path)) == sorted(_partition_fname(cohort) for cohort in cohorts)
+    assert_frame_equal(result, _full_build(source_dir, eencijfer))
+
+
+def test_unchanged_input_rebuilds_nothing(source_dir, eencijfer, tmp_path, computed):
+    """With the same eencijfer no cohort is computed or written, and the result does not change."""
+    first = computed(source_dir, tmp_path, eencijfer)
+    modified = _modified(tmp_path)
+    manifest = (tmp_path / MANIFEST_FNAME).read_text()
+
+    second = computed(source_dir, tmp_path, eencijfer)
+
+    assert computed.runs[1] == []
+    assert _modified(tmp_path) == modified
+    assert (tmp_path / MANIFEST_FNAME).read_text() == manifest
+    assert_frame_equal(second, first)
+
+
+def test_changed_cohort_is_rebuilt(source_dir, eencijfer, tmp_path, computed):
+    """Changing the rows of a student rebuilds only the cohort of that student."""
+    first = computed(source_dir, tmp_path, eencijfer)
+    modified = _modified(tmp_path)
+
+    # een student die in precies één cohort zit
+    cohorts_of_student = first.groupby("PersoonsgebondenNummer").Cohort.nunique()
+    student = cohorts_of_student[cohorts_of_student == 1].index[0]
+    cohort = int(first.loc[first.PersoonsgebondenNummer == student, "Cohort"].iloc[0])
+
+    changed = eencijfer.copy()
+    rows = changed.PersoonsgebondenNummer == student
+    changed.loc[rows, "Aantal"] = changed.loc[rows, "Aantal"] + 1
+
+    result = computed(source_dir, tmp_path, changed)
+
+    assert computed.runs[1] == [cohort]
+    rewritten = {fname for fname, mtime in _modified(tmp_path).items() if mtime != modified[fname]}
+    assert rewritten == {_partition_fname(cohort)}
+    assert_frame_equal(result, _full_build(source_dir, changed))
+
+
+@pytest.mark.parametrize("field, value", [("version", "0.0.0"), ("engine", CohortEngine.duckdb.value)])
+def test_other_manifest_rebuilds_all(source_dir, eencijfer, tmp_path, computed, field, value):
+    """Stored cohorts of another version of eencijfer or another engine are all computed again."""
+    first = computed(source_dir, tmp_path, eencijfer)
+    manifest_fpath = tmp_path / MANIFEST_FNAME
+    manifest = json.loads(manifest_fpath.read_text())
+    manifest[field] = value
+    manifest_fpath.write_text(json.dumps(manifest))
+
+    result = computed(source_dir, tmp_path, eencijfer)
+
+    assert computed.runs[1] == computed.runs[0]
+    assert json.loads(manifest_fpath.read_text())[field] != value
+    assert_frame_equal(result, first)
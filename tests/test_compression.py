@@ -0,0 +1,74 @@
+"""Tests for converting compressed deliveries (.zip, .gz, .zst) without unpacking them."""
+
+import gzip
+import zipfile
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import eencijfer.utils.compression as compression_module
+from eencijfer.convert.eencijfer import _convert_to_parquet, _definition_width, _match_file_to_definition
+from eencijfer.convert.validate import _validate_asc
+
+
+def _zip(delivery_dir, fpath, directory=""):
+    with zipfile.ZipFile(fpath, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for member in sorted(delivery_dir.glob("*.asc")):
+            archive.write(member, arcname=f"{directory}{member.name}")
+
+
+def _gzip(delivery_dir, target_dir):
+    for member in sorted(delivery_dir.glob("*.asc")):
+        with gzip.open(target_dir / f"{member.name}.gz", "wb") as file:
+            file.write(member.read_bytes())
+
+
+@pytest.mark.parametrize("packing", ["zip", "zip with directory", "gz"])
+def test_compressed_delivery_equals_unpacked(delivery_dir, converted_dir, tmp_path, packing):
+    """A zip-archive (also with the files in a directory) or gzip-files convert to the same files as asc-files."""
+    source_dir = tmp_path / "source"
+    result_dir = tmp_path / "result"
+    source_dir.mkdir()
+    result_dir.mkdir()
+    if packing == "gz":
+        _gzip(delivery_dir, source_dir)
+    else:
+        _zip(delivery_dir, source_dir / "levering.zip", directory="levering/" if "directory" in packing else "")
+
+    _convert_to_parquet(source_dir, result_dir, use_column_converters=True)
+
+    expected = sorted(fpath.name for fpath in converted_dir.glob("*.parquet"))
+    assert sorted(fpath.name for fpath in result_dir.glob("*.parquet")) == expected
+    for name in expected:
+        assert_frame_equal(pd.read_parquet(result_dir / name), pd.read_parquet(converted_dir / name), obj=name)
+
+
+def test_validate_file_in_archive(delivery_dir, tmp_path):
+    """A file in a compressed file is validated while it is decompressed, with the same result."""
+    _gzip(delivery_dir, tmp_path)
+    fpath = delivery_dir / "EV____24.asc"
+    width = _definition_width(_match_file_to_definition(fpath))
+
+    validation = _validate_asc(tmp_path / "EV____24.asc.gz" / "EV____24.asc", width=width)
+
+    assert validation.valid
+    assert validation._replace(fpath=fpath) == _validate_asc(fpath, width=width)
+
+
+def test_zst_without_zstandard_raises(tmp_path, monkeypatch):
+    """Reading a .zst-file without zstandard raises with the package to install, also when converting."""
+    source_dir = tmp_path / "source"
+    result_dir = tmp_path / "result"
+    source_dir.mkdir()
+    result_dir.mkdir()
+    fpath = source_dir / "EV____24.asc.zst"
+    fpath.write_bytes(b"")
+    monkeypatch.setattr(compression_module, "zstd", None)
+
+    with pytest.raises(Exception, match="needs the package zstandard"):
+        with compression_module._open_binary(fpath / "EV____24.asc"):
+            pass
+
+    with pytest.raises(Exception, match="pip install zstandard"):
+        _convert_to_parquet(source_dir, result_dir)
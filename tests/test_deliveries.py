@@ -0,0 +1,187 @@
+"""Tests for converting several deliveries into one dataset per kind of file."""
+
+import shutil
+
+import pandas as pd
+import pytest
+
+from eencijfer.assets.eencijfer import _create_eencijfer_df
+from eencijfer.convert.eencijfer import _convert_to_parquet, _plan_conversions
+from eencijfer.convert.pii import _replace_all_pgn_with_pseudo_id_remove_pii_local_id
+from eencijfer.io.files import ExportFormat
+from eencijfer.settings import config
+from eencijfer.utils.detect_eencijfer_files import DELIVERY_COLUMN, _find_deliveries
+
+
+def _touch(source_dir, *names):
+    for name in names:
+        fpath = source_dir / name
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.touch()
+
+
+def _deliveries(source_dir):
+    """Year and files (relative to source_dir) of every delivery."""
+    return [
+        (delivery.year, sorted(fpath.relative_to(source_dir).as_posix() for fpath in delivery.files))
+        for delivery in _find_deliveries(source_dir)
+    ]
+
+
+def test_deliveries_side_by_side(tmp_path):
+    """EV-files in the same directory are deliveries; the other files belong to the latest."""
+    _touch(tmp_path, "EV____24.asc", "EV____23.asc", "VAKHAVW_____.asc", "Dec_landcode.asc")
+
+    assert _deliveries(tmp_path) == [
+        (2023, ["EV____23.asc"]),
+        (2024, ["Dec_landcode.asc", "EV____24.asc", "VAKHAVW_____.asc"]),
+    ]
+
+
+def test_delivery_per_directory(tmp_path):
+    """Every directory with an EV-file is a delivery, shared files in source_dir belong to the latest."""
+    _touch(
+        tmp_path,
+        "2023/EV____23.asc",
+        "2023/VAKHAVW_____.asc",
+        "2023/Dec_landcode.asc",
+        "levering 2024/EV____24.asc",
+        "levering 2024/VAKHAVW_____.asc",
+        "Dec_vakcode.asc",
+        ".temp_dir/EV____22.asc",
+    )
+
+    assert _deliveries(tmp_path) == [
+        (2023, ["2023/Dec_landcode.asc", "2023/EV____23.asc", "2023/VAKHAVW_____.asc"]),
+        (2024, ["Dec_vakcode.asc", "levering 2024/EV____24.asc", "levering 2024/VAKHAVW_____.asc"]),
+    ]
+
+
+def test_year_of_directory(tmp_path):
+    """Without a year in the name of the EV-file, the name of the directory is the year."""
+    _touch(tmp_path, "2022/EV.asc", "2024/EV____24.asc")
+
+    assert [year for year, _ in _deliveries(tmp_path)] == [2022, 2024]
+
+
+def test_single_delivery_without_year(tmp_path):
+    """One delivery does not need a year."""
+    _touch(tmp_path, "EV.asc", "Dec_landcode.asc")
+
+    assert _deliveries(tmp_path) == [(None, ["Dec_landcode.asc", "EV.asc"])]
+
+
+def test_duplicate_year_raises(tmp_path):
+    """Two deliveries of the same year can not be told apart."""
+    _touch(tmp_path, "a/EV____24.asc", "b/EV____24.asc")
+
+    with pytest.raises(Exception, match="same year"):
+        _find_deliveries(tmp_path)
+
+
+def test_missing_year_raises(tmp_path):
+    """With several deliveries, every delivery needs a year."""
+    _touch(tmp_path, "a/EV.asc", "b/EV____24.asc")
+
+    with pytest.raises(Exception, match="year of .* is unknown"):
+        _find_deliveries(tmp_path)
+
+
+def test_plan_conversions(tmp_path):
+    """EV and VAKHAVW get a partition per delivery; of the decode tables only the latest is converted."""
+    source_dir = tmp_path / "source"
+    result_dir = tmp_path / "result"
+    _touch(
+        source_dir,
+        "2023/EV____23.asc",
+        "2023/VAKHAVW_____.asc",
+        "2023/Dec_landcode.asc",
+        "2024/EV____24.asc",
+        "2024/VAKHAVW_____.asc",
+        "2024/Dec_landcode.asc",
+        "Dec_vakcode.asc",
+    )
+
+    conversions = _plan_conversions(source_dir, result_dir, ExportFormat.csv)
+
+    planned = {
+        conversion.fpath.relative_to(source_dir).as_posix(): conversion.target_fpath.relative_to(result_dir).as_posix()
+        for conversion in conversions
+    }
+    assert planned == {
+        "2023/EV____23.asc": f"EV.parquet/{DELIVERY_COLUMN}=2023/EV____23.parquet",
+        "2023/VAKHAVW_____.asc": f"VAKHAVW.parquet/{DELIVERY_COLUMN}=2023/VAKHAVW_____.parquet",
+        "2024/EV____24.asc": f"EV.parquet/{DELIVERY_COLUMN}=2024/EV____24.parquet",
+        "2024/VAKHAVW_____.asc": f"VAKHAVW.parquet/{DELIVERY_COLUMN}=2024/VAKHAVW_____.parquet",
+        "2024/Dec_landcode.asc": "Dec_landcode.csv",
+        "Dec_vakcode.asc": "Dec_vakcode.csv",
+    }
+
+
+def test_plan_conversions_single_delivery(tmp_path):
+    """One delivery is converted to files in result_dir, as before."""
+    _touch(tmp_path / "source", "EV____24.asc", "VAKHAVW_____.asc", "Dec_landcode.asc")
+
+    conversions = _plan_conversions(tmp_path / "source", tmp_path / "result", ExportFormat.parquet)
+
+    assert sorted(conversion.target_fpath.name for conversion in conversions) == [
+        "Dec_landcode.parquet",
+        "EV____24.parquet",
+        "VAKHAVW_____.parquet",
+    ]
+    assert {conversion.target_fpath.parent for conversion in conversions} == {tmp_path / "result"}
+
+
+@pytest.fixture
+def two_deliveries(delivery_dir, tmp_path):
+    """The synthetic delivery as 2024, and its first half of EV and VAKHAVW as 2023; decode tables are shared."""
+    source_dir = tmp_path / "source"
+    for year in ["2023", "2024"]:
+        (source_dir / year).mkdir(parents=True)
+    for name in ["EV____24.asc", "VAKHAVW_____.asc"]:
+        lines = (delivery_dir / name).read_bytes().splitlines(keepends=True)
+        shutil.copyfile(delivery_dir / name, source_dir / "2024" / name)
+        (source_dir / "2023" / name.replace("24", "23")).write_bytes(b"".join(lines[: len(lines) // 2]))
+    for fpath in delivery_dir.glob("Dec_*.asc"):
+        shutil.copyfile(fpath, source_dir / fpath.name)
+    return source_dir
+
+
+def test_convert_two_deliveries(two_deliveries, converted_dir, tmp_path):
+    """Two deliveries give a dataset per kind with consistent pseudo-ids, assets use the latest delivery."""
+    result_dir = tmp_path / "result"
+    result_dir.mkdir()
+
+    _convert_to_parquet(two_deliveries, result_dir, use_column_converters=True)
+
+    partitions = sorted(p.relative_to(result_dir).as_posix() for p in result_dir.glob("*.parquet/*/*.parquet"))
+    assert partitions == [
+        f"EV.parquet/{DELIVERY_COLUMN}=2023/EV____23.parquet",
+        f"EV.parquet/{DELIVERY_COLUMN}=2024/EV____24.parquet",
+        f"VAKHAVW.parquet/{DELIVERY_COLUMN}=2023/VAKHAVW_____.parquet",
+        f"VAKHAVW.parquet/{DELIVERY_COLUMN}=2024/VAKHAVW_____.parquet",
+    ]
+    assert (result_dir / "Dec_landcode.parquet").is_file()
+
+    _replace_all_pgn_with_pseudo_id_remove_pii_local_id(result_dir)
+
+    # de eerste helft van 2024 is 2023: dezelfde studenten hebben in beide leveringen dezelfde pseudo-id
+    original = pd.read_parquet(converted_dir / "EV____24.parquet").PersoonsgebondenNummer.tolist()
+    for dataset in ["EV", "VAKHAVW"]:
+        pgn_2023 = pd.read_parquet(result_dir / f"{dataset}.parquet/{DELIVERY_COLUMN}=2023").PersoonsgebondenNummer
+        pgn_2024 = pd.read_parquet(result_dir / f"{dataset}.parquet/{DELIVERY_COLUMN}=2024").PersoonsgebondenNummer
+        assert pgn_2023.notna().all()
+        assert pgn_2023.tolist() == pgn_2024.iloc[: len(pgn_2023)].tolist()
+        assert set(pgn_2023) < set(pgn_2024)
+
+    previous = config.get('default', 'source_dir')
+    config.set('default', 'source_dir', result_dir.as_posix())
+    try:
+        eencijfer = _create_eencijfer_df(result_dir, columns=["PersoonsgebondenNummer", "Inschrijvingsjaar"])
+    finally:
+        config.set('default', 'source_dir', previous)
+
+    latest = pd.read_parquet(result_dir / f"EV.parquet/{DELIVERY_COLUMN}=2024/EV____24.parquet")
+    assert latest.PersoonsgebondenNummer.tolist() != original
+    assert len(eencijfer) == len(latest)
+    assert eencijfer.PersoonsgebondenNummer.tolist() == latest.PersoonsgebondenNummer.tolist()
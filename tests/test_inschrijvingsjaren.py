@@ -0,0 +1,93 @@
+"""Tests for the bitmask of years with a hoofdinschrijving and the indicators after n years."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from eencijfer.assets.cohorten import MAX_JAREN, _add_inschrijving_na_jaren, create_inschrijvingsjaren
+
+
+def _inschrijving(pgn: int, jaar: float, eerste_jaar: float = 2020, soort: str = "1") -> dict:
+    return {
+        "PersoonsgebondenNummer": pgn,
+        "ActueleInstelling": "21PL",
+        "Inschrijvingsjaar": jaar,
+        "EersteJaarAanDezeActueleInstelling": eerste_jaar,
+        "SoortInschrijvingHogerOnderwijs": soort,
+    }
+
+
+def test_inschrijvingsjaren_bitmask():
+    """Bit k is set for a hoofdinschrijving k years after the first year; other years are left out."""
+    eencijfer = pd.DataFrame(
+        [
+            # student 1: jaar 0, 2 en 3, jaar 1 ontbreekt
+            _inschrijving(1, 2020),
+            _inschrijving(1, 2022),
+            _inschrijving(1, 2023),
+            # geen hoofdinschrijving
+            _inschrijving(1, 2021, soort="2"),
+            # student 2: jaar 0 en het laatste jaar dat in het masker past
+            _inschrijving(2, 2000, eerste_jaar=2000),
+            _inschrijving(2, 2000 + MAX_JAREN, eerste_jaar=2000),
+            # voorbij het masker, voor het eerste jaar en zonder eerste jaar: niet meegeteld
+            _inschrijving(2, 2001 + MAX_JAREN, eerste_jaar=2000),
+            _inschrijving(3, 2019),
+            _inschrijving(3, 2020, eerste_jaar=np.nan),
+        ]
+    )
+
+    result = create_inschrijvingsjaren(source_dir=None, eencijfer=eencijfer)
+
+    jaren = result.set_index("PersoonsgebondenNummer").Inschrijvingsjaren.to_dict()
+    assert jaren == {1: 0b1101, 2: 1 | (1 << MAX_JAREN)}
+
+
+@pytest.fixture
+def cohort() -> pd.DataFrame:
+    """Students in a cohort: re-enrolled, with diplomas, and one without any hoofdinschrijving."""
+    return pd.DataFrame(
+        {
+            "PersoonsgebondenNummer": [1, 2, 3, 4, 5],
+            "ActueleInstelling": ["21PL"] * 5,
+            "JaarTotEenDiploma": [np.nan, np.nan, 2.0, np.nan, np.nan],
+            "HoDiplomaInEersteJaar": [0, 0, 0, 1, 0],
+        }
+    )
+
+
+def test_herinschrijving_en_uitval_na_jaren(cohort):
+    """Na{n}Jaar looks at bit n; a diploma within n years or in the first year is no uitval."""
+    inschrijvingsjaren = pd.DataFrame(
+        {
+            "PersoonsgebondenNummer": [1, 2, 3, 4],
+            "ActueleInstelling": ["21PL"] * 4,
+            # 1: jaar 0-4, 2: jaar 0 en 3, 3: jaar 0-2, 4: jaar 0
+            "Inschrijvingsjaren": [0b11111, 0b1001, 0b111, 0b1],
+        }
+    )
+
+    result = _add_inschrijving_na_jaren(cohort, inschrijvingsjaren)
+
+    assert result.HerinschrijvingNa2Jaar.tolist() == [1, 0, 1, 0, 0]
+    assert result.HerinschrijvingNa3Jaar.tolist() == [1, 1, 0, 0, 0]
+    assert result.HerinschrijvingNa4Jaar.tolist() == [1, 0, 0, 0, 0]
+    # 2 is er in jaar 2 niet en heeft geen diploma; 3 heeft na 3 jaar een diploma; 4 in het eerste jaar;
+    # 5 heeft geen enkele hoofdinschrijving
+    assert result.UitvalNa2Jaar.tolist() == [0, 1, 0, 0, 1]
+    assert result.UitvalNa3Jaar.tolist() == [0, 0, 0, 0, 1]
+    assert result.UitvalNa4Jaar.tolist() == [0, 1, 0, 0, 1]
+
+
+def test_na_jaren_upper_bound(cohort):
+    """The last year in the bitmask can be used; years outside it raise."""
+    inschrijvingsjaren = pd.DataFrame(
+        {"PersoonsgebondenNummer": [1], "ActueleInstelling": ["21PL"], "Inschrijvingsjaren": [1 << MAX_JAREN]}
+    )
+
+    result = _add_inschrijving_na_jaren(cohort, inschrijvingsjaren, na_jaren=[MAX_JAREN])
+    assert result[f"HerinschrijvingNa{MAX_JAREN}Jaar"].tolist() == [1, 0, 0, 0, 0]
+
+    for n in [0, MAX_JAREN + 1]:
+        with pytest.raises(Exception, match="between 1 and"):
+            _add_inschrijving_na_jaren(cohort.copy(), inschrijvingsjaren, na_jaren=[n])
@@ -0,0 +1,108 @@
+"""Tests for the index-based lookups that replace `pd.merge` in the enrichment of eencijfer."""
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from eencijfer.assets.transformations.lookup import _add_lookup_columns, _gather_lookup_columns
+
+
+def _merged_columns(data, lookup, left_on, right_on=None, suffix="_lookup"):
+    """The columns a left `pd.merge` adds to data."""
+    if right_on is None:
+        merged = pd.merge(data, lookup, how="left", on=left_on, suffixes=("", suffix))
+    else:
+        merged = pd.merge(data, lookup, how="left", left_on=left_on, right_on=right_on, suffixes=("", suffix))
+    return merged[[col for col in merged.columns if col not in data.columns]]
+
+
+@pytest.fixture
+def data():
+    """Rows to enrich, with keys that are not in the lookup (9 and missing) and a column also in the lookup."""
+    return pd.DataFrame(
+        {
+            "Code": [1, 2, 9, 1, None],
+            "Jaar": [2020, 2021, 2020, 2021, 2020],
+            "Naam": ["a", "b", "c", "d", "e"],
+        },
+        index=[10, 11, 12, 13, 14],
+    )
+
+
+def test_single_key_same_name_as_left_merge(data):
+    """A key with the same name in both tables is not added again; unmatched keys give missing values."""
+    lookup = pd.DataFrame({"Code": [1.0, 2.0], "Omschrijving": ["een", "twee"], "Aantal": [10, 20]})
+
+    result = _gather_lookup_columns(data, lookup, left_on="Code")
+
+    expected = _merged_columns(data, lookup, left_on="Code")
+    expected.index = data.index
+    assert list(result.columns) == ["Omschrijving", "Aantal"]
+    assert_frame_equal(result, expected)
+
+
+def test_key_with_other_name_and_suffix_as_left_merge(data):
+    """The lookup key is kept when its name differs; columns already in data get the suffix."""
+    lookup = pd.DataFrame({"code": [1.0, 2.0, 3.0], "Naam": ["een", "twee", "drie"]})
+
+    result = _gather_lookup_columns(data, lookup, left_on="Code", right_on="code")
+
+    expected = _merged_columns(data, lookup, left_on="Code", right_on="code")
+    expected.index = data.index
+    assert list(result.columns) == ["code", "Naam_lookup"]
+    assert_frame_equal(result, expected)
+
+
+def test_multi_column_key_as_left_merge(data):
+    """A key of several columns matches on all of them."""
+    lookup = pd.DataFrame(
+        {"Code": [1.0, 1.0, 2.0], "Jaar": [2020, 2021, 2020], "Omschrijving": ["een-20", "een-21", "twee-20"]}
+    )
+
+    result = _gather_lookup_columns(data, lookup, left_on=["Code", "Jaar"])
+
+    expected = _merged_columns(data, lookup, left_on=["Code", "Jaar"])
+    expected.index = data.index
+    assert result.Omschrijving.iloc[[0, 3]].tolist() == ["een-20", "een-21"]
+    assert result.Omschrijving.iloc[[1, 2, 4]].isna().all()
+    assert_frame_equal(result, expected)
+
+
+def test_add_lookup_columns_keeps_data(data):
+    """The columns are added to data itself, the existing columns do not change."""
+    lookup = pd.DataFrame({"Code": [1.0, 2.0], "Omschrijving": ["een", "twee"]})
+    original = data.copy()
+
+    result = _add_lookup_columns(data, lookup, left_on="Code")
+
+    assert result is data
+    assert_frame_equal(result[original.columns], original)
+    assert result.Omschrijving.tolist()[:2] == ["een", "twee"]
+
+
+def test_non_unique_lookup_key_raises(data):
+    """A decode table with a key that is not unique would duplicate rows in a merge, so it raises."""
+    lookup = pd.DataFrame({"Code": [1.0, 1.0], "Omschrijving": ["een", "nog een"]})
+
+    with pytest.raises(Exception, match="not unique"):
+        _gather_lookup_columns(data, lookup, left_on="Code")
+
+
+def test_keys_of_different_kind_raise(data):
+    """An int64 key can not match a key of strings; like `pd.merge` this raises instead of giving missing values."""
+    lookup = pd.DataFrame({"Code": ["1", "2"], "Omschrijving": ["een", "twee"]})
+    data["Code"] = data.Code.fillna(0).astype("int64")
+
+    with pytest.raises(Exception, match="Can not look up Code"):
+        _gather_lookup_columns(data, lookup, left_on="Code")
+    with pytest.raises(Exception):
+        pd.merge(data, lookup, how="left", on="Code")
+
+
+def test_object_key_with_numbers_matches_numeric_key(data):
+    """A key of objects holding numbers matches a numeric key, as it does in `pd.merge`."""
+    lookup = pd.DataFrame({"Code": pd.Series([1, 2], dtype=object), "Omschrijving": ["een", "twee"]})
+
+    result = _gather_lookup_columns(data, lookup, left_on="Code")
+
+    assert result.Omschrijving.tolist()[:2] == ["een", "twee"]
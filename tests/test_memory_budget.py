@@ -0,0 +1,157 @@
+"""Tests for the memory budget (`--max-memory`): the limits it sets, and converting and exporting in chunks."""
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import eencijfer.convert.eencijfer as convert_module
+import eencijfer.io.files as files_module
+from eencijfer.assets.cache import asset_cache
+from eencijfer.cli import _set_memory_budget
+from eencijfer.convert.eencijfer import _convert_to_parquet
+from eencijfer.io.files import ExportFormat, _convert_to_export_format
+from eencijfer.utils.memory import (
+    CACHE_SHARE,
+    CHUNK_SHARE,
+    MB,
+    MIN_CHUNK_ROWS,
+    _MemoryBudget,
+    _parse_memory_size,
+    memory_budget,
+)
+
+
+@pytest.fixture
+def tiny_budget():
+    """A memory budget so small that every file with more than MIN_CHUNK_ROWS rows is handled in chunks."""
+    memory_budget.set(1)
+    yield memory_budget
+    memory_budget.set(None)
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    """Names of the files that are converted or exported in chunks."""
+    names = []
+
+    def _spy(module, name):
+        func = getattr(module, name)
+
+        def _wrapper(fpath, *args, **kwargs):
+            names.append(fpath.name)
+            return func(fpath, *args, **kwargs)
+
+        monkeypatch.setattr(module, name, _wrapper)
+
+    _spy(convert_module, "_convert_asc_in_chunks")
+    _spy(files_module, "_export_in_chunks")
+    return names
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [
+        ("4GB", 4 * 1024 * MB),
+        ("4g", 4 * 1024 * MB),
+        ("512MB", 512 * MB),
+        ("512", 512 * MB),
+        (" 1.5 GB ", int(1.5 * 1024 * MB)),
+        ("64KB", 64 * 1024),
+        ("64K", 64 * 1024),
+    ],
+)
+def test_parse_memory_size(size, expected):
+    """Sizes are in bytes; without a unit the size is in MB."""
+    assert _parse_memory_size(size) == expected
+
+
+@pytest.mark.parametrize("size", ["", "GB", "4TB", "-1GB", "four GB", "4 GB 2"])
+def test_parse_memory_size_raises(size):
+    """A size that can not be parsed raises."""
+    with pytest.raises(Exception, match="Can not parse memory size"):
+        _parse_memory_size(size)
+
+
+def test_no_budget_no_limits():
+    """Without a budget there are no chunks, no limit for DuckDB and workers are not changed."""
+    budget = _MemoryBudget()
+
+    assert budget.chunk_rows(100) is None
+    assert budget.duckdb_memory_limit() is None
+    assert budget.duckdb_threads() is None
+    assert budget.max_workers() is None
+    assert budget.max_workers(4) == 4
+
+
+def test_chunk_rows():
+    """Chunks use CHUNK_SHARE of the budget, with at least MIN_CHUNK_ROWS rows."""
+    budget = _MemoryBudget()
+    budget.set(1024 * MB)
+
+    assert budget.chunk_rows(1000) == int(1024 * MB * CHUNK_SHARE / 1000)
+    assert budget.chunk_rows(0) == int(1024 * MB * CHUNK_SHARE)
+    assert budget.chunk_rows(1024 * MB) == MIN_CHUNK_ROWS
+    assert budget.max_workers() == 1
+
+
+@pytest.mark.parametrize("max_bytes, limit", [(1, "256MB"), (512 * MB, "256MB"), (4096 * MB, "2048MB")])
+def test_duckdb_memory_limit(max_bytes, limit):
+    """Half of the budget goes to DuckDB, but at least the memory it needs to write wide tables."""
+    budget = _MemoryBudget()
+    budget.set(max_bytes)
+
+    assert budget.duckdb_memory_limit() == limit
+    assert budget.duckdb_threads() >= 1
+
+
+@pytest.mark.parametrize("max_memory, share", [(None, None), ("1GB", CACHE_SHARE), ("100GB", None)])
+def test_cache_gets_its_share_of_the_budget(monkeypatch, max_memory, share):
+    """The asset-cache gets its share of a budget, but never more than its own maximum; without a budget it keeps it."""
+    monkeypatch.setattr(asset_cache, "max_bytes", 2048 * MB)
+    try:
+        _set_memory_budget(max_memory)
+    finally:
+        budget = memory_budget.max_bytes
+        memory_budget.set(None)
+
+    assert asset_cache.max_bytes == (2048 * MB if share is None else int(budget * share))
+
+
+def _read_all(directory, suffix):
+    read = pd.read_parquet if suffix == ".parquet" else pd.read_csv
+    return {fpath.name: read(fpath) for fpath in sorted(directory.glob(f"*{suffix}"))}
+
+
+def test_convert_in_chunks_equals_convert_at_once(delivery_dir, converted_dir, tmp_path, tiny_budget, chunked):
+    """Files parsed in chunks give the same parquet-files as files parsed at once."""
+    _convert_to_parquet(delivery_dir, tmp_path, use_column_converters=True)
+
+    assert {"EV____24.asc", "VAKHAVW_____.asc"} <= set(chunked)
+    expected = _read_all(converted_dir, ".parquet")
+    result = _read_all(tmp_path, ".parquet")
+    assert list(result) == list(expected)
+    for name, data in expected.items():
+        assert_frame_equal(result[name], data, check_dtype=True, obj=name)
+
+
+@pytest.mark.parametrize("export_format", [ExportFormat.csv, ExportFormat.parquet])
+def test_export_in_chunks_equals_export_at_once(converted_dir, tmp_path, chunked, export_format):
+    """Files exported in chunks are the same as files exported at once."""
+    suffix = f".{export_format.value}"
+    for directory in ["at_once", "chunked"]:
+        (tmp_path / directory).mkdir()
+    _convert_to_export_format(converted_dir, tmp_path / "at_once", export_format=export_format)
+    assert chunked == []
+
+    memory_budget.set(1)
+    try:
+        _convert_to_export_format(converted_dir, tmp_path / "chunked", export_format=export_format)
+    finally:
+        memory_budget.set(None)
+
+    assert {"EV____24.parquet", "VAKHAVW_____.parquet"} <= set(chunked)
+    expected = _read_all(tmp_path / "at_once", suffix)
+    result = _read_all(tmp_path / "chunked", suffix)
+    assert list(result) == list(expected) and len(expected) > 0
+    for name, data in expected.items():
+        assert_frame_equal(result[name], data, check_dtype=True, obj=name)
@@ -0,0 +1,38 @@
+"""Tests for the gemeente of postcodes, with the postcode table of the year."""
+
+import numpy as np
+import pandas as pd
+
+import eencijfer.assets.eencijfer as eencijfer_asset
+import eencijfer.assets.transformations.postcodes as postcodes_module
+from eencijfer.assets.eencijfer import _create_eencijfer_df
+from eencijfer.assets.transformations.postcodes import _postcode_tabel_jaar
+
+
+def test_postcode_tabel_jaar():
+    """A year uses the most recent table of that year or before, the first table before it and the last for NA."""
+    tabel_jaren = np.array([2018, 2020, 2022])
+    jaar = pd.Series([2015, 2018, 2019, 2020, 2021, 2022, 2030, None], dtype="Int64")
+
+    result = _postcode_tabel_jaar(jaar, tabel_jaren)
+
+    assert result.tolist() == [2018, 2018, 2018, 2020, 2020, 2022, 2022, 2022]
+
+
+def test_postcode_tables_are_read_once(source_dir, monkeypatch):
+    """Both gemeente steps use the same postcode tables, which are read once."""
+    calls = []
+    read_postcode_tables = eencijfer_asset._read_postcode_tables
+
+    def _counting_read(*args, **kwargs):
+        calls.append(args)
+        return read_postcode_tables(*args, **kwargs)
+
+    monkeypatch.setattr(eencijfer_asset, "_read_postcode_tables", _counting_read)
+    monkeypatch.setattr(postcodes_module, "_read_postcode_tables", _counting_read)
+
+    result = _create_eencijfer_df(source_dir, columns=["GemeenteCodeStudent", "GemeenteCodeHoogsteVooroplVoorHetHo"])
+
+    assert len(calls) == 1
+    assert result.GemeenteCodeStudent.notna().any()
+    assert result.GemeenteCodeHoogsteVooroplVoorHetHo.notna().any()
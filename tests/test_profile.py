@@ -0,0 +1,112 @@
+"""Tests for the profile of the stages of a run, with stages on the threads of a pool."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from eencijfer.utils.profile import (
+    _format_profile,
+    _in_current_stage,
+    _profile_report,
+    _profile_stage,
+    _stage_totals,
+    profiler,
+)
+
+
+@pytest.fixture
+def profiling():
+    """Profiler that is running during the test."""
+    profiler.start()
+    yield profiler
+    profiler.stop()
+
+
+def _record(id, stage, start, wall, parent=None, cpu=0.0) -> dict:
+    return {
+        "id": id,
+        "stage": stage,
+        "parent": parent,
+        "start_seconds": start,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+    }
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stages_on_pool_threads_are_nested(profiling):
+    """A stage of a task on a pool thread is nested in the stage that submitted the task."""
+
+    def _task(name):
+        with _profile_stage("task", name=name):
+            with _profile_stage("step", name=name):
+                pass
+
+    with _profile_stage("outer") as outer:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(_in_current_stage(_task), ["a", "b"]))
+
+    tasks = [record for record in profiling.stages if record["stage"] == "task"]
+    steps = [record for record in profiling.stages if record["stage"] == "step"]
+    assert outer["depth"] == 0 and outer["parent"] is None
+    assert [(record["depth"], record["parent"]) for record in tasks] == [(1, outer["id"])] * 2
+    assert all(record["depth"] == 2 for record in steps)
+    assert {record["parent"] for record in steps} == {record["id"] for record in tasks}
+    assert outer["cpu_clock"] == "process"
+    assert {record["cpu_clock"] for record in tasks + steps} == {"thread"}
+
+
+def test_stage_on_pool_thread_counts_its_own_cpu_time(profiling):
+    """A stage on a pool thread that waits does not count the cpu time of a stage that runs at the same time."""
+
+    def _task(seconds):
+        with _profile_stage("busy" if seconds else "wait"):
+            if seconds:
+                _busy(seconds)
+            else:
+                time.sleep(0.3)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(_in_current_stage(_task), [0.3, 0]))
+
+    cpu = {record["stage"]: record["cpu_seconds"] for record in profiling.stages}
+    assert cpu["wait"] < 0.1 < cpu["busy"]
+
+
+def test_stage_totals_of_leaf_stages():
+    """Totals leave out stages with nested stages, and count stages that run at the same time once."""
+    stages = [
+        _record(0, "asset", 0.0, 10.0, cpu=9.0),
+        _record(1, "enrich", 0.0, 4.0, parent=0, cpu=4.0),
+        _record(2, "enrich", 1.0, 4.0, parent=0, cpu=4.0),
+        _record(3, "enrich", 6.0, 1.0, parent=0, cpu=1.0),
+        _record(4, "write", 8.0, 2.0, parent=0, cpu=0.5),
+    ]
+
+    totals = _stage_totals(stages)
+
+    assert totals == {"enrich": (6.0, 9.0, 3), "write": (2.0, 0.5, 1)}
+
+
+def test_format_profile_totals_at_most_the_run(profiling):
+    """Concurrent stages on pool threads add up to at most 100% of the run in the totals."""
+
+    def _task(_):
+        with _profile_stage("enrich"):
+            time.sleep(0.1)
+
+    with _profile_stage("asset"):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_in_current_stage(_task), range(4)))
+    report = _profile_report("test", profiling.stop())
+
+    totals = _stage_totals(report["stages"])
+    assert list(totals) == ["enrich"]
+    assert 0.1 <= totals["enrich"][0] <= report["wall_seconds"]
+    assert "enrich" in _format_profile(report).split("stage (total of leaf stages)")[1]
@@ -0,0 +1,85 @@
+"""Tests for matching asc-files to definitions on the record length of their first lines."""
+
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+from eencijfer.convert.eencijfer import _definition_width, _match_file_to_definition, read_asc
+from eencijfer.utils.detect_eencijfer_files import _get_list_of_definition_files
+
+# genoeg regels dat parsen seconden duurt, terwijl de recordlengte in milliseconden bekend is
+LARGE_FILE_RECORDS = 100_000
+
+
+@pytest.fixture
+def ev_records(delivery_dir):
+    """Records of the synthetic EV-file, without line ends."""
+    return (delivery_dir / "EV____24.asc").read_bytes().splitlines()
+
+
+@pytest.fixture
+def no_parsing(monkeypatch):
+    """Fail the test when a fixed-width file is parsed."""
+
+    def _read_fwf(*args, **kwargs):
+        raise AssertionError("the file should not be parsed")
+
+    monkeypatch.setattr(pd, "read_fwf", _read_fwf)
+
+
+def _write_asc(fpath, records, width):
+    fpath.write_bytes(b"".join(record[:width] + b"\r\n" for record in records))
+    return fpath
+
+
+def test_file_with_other_width_is_skipped_fast(ev_records, tmp_path, no_parsing):
+    """A large file that does not fit any EV-definition is skipped on its first lines, without parsing it."""
+    definition_files = _get_list_of_definition_files()
+    width = len(ev_records[0]) - 1
+    records = (ev_records * (LARGE_FILE_RECORDS // len(ev_records) + 1))[:LARGE_FILE_RECORDS]
+    fpath = _write_asc(tmp_path / "EV____24.asc", records, width)
+
+    start = time.perf_counter()
+    definition_file = _match_file_to_definition(fpath, definition_files)
+    seconds = time.perf_counter() - start
+
+    assert definition_file is None
+    assert seconds < 0.1
+
+
+def test_read_asc_raises_before_parsing(ev_records, tmp_path, no_parsing):
+    """read_asc checks the record length against the definition before it parses the file."""
+    definition_file = [d for d in _get_list_of_definition_files() if d.name == "EV____24.csv"][0]
+    fpath = _write_asc(tmp_path / "EV____24.asc", ev_records, len(ev_records[0]) - 1)
+
+    with pytest.raises(Exception, match="check your definitions"):
+        read_asc(fpath, definition_file)
+
+
+def test_fallback_to_definition_of_same_kind(ev_records, tmp_path):
+    """A file that does not fit the definition matched on name uses a definition of the same kind that fits."""
+    definition_dir = tmp_path / "definitions"
+    definition_dir.mkdir()
+    ev_24 = [d for d in _get_list_of_definition_files() if d.name == "EV____24.csv"][0]
+    shutil.copyfile(ev_24, definition_dir / ev_24.name)
+
+    # een oudere levering zonder de laatste kolom, en een definitie van een andere soort met dezelfde breedte
+    definition = pd.read_csv(ev_24)
+    last = definition.StartingPosition.idxmax()
+    ev_23 = definition.drop(index=last)
+    ev_23.to_csv(definition_dir / "Dec_other.csv", index=False)
+    ev_23.to_csv(definition_dir / "EV____23.csv", index=False)
+    width = _definition_width(definition_dir / "EV____23.csv")
+    assert width < _definition_width(ev_24)
+
+    definition_files = sorted(definition_dir.glob("*.csv"))
+    fpath = _write_asc(tmp_path / "EV____24.asc", ev_records, width)
+
+    definition_file = _match_file_to_definition(fpath, definition_files)
+
+    assert definition_file == definition_dir / "EV____23.csv"
+    data = read_asc(fpath, definition_file)
+    assert len(data) == len(ev_records)
+    assert list(data.columns) == ev_23.Label.tolist()
@@ -0,0 +1,156 @@
+"""Tests for the validation of the structure of asc-files before they are parsed."""
+
+import pandas as pd
+import pytest
+
+import eencijfer.convert.validate as validate_module
+from eencijfer.convert.validate import MAX_EXAMPLES, _validate_asc
+
+WIDTH = 10
+RECORD = b"abcdefghij"
+
+
+def _write(tmp_path, *lines: bytes, name="test.asc"):
+    fpath = tmp_path / name
+    fpath.write_bytes(b"".join(lines))
+    return fpath
+
+
+def _read_fwf_rows(fpath) -> int:
+    """Number of rows `pd.read_fwf` reads, the number `_validate_asc` has to predict."""
+    return len(pd.read_fwf(fpath, widths=[WIDTH], header=None, encoding="latin1", dtype=str))
+
+
+def test_valid_file(tmp_path):
+    """A file with records of the width of the definition is valid."""
+    fpath = _write(tmp_path, *[RECORD + b"\r\n"] * 3)
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation.valid
+    assert validation.rows == 3 == _read_fwf_rows(fpath)
+    assert validation.record_lengths == {WIDTH: 3}
+    assert validation.blank_lines == 0
+
+
+def test_short_and_long_records(tmp_path):
+    """Records that are shorter or longer than the definition are malformed, with their line numbers."""
+    fpath = _write(tmp_path, RECORD + b"\r\n", RECORD[:-1] + b"\r\n", RECORD + b"\r\n", RECORD + b"k\r\n")
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert not validation.valid
+    assert validation.rows == 4
+    assert validation.malformed == 2
+    assert validation.malformed_lines == [2, 4]
+    assert validation.record_lengths == {9: 1, 10: 2, 11: 1}
+    assert validation.encoding_problems == 0
+
+
+def test_without_width_nothing_is_malformed(tmp_path):
+    """Without the width of a definition only the record lengths are counted."""
+    fpath = _write(tmp_path, RECORD + b"\n", RECORD[:-1] + b"\n")
+
+    validation = _validate_asc(fpath)
+
+    assert validation.valid
+    assert validation.record_lengths == {9: 1, 10: 1}
+
+
+def test_control_bytes(tmp_path):
+    """Control characters and a carriage return that is not part of the line end are encoding problems."""
+    fpath = _write(
+        tmp_path,
+        RECORD + b"\r\n",
+        b"abc\x01efghij\r\n",
+        b"abc\refghij\r\n",
+        b"abc\tefghij\r\n",
+        RECORD + b"\r\n",
+    )
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation.encoding_problems == 3
+    assert validation.encoding_lines == [2, 3, 4]
+    assert validation.malformed == 0
+
+
+def test_utf8_in_latin1_file(tmp_path):
+    """UTF-8 is an encoding problem and makes the record longer in bytes; a latin1 character is not a problem."""
+    fpath = _write(
+        tmp_path,
+        "abcdefghié\r\n".encode("latin1"),
+        "abcdefghié\r\n".encode("utf-8"),
+        RECORD + b"\r\n",
+    )
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation.encoding_problems == 1
+    assert validation.encoding_lines == [2]
+    assert validation.malformed_lines == [2]
+    assert validation.record_lengths == {10: 2, 11: 1}
+
+
+def test_blank_lines(tmp_path):
+    """Lines that are empty or only spaces are not records, like read_fwf skips them; their line numbers count."""
+    fpath = _write(
+        tmp_path,
+        RECORD + b"\r\n",
+        b"\r\n",
+        b" " * WIDTH + b"\r\n",
+        b"  cdefghij\r\n",
+        b"\n",
+        b"abcdefgh\r\n",
+        RECORD,
+    )
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation.rows == 4 == _read_fwf_rows(fpath)
+    assert validation.blank_lines == 3
+    assert validation.malformed_lines == [6]
+    assert validation.record_lengths == {8: 1, 10: 3}
+
+
+def test_empty_file(tmp_path):
+    """An empty file has no records and is valid."""
+    fpath = _write(tmp_path)
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation.valid
+    assert validation.rows == 0
+    assert validation.blank_lines == 0
+    assert validation.record_lengths == {}
+
+
+def test_examples_are_limited(tmp_path):
+    """All problems are counted, but only the line numbers of the first MAX_EXAMPLES are kept."""
+    fpath = _write(tmp_path, *[RECORD[:-1] + b"\r\n"] * (MAX_EXAMPLES + 5))
+
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation.malformed == MAX_EXAMPLES + 5
+    assert validation.malformed_lines == list(range(1, MAX_EXAMPLES + 1))
+
+
+@pytest.mark.parametrize("block_bytes", [5, 12, 25, 31])
+def test_records_across_blocks(tmp_path, monkeypatch, block_bytes):
+    """Blocks end after a line end, so records over a block boundary (or longer than a block) count once."""
+    lines = [RECORD + b"\r\n"] * 20
+    lines[6] = RECORD[:-1] + b"\r\n"
+    lines[12] = RECORD + b"kl\r\n"
+    lines[15] = b"abc\x01efghij\r\n"
+    lines[17] = b"\r\n"
+    fpath = _write(tmp_path, *lines, RECORD)
+    expected = _validate_asc(fpath, width=WIDTH)
+
+    monkeypatch.setattr(validate_module, "BLOCK_BYTES", block_bytes)
+    validation = _validate_asc(fpath, width=WIDTH)
+
+    assert validation == expected
+    assert validation.rows == 20 == _read_fwf_rows(fpath)
+    assert validation.blank_lines == 1
+    assert validation.malformed_lines == [7, 13]
+    assert validation.encoding_lines == [16]